@@ -1,9 +1,13 @@
 from .config import RAGConfig, load_config
+from .docstore import DocumentMap, DocumentStore
 from .ingest import (
     load_bm25_docs,
+    load_document_store,
     load_parent_docs,
     run_ingestion,
+    save_attributes,
     save_bm25_data,
+    save_bm25_index,
     save_parent_docs,
 )
 from .query import RAGResponse, RAGSystem
@@ -15,7 +19,12 @@ __all__ = [
     "save_parent_docs",
     "load_parent_docs",
     "save_bm25_data",
+    "save_bm25_index",
+    "save_attributes",
     "load_bm25_docs",
+    "load_document_store",
+    "DocumentStore",
+    "DocumentMap",
     "RAGSystem",
     "RAGResponse",
 ]
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .cache import content_hash
+
+ATTRIBUTES_DIRNAME = "attributes"
+ATTRIBUTES_FORMAT_VERSION = 1
+COLUMNS = ("language", "content_type", "project_area", "source")
+
+LANG_TAG_RE = re.compile(r'\[LANG=(\w+)\]')
+CONTENT_TYPE_RE = re.compile(r'^\[DOC_(\w+)\]')
+
+
+def chunk_key(doc: Document) -> str:
+    """Id of a chunk: its ``chunk_id``, or a content hash for older indexes."""
+    return doc.metadata.get("chunk_id") or content_hash(doc.page_content)[:16]
+
+
+def document_attributes(doc: Document) -> Dict[str, str]:
+    """
+    Categorical attributes of a chunk or parent document.
+
+    Language is the first ``[LANG=...]`` tag in the content (what the query
+    path used to scan for), so filtering results are unchanged.
+    """
+    lang_match = LANG_TAG_RE.search(doc.page_content)
+    type_match = CONTENT_TYPE_RE.match(doc.page_content)
+    return {
+        "language": lang_match.group(1) if lang_match else "Unknown",
+        "content_type": type_match.group(1).lower() if type_match else "unknown",
+        "project_area": doc.metadata.get("project_area") or doc.metadata.get("tags", ""),
+        "source": doc.metadata.get("source", "unknown"),
+    }
+
+
+class AttributeTable:
+    """
+    Per-document categorical columns stored as small integer codes.
+
+    Row ``i`` describes ``ids[i]``; column values are codes into the
+    column's ``values`` list, so a filter is a vectorized comparison over
+    a compact array instead of a regex over document text.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        columns: Dict[str, np.ndarray],
+        values: Dict[str, List[str]],
+    ):
+        self.ids = ids
+        self.columns = columns
+        self.values = values
+        self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._codes = {
+            name: {value: code for code, value in enumerate(column_values)}
+            for name, column_values in values.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_documents(
+        cls, documents: Sequence[Document], ids: Sequence[str]
+    ) -> "AttributeTable":
+        values: Dict[str, List[str]] = {name: [] for name in COLUMNS}
+        codes: Dict[str, Dict[str, int]] = {name: {} for name in COLUMNS}
+        rows: Dict[str, List[int]] = {name: [] for name in COLUMNS}
+
+        for doc in documents:
+            for name, value in document_attributes(doc).items():
+                code = codes[name].get(value)
+                if code is None:
+                    code = codes[name][value] = len(values[name])
+                    values[name].append(value)
+                rows[name].append(code)
+
+        columns = {
+            name: np.asarray(rows[name], dtype=np.min_scalar_type(max(len(values[name]), 1)))
+            for name in COLUMNS
+        }
+        return cls(list(ids), columns, values)
+
+    def row(self, doc_id: str) -> int:
+        """Row of a document id, or -1 if unknown."""
+        return self._rows.get(doc_id, -1)
+
+    def rows(self, doc_ids: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self._rows.get(i, -1) for i in doc_ids), dtype=np.int64)
+
+    def value(self, column: str, row: int, default: str = "Unknown") -> str:
+        if row < 0:
+            return default
+        return self.values[column][int(self.columns[column][row])]
+
+    def mask(self, column: str, allowed: Iterable[str], rows: np.ndarray | None = None) -> np.ndarray:
+        """
+        Boolean mask of rows whose ``column`` value is in ``allowed``.
+
+        With ``rows``, the mask covers those rows only (-1 never matches).
+        """
+        codes = [self._codes[column][v] for v in allowed if v in self._codes[column]]
+        column_values = self.columns[column]
+        if rows is None:
+            return np.isin(column_values, codes)
+        valid = rows >= 0
+        result = np.zeros(len(rows), dtype=bool)
+        result[valid] = np.isin(column_values[rows[valid]], codes)
+        return result
+
+    def save(self, index_path: str, name: str) -> None:
+        """
+        Write to ``<index_path>/attributes/<name>.*`` (npz + JSON).
+
+        Each file is written under a temporary name and renamed over the old
+        one, so a concurrent reader never opens a half-written file.
+        """
+        path = Path(index_path) / ATTRIBUTES_DIRNAME
+        path.mkdir(parents=True, exist_ok=True)
+
+        tmp_columns = path / f".{name}.npz.tmp"
+        with open(tmp_columns, "wb") as f:
+            np.savez(f, **self.columns)
+        meta = {
+            "version": ATTRIBUTES_FORMAT_VERSION,
+            "ids": self.ids,
+            "values": self.values,
+        }
+        tmp_meta = path / f".{name}.json.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+
+        os.replace(tmp_columns, path / f"{name}.npz")
+        os.replace(tmp_meta, path / f"{name}.json")
+
+    @classmethod
+    def load(cls, index_path: str, name: str) -> "AttributeTable | None":
+        """Load a saved table; returns None if missing or incompatible."""
+        path = Path(index_path) / ATTRIBUTES_DIRNAME
+        meta_path = path / f"{name}.json"
+        if not meta_path.exists():
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != ATTRIBUTES_FORMAT_VERSION:
+            return None
+
+        with np.load(path / f"{name}.npz") as data:
+            columns = {column: data[column] for column in COLUMNS}
+        return cls(meta["ids"], columns, meta["values"])
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+BM25_DIRNAME = "bm25"
+BM25_FORMAT_VERSION = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """Whitespace tokenizer, matching BM25Retriever's default preprocessing."""
+    return text.split()
+
+
+class BM25Index:
+    """
+    Okapi BM25 index stored as a term x document CSR matrix of impact weights.
+
+    Row ``t`` holds the postings of term ``t``: ``doc_ids[offsets[t]:offsets[t + 1]]``
+    with their precomputed BM25 contribution in ``weights``. Scoring a batch
+    of queries is a sparse (queries x terms) @ (terms x docs) product, so only
+    the postings of query terms are touched. Weights follow
+    ``rank_bm25.BM25Okapi`` (including its epsilon floor for negative IDF
+    values) so rankings match the previous BM25Retriever.
+    """
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        weights: np.ndarray,
+        doc_lengths: np.ndarray,
+        idf: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.vocab = vocab
+        self.doc_lengths = doc_lengths
+        self.idf = idf
+        self.k1 = k1
+        self.b = b
+        self.matrix = csr_matrix(
+            (weights, doc_ids, offsets), shape=(len(vocab), len(doc_lengths)), copy=False
+        )
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: Iterable[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "BM25Index":
+        """Tokenize a corpus and build its weighted inverted index."""
+        vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        lengths: List[int] = []
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_id, freq))
+
+        n_docs = len(lengths)
+        nnz = sum(len(p) for p in postings)
+        offsets = np.zeros(len(postings) + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.fromiter(
+            (doc_id for plist in postings for doc_id, _ in plist), dtype=np.int32, count=nnz
+        )
+        term_freqs = np.fromiter(
+            (freq for plist in postings for _, freq in plist), dtype=np.float64, count=nnz
+        )
+        doc_lengths = np.asarray(lengths, dtype=np.float32)
+
+        # IDF as in rank_bm25.BM25Okapi: negative values are floored to
+        # epsilon * average IDF.
+        doc_freqs = np.diff(offsets).astype(np.float64)
+        idf = np.log(n_docs - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        if len(idf):
+            idf[idf < 0] = epsilon * idf.mean()
+
+        avgdl = float(doc_lengths.mean()) if n_docs else 1.0
+        norm = k1 * (1 - b + b * doc_lengths[doc_ids] / avgdl)
+        term_idf = np.repeat(idf, np.diff(offsets))
+        weights = term_idf * term_freqs * (k1 + 1) / (term_freqs + norm)
+
+        return cls(
+            vocab,
+            offsets,
+            doc_ids,
+            weights.astype(np.float32),
+            doc_lengths,
+            idf.astype(np.float32),
+            k1=k1,
+            b=b,
+        )
+
+    def save(self, index_path: str) -> None:
+        """
+        Write the index to ``<index_path>/bm25`` as .npy arrays plus JSON.
+
+        The files are written to a temporary directory that then replaces
+        the old one, so processes that memory-mapped the previous arrays
+        keep reading intact files.
+        """
+        path = Path(index_path) / BM25_DIRNAME
+        tmp_path = path.with_name(f".{BM25_DIRNAME}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        np.save(tmp_path / "offsets.npy", self.matrix.indptr)
+        np.save(tmp_path / "doc_ids.npy", self.matrix.indices)
+        np.save(tmp_path / "weights.npy", self.matrix.data)
+        np.save(tmp_path / "doc_lengths.npy", np.asarray(self.doc_lengths))
+        np.save(tmp_path / "idf.npy", np.asarray(self.idf))
+
+        terms = sorted(self.vocab, key=self.vocab.__getitem__)
+        with open(tmp_path / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False, separators=(",", ":"))
+
+        meta = {
+            "version": BM25_FORMAT_VERSION,
+            "n_docs": self.n_docs,
+            "n_terms": len(terms),
+            "k1": self.k1,
+            "b": self.b,
+        }
+        with open(tmp_path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        # Swap in the complete directory so readers never see a partial index
+        old_path = path.with_name(f".{BM25_DIRNAME}.old")
+        shutil.rmtree(old_path, ignore_errors=True)
+        if path.exists():
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, index_path: str) -> "BM25Index | None":
+        """Memory-map a saved index; returns None if missing or incompatible."""
+        path = Path(index_path) / BM25_DIRNAME
+        meta_path = path / "meta.json"
+        if not meta_path.exists():
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != BM25_FORMAT_VERSION:
+            return None
+
+        with open(path / "vocab.json", "r", encoding="utf-8") as f:
+            terms = json.load(f)
+
+        return cls(
+            {term: i for i, term in enumerate(terms)},
+            np.load(path / "offsets.npy", mmap_mode="r"),
+            np.load(path / "doc_ids.npy", mmap_mode="r"),
+            np.load(path / "weights.npy", mmap_mode="r"),
+            np.load(path / "doc_lengths.npy", mmap_mode="r"),
+            np.load(path / "idf.npy", mmap_mode="r"),
+            k1=meta["k1"],
+            b=meta["b"],
+        )
+
+    def _query_matrix(self, queries: Sequence[str]) -> csr_matrix:
+        """Sparse (queries x terms) matrix of query term counts."""
+        rows: List[int] = []
+        cols: List[int] = []
+        counts: List[float] = []
+        for row, query in enumerate(queries):
+            for term, count in Counter(tokenize(query)).items():
+                term_id = self.vocab.get(term)
+                if term_id is not None:
+                    rows.append(row)
+                    cols.append(term_id)
+                    counts.append(count)
+        return csr_matrix(
+            (np.asarray(counts, dtype=np.float32), (rows, cols)),
+            shape=(len(queries), len(self.vocab)),
+        )
+
+    def get_scores(self, query: str) -> np.ndarray:
+        """Dense BM25 scores of every document for one query."""
+        scores = self._query_matrix([query]) @ self.matrix
+        return scores.toarray().ravel()
+
+    def search_batch(
+        self, queries: Sequence[str], k: int, mask: np.ndarray | None = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Score many queries in one sparse product and keep each top ``k``.
+
+        Documents sharing no term with a query score zero and are never
+        returned, so a result can hold fewer than ``k`` hits. With ``mask``
+        (one bool per document), only documents where it is True are ranked.
+        """
+        if not queries:
+            return []
+        if not self.n_docs or k <= 0:
+            return [[] for _ in queries]
+
+        scores = (self._query_matrix(queries) @ self.matrix).tocsr()
+        results: List[List[Tuple[int, float]]] = []
+        for row in range(len(queries)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            keep = scores.data[start:end] > 0
+            if mask is not None:
+                keep &= mask[scores.indices[start:end]]
+            doc_ids = scores.indices[start:end][keep]
+            row_scores = scores.data[start:end][keep]
+            if len(row_scores) > k:
+                top = np.argpartition(-row_scores, k - 1)[:k]
+            else:
+                top = np.arange(len(row_scores))
+            # Best score first; ties broken by document id for determinism
+            top = top[np.lexsort((doc_ids[top], -row_scores[top]))]
+            results.append([(int(doc_ids[i]), float(row_scores[i])) for i in top])
+        return results
+
+    def search(
+        self, query: str, k: int, mask: np.ndarray | None = None
+    ) -> List[Tuple[int, float]]:
+        """Return the top ``k`` (doc_id, score) pairs, best first."""
+        return self.search_batch([query], k, mask)[0]
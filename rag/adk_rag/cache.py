@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so near-identical queries share a key."""
+    return " ".join(text.split()).lower()
+
+
+def content_hash(*parts: str) -> str:
+    """Stable sha256 hex digest of the given parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional per-entry TTL (seconds, 0 = none)."""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl > 0 and self._clock() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteVectorStore:
+    """On-disk ``key -> float32 vector`` store backed by SQLite."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(keys)
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches query and document vectors.
+
+    Query embeddings are looked up in an in-memory LRU (with TTL), then in an
+    optional on-disk store, before calling the wrapped provider. Document
+    embeddings are content-addressed in the on-disk store by the sha256 of
+    the exact text, so re-ingesting unchanged chunks costs no provider calls.
+    Keys always include the embedding model, so switching models never
+    serves stale vectors.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        max_size: int = 1024,
+        ttl: float = 0.0,
+        store: SQLiteVectorStore | None = None,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.memory = LRUCache(max_size, ttl)
+        self.store = store
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "document_hits": 0,
+            "document_misses": 0,
+        }
+        self._miss_ms = 0.0
+        self._saved_ms = 0.0
+
+    def _query_key(self, text: str) -> str:
+        return content_hash("query", self.model, normalize_text(text))
+
+    def _document_key(self, text: str) -> str:
+        return content_hash("document", self.model, text)
+
+    def _record_hit(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+            if self._counters["misses"]:
+                self._saved_ms += self._miss_ms / self._counters["misses"]
+
+    def _cached_query(self, key: str) -> List[float] | None:
+        vector = self.memory.get(key)
+        if vector is not None:
+            self._record_hit("hits")
+            return vector
+
+        if self.store is not None:
+            vector = self.store.get_many([key]).get(key)
+            if vector is not None:
+                self.memory.set(key, vector)
+                self._record_hit("disk_hits")
+                return vector
+        return None
+
+    def _remember_query(self, key: str, vector: List[float], elapsed_ms: float) -> None:
+        with self._lock:
+            self._counters["misses"] += 1
+            self._miss_ms += elapsed_ms
+
+        self.memory.set(key, vector)
+        if self.store is not None:
+            self.store.set_many({key: vector})
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._query_key(text)
+        vector = self._cached_query(key)
+        if vector is not None:
+            return vector
+
+        start = time.perf_counter()
+        vector = self.embeddings.embed_query(text)
+        self._remember_query(key, vector, (time.perf_counter() - start) * 1000.0)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._query_key(text)
+        vector = self._cached_query(key)
+        if vector is not None:
+            return vector
+
+        start = time.perf_counter()
+        vector = await self.embeddings.aembed_query(text)
+        self._remember_query(key, vector, (time.perf_counter() - start) * 1000.0)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.store is None:
+            return self.embeddings.embed_documents(texts)
+
+        keys = [self._document_key(text) for text in texts]
+        vectors = self.store.get_many(set(keys))
+
+        # Embed each distinct uncached text once
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            embedded = self.embeddings.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), embedded))
+            self.store.set_many(new_vectors)
+            vectors.update(new_vectors)
+
+        with self._lock:
+            self._counters["document_misses"] += len(missing)
+            self._counters["document_hits"] += len(texts) - len(missing)
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate and latency counters for sizing the cache."""
+        with self._lock:
+            hits = self._counters["hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            misses = self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self.memory),
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "avg_miss_ms": round(self._miss_ms / misses, 1) if misses else 0.0,
+                "saved_ms": round(self._saved_ms, 1),
+            }
+
+
+class SemanticCache:
+    """
+    Size-bounded cache of query responses looked up by embedding similarity.
+
+    Entries live in fixed slots of a preallocated matrix of unit vectors, so
+    a lookup is one matrix-vector product. Each entry belongs to a namespace
+    (index version, model settings, ...) and only matches lookups in the same
+    namespace. When full, the least recently used slot is replaced.
+    """
+
+    def __init__(self, max_size: int = 256, threshold: float = 0.95):
+        self.max_size = max_size
+        self.threshold = threshold
+        self._vectors: np.ndarray | None = None
+        self._namespace_ids: Dict[str, int] = {}
+        self._slot_namespace = np.full(max_size, -1, dtype=np.int64)
+        self._last_used = np.zeros(max_size, dtype=np.int64)
+        self._responses: List[Dict[str, Any] | None] = [None] * max_size
+        self._tick = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else array
+
+    def lookup(
+        self, namespace: str, vector: List[float]
+    ) -> tuple[Dict[str, Any], float] | None:
+        """Return ``(response, similarity)`` for the closest entry above threshold."""
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if self._vectors is None or namespace_id is None:
+                self._counters["misses"] += 1
+                return None
+
+            similarities = self._vectors @ self._unit(vector)
+            similarities[self._slot_namespace != namespace_id] = -np.inf
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self._counters["misses"] += 1
+                return None
+
+            self._tick += 1
+            self._last_used[best] = self._tick
+            self._counters["hits"] += 1
+            return copy.deepcopy(self._responses[best]), similarity
+
+    def store(self, namespace: str, vector: List[float], response: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        unit = self._unit(vector)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(unit):
+                self._vectors = np.zeros((self.max_size, len(unit)), dtype=np.float32)
+                self._slot_namespace[:] = -1
+
+            namespace_id = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+            empty = np.flatnonzero(self._slot_namespace < 0)
+            slot = int(empty[0]) if len(empty) else int(np.argmin(self._last_used))
+
+            self._tick += 1
+            self._vectors[slot] = unit
+            self._slot_namespace[slot] = namespace_id
+            self._last_used[slot] = self._tick
+            self._responses[slot] = copy.deepcopy(response)
+
+    def __len__(self) -> int:
+        return int((self._slot_namespace >= 0).sum())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self),
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+class RerankScoreCache:
+    """
+    LRU cache of rerank scores per (query, chunk) pair.
+
+    Keys are ``(model, query hash, chunk hash)``: the query is normalized like
+    the embedding cache, the chunk is hashed exactly, and the model scopes
+    scores to the reranker that produced them.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: float = 0.0):
+        self.memory = LRUCache(max_size, ttl)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def keys(model: str, query: str, texts: List[str]) -> List[tuple[str, str, str]]:
+        query_key = content_hash(normalize_text(query))
+        return [(model, query_key, content_hash(text)) for text in texts]
+
+    def get_many(self, keys: List[tuple[str, str, str]]) -> List[float | None]:
+        scores = [self.memory.get(key) for key in keys]
+        hits = sum(score is not None for score in scores)
+        with self._lock:
+            self._counters["hits"] += hits
+            self._counters["misses"] += len(keys) - hits
+        return scores
+
+    def set_many(self, items: Dict[tuple[str, str, str], float]) -> None:
+        for key, score in items.items():
+            self.memory.set(key, score)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self.memory),
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
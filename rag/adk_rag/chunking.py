@@ -3,8 +3,10 @@ from __future__ import annotations
 import os
 import re
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 from langchain_core.documents import Document
 from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
@@ -125,8 +127,9 @@ def chunk_document_with_parents(
     child_chunks: List[Document] = []
     parent_docs: Dict[str, Document] = {}
 
-    for parent in parent_sections:
-        parent_id = str(uuid.uuid4())
+    for section_index, parent in enumerate(parent_sections):
+        # Deterministic ids let incremental ingestion replace a file's entries
+        parent_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{section_index}"))
 
         # Build breadcrumb from header metadata
         breadcrumb_parts = []
@@ -151,7 +154,7 @@ def chunk_document_with_parents(
         # Split parent into children
         children = child_splitter.split_documents([parent])
 
-        for child in children:
+        for child_index, child in enumerate(children):
             # Add semantic tags to chunk content for better retrieval
             content_type = _detect_content_type(child.page_content)
             lang_tag = _detect_language_tag(child.page_content)
@@ -161,6 +164,7 @@ def chunk_document_with_parents(
 
             child.page_content = tagged_content
             child.metadata["parent_id"] = parent_id
+            child.metadata["chunk_id"] = f"{parent_id}-{child_index}"
             child.metadata["source"] = source
             child.metadata["breadcrumb"] = breadcrumb
             child.metadata["project_area"] = project_tags
@@ -171,10 +175,101 @@ def chunk_document_with_parents(
     return child_chunks, parent_docs
 
 
+def list_markdown_files(docs_dir: str) -> List[str]:
+    """List markdown files under a directory in a stable (sorted) order."""
+    paths: List[str] = []
+    if not os.path.exists(docs_dir):
+        return paths
+
+    for root, dirs, files in os.walk(docs_dir):
+        # Skip hidden directories
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+
+        for file in files:
+            if file.startswith('.') or not file.endswith('.md'):
+                continue
+            paths.append(os.path.join(root, file))
+
+    return sorted(paths)
+
+
+def load_file_with_parents(
+    file_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> Tuple[List[Document], Dict[str, Document]]:
+    """Read and chunk a single markdown file."""
+    with open(file_path, 'r', encoding='utf-8') as handle:
+        content = handle.read()
+    return chunk_document_with_parents(content, file_path, chunk_size, chunk_overlap)
+
+
+def _load_file_safe(
+    file_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> Tuple[str, List[Document], Dict[str, Document]] | None:
+    """Chunk one file, reporting (not raising) read/parse errors."""
+    try:
+        chunks, parents = load_file_with_parents(file_path, chunk_size, chunk_overlap)
+    except Exception as exc:
+        print(f"Skipping {file_path}: {exc}")
+        return None
+    return file_path, chunks, parents
+
+
+def iter_files_with_parents(
+    file_paths: Iterable[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    workers: int = 1,
+) -> Iterator[Tuple[str, List[Document], Dict[str, Document]]]:
+    """
+    Chunk files one by one, yielding ``(file_path, chunks, parents)``.
+
+    With ``workers > 1`` files are parsed and split in a process pool.
+    Results are still yielded in the order of ``file_paths``, so the output
+    is identical to a serial run. Files that fail to load are skipped.
+    """
+    load = partial(_load_file_safe, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    if workers <= 1:
+        for result in map(load, file_paths):
+            if result is not None:
+                yield result
+        return
+
+    file_paths = list(file_paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Small batches amortize pickling without delaying the first result
+        chunksize = max(1, min(16, len(file_paths) // (workers * 4)))
+        for result in pool.map(load, file_paths, chunksize=chunksize):
+            if result is not None:
+                yield result
+
+
+def iter_documents_with_parents(
+    docs_dir: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    workers: int = 1,
+) -> Iterator[Tuple[List[Document], Dict[str, Document]]]:
+    """
+    Stream ``(chunks, parents)`` per markdown file under ``docs_dir``.
+
+    Lets callers start embedding before the whole corpus is chunked.
+    """
+    for _, chunks, parents in iter_files_with_parents(
+        list_markdown_files(docs_dir), chunk_size, chunk_overlap, workers
+    ):
+        yield chunks, parents
+
+
 def load_documents_with_parents(
     docs_dir: str,
     chunk_size: int,
     chunk_overlap: int,
+    workers: int = 1,
 ) -> Tuple[List[Document], Dict[str, Document]]:
     """
     Load and chunk all documents from a directory.
@@ -185,30 +280,11 @@ def load_documents_with_parents(
     all_chunks: List[Document] = []
     all_parents: Dict[str, Document] = {}
 
-    if not os.path.exists(docs_dir):
-        return all_chunks, all_parents
-
-    for root, dirs, files in os.walk(docs_dir):
-        # Skip hidden directories
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
-
-        for file in files:
-            if file.startswith('.') or not file.endswith('.md'):
-                continue
-
-            file_path = os.path.join(root, file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as handle:
-                    content = handle.read()
-
-                chunks, parents = chunk_document_with_parents(
-                    content, file_path, chunk_size, chunk_overlap
-                )
-                all_chunks.extend(chunks)
-                all_parents.update(parents)
-
-            except Exception as exc:
-                print(f"Skipping {file_path}: {exc}")
+    for chunks, parents in iter_documents_with_parents(
+        docs_dir, chunk_size, chunk_overlap, workers
+    ):
+        all_chunks.extend(chunks)
+        all_parents.update(parents)
 
     return all_chunks, all_parents
 
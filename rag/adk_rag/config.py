@@ -67,9 +67,101 @@ class RAGConfig:
     weight_bm25: float = 0.5
     use_hybrid_retrieval: bool = True
 
-    # Reranking settings
+    # Embedding size (0 = model default); smaller sizes truncate Matryoshka
+    # embeddings (OpenAI "dimensions", client-side for other providers)
+    embedding_dimensions: int = 0
+
+    # FAISS index: factory string ("Flat", "HNSW32", "IVF256,PQ32", "SQ8",
+    # "PCA256,SQ8,RFlat", ...), max vectors sampled for training (0 = all),
+    # search-time efSearch/nprobe (0 = index default), candidates re-scored
+    # with full vectors per result for RFlat indexes, and memory-mapped loading
+    faiss_index_factory: str = "Flat"
+    faiss_train_size: int = 50000
+    faiss_ef_search: int = 64
+    faiss_nprobe: int = 16
+    faiss_refine_k_factor: float = 4.0
+    faiss_mmap: bool = True
+
+    # Restrict vector and BM25 search to chunks in the requested language
+    # (falls back to unfiltered retrieval when too few chunks match)
+    language_prefilter: bool = True
+
+    # Fusion settings ("rrf" or "weighted"); fusion_top_n caps rerank candidates
+    fusion_method: str = "rrf"
+    rrf_k: int = 60
+    fusion_top_n: int = 20
+
+    # Concurrent retrieval settings (timeouts in seconds, 0 disables)
+    concurrent_retrieval: bool = True
+    vector_timeout: float = 10.0
+    bm25_timeout: float = 5.0
+    retrieval_workers: int = 8
+
+    # Query embedding cache (ttl in seconds, 0 = no expiry; size 0 disables;
+    # empty path = in-memory only, otherwise a SQLite file for a disk tier)
+    embedding_cache_size: int = 1024
+    embedding_cache_ttl: float = 3600.0
+    embedding_cache_path: str = ""
+
+    # Reuse stored vectors for unchanged chunks when re-ingesting
+    ingest_embedding_cache: bool = True
+
+    # Processes used to parse and chunk markdown files (1 = serial)
+    chunking_workers: int = 1
+
+    # Ingestion embedding pipeline (rate limits per minute, 0 = unlimited)
+    embedding_batch_size: int = 64
+    embedding_concurrency: int = 4
+    embedding_requests_per_minute: int = 0
+    embedding_tokens_per_minute: int = 0
+    embedding_max_retries: int = 5
+
+    # Semantic answer cache (cosine similarity threshold on query embeddings)
+    use_semantic_cache: bool = False
+    semantic_cache_size: int = 256
+    semantic_cache_threshold: float = 0.95
+
+    # Explicit garbage collection on the query path: "off", "always" (after
+    # every query), "rss" (once RSS exceeds gc_rss_threshold_mb) or
+    # "periodic" (every gc_interval seconds on a background thread)
+    gc_policy: str = "off"
+    gc_rss_threshold_mb: float = 2048.0
+    gc_interval: float = 300.0
+    # MCP server only: exempt the loaded indexes from garbage collection
+    # (gc.freeze of the whole process once RAGSystem is built)
+    gc_freeze_after_load: bool = False
+
+    # Reranking settings (use_llm_reranking turns reranking on for any backend)
     rerank_top_n: int = 8
     use_llm_reranking: bool = True
+    # Backend: "llm" (rerank_model), "cross_encoder" (sentence-transformers,
+    # CPU; cross_encoder_backend "torch" or "onnx") or "flashrank" (ONNX, CPU);
+    # reranker_model empty = backend default
+    reranker: str = "llm"
+    reranker_model: str = ""
+    cross_encoder_backend: str = "torch"
+    rerank_max_length: int = 512
+    rerank_batch_size: int = 16
+    rerank_workers: int = 2
+    # LLM reranker: candidates per prompt (0 = all in one) and calls in flight
+    llm_rerank_shard_size: int = 8
+    llm_rerank_concurrency: int = 4
+    # Rerank score cache per (query, chunk, model) (size 0 disables; ttl in seconds)
+    rerank_cache_size: int = 4096
+    rerank_cache_ttl: float = 3600.0
+    # Confidence gate: skip reranking when the retrieval legs agree (same top
+    # chunk, top-n overlap and fused margin), rerank fewer candidates on
+    # moderate overlap
+    rerank_gate: bool = False
+    rerank_gate_skip_overlap: float = 0.75
+    rerank_gate_min_margin: float = 0.3
+    rerank_gate_shrink_overlap: float = 0.5
+    rerank_gate_shrink_n: int = 12
+
+    # Answer prompt context packing, in tokens of the LLM's tokenizer
+    # (0 = no limit); long parents are windowed around the matched chunk
+    context_token_budget: int = 6000
+    context_section_max_tokens: int = 1500
 
     # Legacy settings (kept for backward compatibility)
     top_k: int = 8
@@ -119,6 +211,8 @@ def load_config(config_path: str | None = None) -> RAGConfig:
     base_dir = path.parent
     cfg.docs_path = _resolve_path(cfg.docs_path, base_dir)
     cfg.index_path = _resolve_path(cfg.index_path, base_dir)
+    if cfg.embedding_cache_path:
+        cfg.embedding_cache_path = _resolve_path(cfg.embedding_cache_path, base_dir)
 
     # Re-detect provider (may have changed since dataclass init)
     cfg.llm_provider = _detect_provider()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
+
+# Rough characters per token when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Smallest fragment worth packing when the budget is nearly spent
+MIN_SECTION_TOKENS = 64
+
+# Tag line that prefixes every child chunk ("[DOC_TEXT] [LANG=Python] [GENERAL] ...")
+_CHUNK_TAGS = re.compile(r'^\[DOC_\w+\] \[LANG=\w+\] \[\w+\] [^\n]*\n')
+
+
+def strip_chunk_tags(text: str) -> str:
+    """Remove the tag line ingestion prepends to child chunks."""
+    return _CHUNK_TAGS.sub('', text)
+
+
+class TokenCounter:
+    """
+    Counts and truncates text in tokens of ``model``'s tokenizer.
+
+    Uses tiktoken (``cl100k_base`` for models it does not know, e.g.
+    Gemini); if the encoding cannot be loaded (tiktoken missing, or its BPE
+    file not cached and no network), tokens are estimated as
+    ``CHARS_PER_TOKEN`` characters.
+    """
+
+    def __init__(self, model: str = ""):
+        self.encoding = None
+        try:
+            import tiktoken
+
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as exc:
+            print(f"Tokenizer unavailable ({exc}); estimating {CHARS_PER_TOKEN} chars per token.")
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            return text[: max_tokens * CHARS_PER_TOKEN]
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens])
+
+
+@lru_cache(maxsize=None)
+def token_counter(model: str = "") -> TokenCounter:
+    """Shared ``TokenCounter`` per model, so the encoding loads once per process."""
+    return TokenCounter(model)
+
+
+def window_around(text: str, anchor: str, max_tokens: int, counter: TokenCounter) -> str:
+    """
+    Lines of ``text`` around ``anchor`` that fit in ``max_tokens``.
+
+    The window starts at the line holding the anchor's first line (the
+    start of ``text`` if it is not found) and grows one line at a time,
+    alternating below and above, until the next line would not fit.
+    """
+    lines = text.split("\n")
+    anchor_line = next((line.strip() for line in anchor.split("\n") if line.strip()), "")
+    start = 0
+    if anchor_line:
+        start = next((i for i, line in enumerate(lines) if anchor_line[:80] in line), 0)
+
+    first = counter.truncate(lines[start], max_tokens)
+    used = counter.count(first)
+    low = high = start
+    below = True
+    while low > 0 or high < len(lines) - 1:
+        index = high + 1 if (below and high < len(lines) - 1) or low == 0 else low - 1
+        below = not below
+        # +1 for the newline joining it to the window
+        cost = counter.count(lines[index]) + 1
+        if used + cost > max_tokens:
+            break
+        used += cost
+        low, high = min(low, index), max(high, index)
+    return "\n".join(lines[low:start] + [first] + lines[start + 1 : high + 1])
+
+
+@dataclass
+class ContextSection:
+    source: str
+    breadcrumb: str
+    text: str
+    # Content of the matched child chunk, used to center windows
+    anchor: str = ""
+
+
+def format_section(source: str, breadcrumb: str, text: str) -> str:
+    # XML-style tags for clearer separation
+    return f'<source file="{source}" section="{breadcrumb}">\n{text}\n</source>\n\n'
+
+
+def pack_context(
+    sections: List[ContextSection],
+    counter: TokenCounter,
+    budget: int = 0,
+    section_max_tokens: int = 0,
+) -> Tuple[List[str], str]:
+    """
+    Assemble the context block within a token budget.
+
+    Sections are added in order (best-ranked first). A section longer than
+    ``section_max_tokens`` or than what is left of ``budget`` is windowed
+    around its anchor; packing stops once too little budget remains for
+    another useful section. Zero limits disable the respective cap.
+    Returns ``(contexts, context_block)`` with the text actually packed.
+    """
+    contexts: List[str] = []
+    parts: List[str] = []
+    used = 0
+    for section in sections:
+        text = section.text
+        tokens = counter.count(text)
+        overhead = counter.count(format_section(section.source, section.breadcrumb, ""))
+        limit = section_max_tokens if section_max_tokens > 0 else tokens
+        if budget > 0:
+            remaining = budget - used - overhead
+            if remaining < min(tokens, MIN_SECTION_TOKENS):
+                break
+            limit = min(limit, remaining)
+
+        if tokens > limit:
+            text = window_around(text, section.anchor, limit, counter)
+        used += overhead + min(tokens, limit)
+        contexts.append(text)
+        parts.append(format_section(section.source, section.breadcrumb, text))
+    return contexts, "".join(parts)
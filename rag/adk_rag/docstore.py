@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_DIRNAME = "docstore"
+DOCSTORE_FORMAT_VERSION = 1
+
+
+class DocumentStore(Sequence):
+    """
+    Read-only, memory-mapped sequence of documents.
+
+    On disk (``<index_path>/docstore/<name>/``):
+    - ``texts.bin``: every ``page_content`` as one UTF-8 blob
+    - ``offsets.npy``: byte offsets into the blob (``n + 1`` entries)
+    - ``codes.npz``: per metadata key, an int32 code per document (-1 = absent)
+    - ``meta.json``: per metadata key, the distinct values the codes point to,
+      plus optional document ids
+
+    Only the code arrays live on the heap; a ``Document`` is built when an
+    item is accessed, so loading costs no per-document Python objects.
+    """
+
+    def __init__(
+        self,
+        texts: Any,
+        offsets: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        values: Dict[str, List[Any]],
+        ids: List[str] | None = None,
+    ):
+        self._texts = texts
+        self._offsets = offsets
+        self._codes = codes
+        self._values = values
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return Document(page_content=self.text(index), metadata=self.metadata(index))
+
+    def text(self, index: int) -> str:
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return bytes(self._texts[start:end]).decode("utf-8")
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        metadata: Dict[str, Any] = {}
+        for key, codes in self._codes.items():
+            code = int(codes[index])
+            if code >= 0:
+                metadata[key] = self._values[key][code]
+        return metadata
+
+    def close(self) -> None:
+        """Release the memory map of the text blob."""
+        if isinstance(self._texts, mmap.mmap):
+            self._texts.close()
+        self._texts = b""
+
+    @staticmethod
+    def save(
+        documents: Iterable[Document],
+        index_path: str,
+        name: str,
+        ids: Iterable[str] | None = None,
+    ) -> None:
+        """Write documents (and optional ids) to ``<index_path>/docstore/<name>``."""
+        documents = list(documents)
+        path = Path(index_path) / DOCSTORE_DIRNAME / name
+        tmp_path = path.with_name(f".{name}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        with open(tmp_path / "texts.bin", "wb") as f:
+            for i, doc in enumerate(documents):
+                data = doc.page_content.encode("utf-8")
+                f.write(data)
+                offsets[i + 1] = offsets[i] + len(data)
+        np.save(tmp_path / "offsets.npy", offsets)
+
+        keys: List[str] = []
+        for doc in documents:
+            for key in doc.metadata:
+                if key not in keys:
+                    keys.append(key)
+
+        values: Dict[str, List[Any]] = {}
+        codes: Dict[str, np.ndarray] = {}
+        for key in keys:
+            lookup: Dict[str, int] = {}
+            values[key] = []
+            column = np.full(len(documents), -1, dtype=np.int32)
+            for i, doc in enumerate(documents):
+                if key not in doc.metadata:
+                    continue
+                value = doc.metadata[key]
+                encoded = json.dumps(value, sort_keys=True, ensure_ascii=False)
+                code = lookup.get(encoded)
+                if code is None:
+                    code = lookup[encoded] = len(values[key])
+                    values[key].append(value)
+                column[i] = code
+            codes[key] = column
+        np.savez(tmp_path / "codes.npz", **codes)
+
+        meta = {
+            "version": DOCSTORE_FORMAT_VERSION,
+            "count": len(documents),
+            "keys": keys,
+            "values": values,
+            "ids": list(ids) if ids is not None else None,
+        }
+        with open(tmp_path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+
+        # Swap in the complete directory so readers never see a partial store
+        old_path = path.with_name(f".{name}.old")
+        shutil.rmtree(old_path, ignore_errors=True)
+        if path.exists():
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, index_path: str, name: str) -> "DocumentStore | None":
+        """Memory-map a saved store; returns None if missing or incompatible."""
+        path = Path(index_path) / DOCSTORE_DIRNAME / name
+        meta_path = path / "meta.json"
+        if not meta_path.exists():
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != DOCSTORE_FORMAT_VERSION:
+            return None
+
+        texts: Any = b""
+        if (path / "texts.bin").stat().st_size:
+            with open(path / "texts.bin", "rb") as f:
+                texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        with np.load(path / "codes.npz") as data:
+            codes = {key: data[key] for key in meta["keys"]}
+
+        return cls(
+            texts,
+            np.load(path / "offsets.npy", mmap_mode="r"),
+            codes,
+            meta["values"],
+            meta["ids"],
+        )
+
+
+class DocumentMap(Mapping):
+    """Read-only ``id -> Document`` view over a store saved with ids."""
+
+    def __init__(self, store: DocumentStore):
+        self.store = store
+        self._rows = {doc_id: row for row, doc_id in enumerate(store.ids or [])}
+
+    def __getitem__(self, doc_id: str) -> Document:
+        return self.store[self._rows[doc_id]]
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class MappingDocstore(Docstore):
+    """
+    Read-only LangChain docstore over an ``id -> Document`` mapping.
+
+    Lets a FAISS store resolve hits from the memory-mapped chunk store
+    instead of unpickling its own copy of every chunk.
+    """
+
+    def __init__(self, documents: Mapping[str, Document]):
+        self.documents = documents
+
+    def search(self, search: str) -> str | Document:
+        if search not in self.documents:
+            return f"ID {search} not found."
+        return self.documents[search]
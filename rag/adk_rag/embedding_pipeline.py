@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .config import RAGConfig
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """Rough token count (~4 characters per token) for rate budgeting."""
+    return sum(len(text) // 4 + 1 for text in texts)
+
+
+class RateLimiter:
+    """
+    Thread-safe token-bucket limiter on requests and tokens per minute.
+
+    Each budget refills continuously at ``limit / 60`` per second up to one
+    minute's worth. A limit of 0 disables that budget.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(
+            self.requests_per_minute,
+            self._requests + elapsed * self.requests_per_minute / 60.0,
+        )
+        self._tokens = min(
+            self.tokens_per_minute,
+            self._tokens + elapsed * self.tokens_per_minute / 60.0,
+        )
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request of ``tokens`` tokens fits both budgets."""
+        # A request larger than a full minute's budget waits for a full bucket
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = (1 - self._requests) * 60.0 / self.requests_per_minute
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(
+                        wait, (tokens - self._tokens) * 60.0 / self.tokens_per_minute
+                    )
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+            self._sleep(wait)
+
+
+# Exception class names of provider SDKs (openai, google-api-core, httpx,
+# requests) for rate limits, server errors, timeouts and connection errors
+TRANSIENT_ERROR_NAMES = (
+    "RateLimit",
+    "ResourceExhausted",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "Timeout",
+    "Connection",
+    "ConnectError",
+)
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    Whether a failed provider call is worth retrying.
+
+    True for HTTP 429 and 5xx responses, timeouts and connection errors;
+    False for everything else (auth, validation, oversized input), which
+    would fail again.
+    """
+    for error in (exc, exc.__cause__):
+        if error is None:
+            continue
+        status = getattr(error, "status_code", None)
+        if status is None:
+            status = getattr(getattr(error, "response", None), "status_code", None)
+        if status is None and isinstance(getattr(error, "code", None), int):
+            status = error.code
+        if isinstance(status, int):
+            return status == 429 or status >= 500
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        names = [cls.__name__ for cls in type(error).__mro__]
+        if any(marker in name for name in names for marker in TRANSIENT_ERROR_NAMES):
+            return True
+    return False
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that paces provider calls and retries failures.
+
+    Every ``embed_documents`` / ``embed_query`` call first takes its share of
+    the limiter's budget. Transient failures (``is_transient_error``) are
+    retried up to ``max_retries`` times with exponential backoff and full
+    jitter; other errors are raised immediately.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        limiter: RateLimiter | None = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.embeddings = embeddings
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+
+    def _call(self, func: Callable, arg, tokens: int):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return func(arg)
+            except Exception as exc:
+                if attempt == self.max_retries or not is_transient_error(exc):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+                print(f"Embedding request failed ({exc}); retrying in {delay:.1f}s")
+                self._sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._call(self.embeddings.embed_documents, texts, estimate_tokens(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(self.embeddings.embed_query, text, estimate_tokens([text]))
+
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Matryoshka truncation for providers without a ``dimensions`` option.
+
+    Keeps the first ``dimensions`` components of each vector and rescales
+    it to unit length, which is what the provider-side option does for
+    models trained with Matryoshka representation learning.
+    """
+
+    def __init__(self, embeddings: Embeddings, dimensions: int):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    def _truncate(self, vector: List[float]) -> List[float]:
+        head = np.asarray(vector[: self.dimensions], dtype=np.float32)
+        norm = float(np.linalg.norm(head))
+        return (head / norm if norm else head).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._truncate(vector) for vector in self.embeddings.embed_documents(texts)]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._truncate(self.embeddings.embed_query(text))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._truncate(await self.embeddings.aembed_query(text))
+
+
+def create_embeddings(config: RAGConfig) -> Embeddings:
+    """Create the embeddings client of the configured provider and output size."""
+    if config.llm_provider == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        embeddings = GoogleGenerativeAIEmbeddings(model=config.embedding_model)
+    elif config.llm_provider == "ollama":
+        from langchain_community.embeddings import OllamaEmbeddings
+
+        embeddings = OllamaEmbeddings(model=config.embedding_model)
+    else:
+        from langchain_openai import OpenAIEmbeddings
+
+        # OpenAI truncates server-side (Matryoshka) via ``dimensions``
+        return OpenAIEmbeddings(
+            model=config.embedding_model, dimensions=config.embedding_dimensions or None
+        )
+
+    if config.embedding_dimensions:
+        embeddings = TruncatedEmbeddings(embeddings, config.embedding_dimensions)
+    return embeddings
+
+
+def embedding_model_key(model: str, dimensions: int = 0) -> str:
+    """Cache key of an embedding model at a given output size (0 = native)."""
+    return f"{model}@{dimensions}" if dimensions else model
+
+
+def _batched(documents: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    batch: List[Document] = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embed_in_batches(
+    embeddings: Embeddings,
+    documents: Iterable[Document],
+    batch_size: int = 64,
+    concurrency: int = 4,
+) -> Iterator[Tuple[List[Document], List[List[float]]]]:
+    """
+    Embed a stream of documents in concurrent batches.
+
+    ``documents`` is consumed lazily, so chunking can still be producing
+    while earlier batches are embedded. At most ``concurrency`` requests are
+    in flight, plus as many queued, and batches are yielded in input order
+    as soon as they and all earlier batches are done.
+    """
+    batch_size = max(1, batch_size)
+    concurrency = max(1, concurrency)
+    pending: Deque[Tuple[List[Document], Future]] = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rag-embed") as pool:
+        for batch in _batched(documents, batch_size):
+            texts = [doc.page_content for doc in batch]
+            pending.append((batch, pool.submit(embeddings.embed_documents, texts)))
+
+            # Bound memory: wait for the oldest batch once the queue is full
+            while len(pending) >= 2 * concurrency or (pending and pending[0][1].done()):
+                done_batch, future = pending.popleft()
+                yield done_batch, future.result()
+
+        while pending:
+            done_batch, future = pending.popleft()
+            yield done_batch, future.result()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+ScoredDocuments = List[Tuple[Document, float]]
+
+
+def _normalize_scores(results: ScoredDocuments) -> List[float]:
+    """Min-max normalize leg scores to [0, 1] (higher is better)."""
+    if not results:
+        return []
+    scores = [score for _, score in results]
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    return [(score - low) / (high - low) for score in scores]
+
+
+def reciprocal_rank_fusion(
+    legs: Dict[str, ScoredDocuments],
+    weights: Dict[str, float],
+    k: int = 60,
+) -> ScoredDocuments:
+    """
+    Fuse ranked lists with weighted Reciprocal Rank Fusion.
+
+    Each document scores ``sum(weight / (k + rank))`` over the legs that
+    returned it, so only rank positions matter, not raw score scales.
+    """
+    fused: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+
+    for name, results in legs.items():
+        weight = weights.get(name, 1.0)
+        for rank, (doc, _score) in enumerate(results, start=1):
+            key = doc.page_content
+            docs.setdefault(key, doc)
+            fused[key] = fused.get(key, 0.0) + weight / (k + rank)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [(docs[key], score) for key, score in ranked]
+
+
+def weighted_score_fusion(
+    legs: Dict[str, ScoredDocuments],
+    weights: Dict[str, float],
+) -> ScoredDocuments:
+    """
+    Fuse ranked lists with a weighted sum of min-max normalized scores.
+
+    Leg scores must already be oriented so that higher means more relevant.
+    """
+    fused: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+
+    for name, results in legs.items():
+        weight = weights.get(name, 1.0)
+        for (doc, _score), norm in zip(results, _normalize_scores(results)):
+            key = doc.page_content
+            docs.setdefault(key, doc)
+            fused[key] = fused.get(key, 0.0) + weight * norm
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [(docs[key], score) for key, score in ranked]
+
+
+def fuse_results(
+    legs: Dict[str, ScoredDocuments],
+    weights: Dict[str, float],
+    method: str = "rrf",
+    rrf_k: int = 60,
+) -> ScoredDocuments:
+    """Fuse retrieval legs into one deduplicated list ranked by fused score."""
+    if method == "weighted":
+        return weighted_score_fusion(legs, weights)
+    if method != "rrf":
+        print(f"Unknown fusion method '{method}', falling back to rrf")
+    return reciprocal_rank_fusion(legs, weights, k=rrf_k)
+
+
+def leg_agreement(
+    legs: Dict[str, ScoredDocuments], fused: ScoredDocuments, top_n: int
+) -> Dict[str, Any]:
+    """
+    Agreement features of the retrieval legs, used to gate reranking.
+
+    ``overlap`` is the share of the legs' top ``top_n`` chunks returned by
+    every leg, ``top1_agree`` whether all legs rank the same chunk first, and
+    ``margin`` the relative fused-score drop from rank 1 to rank
+    ``top_n + 1`` (1.0 when nothing ranks below the cut).
+    """
+    ranked = [results for results in legs.values() if results]
+    if len(ranked) < 2 or top_n <= 0:
+        return {"overlap": 0.0, "top1_agree": False, "margin": 0.0}
+
+    tops = [[doc.page_content for doc, _score in results[:top_n]] for results in ranked]
+    shared = set(tops[0]).intersection(*tops[1:])
+    overlap = len(shared) / max(len(top) for top in tops)
+    top1_agree = all(top[0] == tops[0][0] for top in tops)
+
+    margin = 1.0
+    if len(fused) > top_n and fused[0][1] > 0:
+        margin = (fused[0][1] - fused[top_n][1]) / fused[0][1]
+    return {
+        "overlap": round(overlap, 4),
+        "top1_agree": top1_agree,
+        "margin": round(margin, 4),
+    }
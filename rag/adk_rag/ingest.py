@@ -1,32 +1,52 @@
 from __future__ import annotations
 
+import hashlib
 import json
-import pickle
+import os
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
-from .chunking import load_documents, load_documents_with_parents
+from .attributes import AttributeTable, chunk_key
+from .bm25 import BM25Index
+from .cache import CachedEmbeddings, SQLiteVectorStore
+from .chunking import (
+    iter_files_with_parents,
+    list_markdown_files,
+    load_documents,
+    load_documents_with_parents,
+)
 from .config import RAGConfig
+from .docstore import DocumentStore
+from .embedding_pipeline import (
+    RateLimitedEmbeddings,
+    RateLimiter,
+    create_embeddings,
+    embed_in_batches,
+    embedding_model_key,
+)
+from .vector_index import (
+    convert_index,
+    save_faiss_store,
+    set_search_defaults,
+    supports_removal,
+)
+
+INGEST_EMBEDDING_CACHE = "embedding_cache.sqlite"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Pre-docstore files, reported (never unpickled) when found without a store
+LEGACY_PICKLES = {"parents": "parent_docs.pkl", "chunks": "bm25_docs.pkl"}
 
 
 def _create_embeddings(config: RAGConfig) -> Embeddings:
     """Create embeddings instance based on provider."""
-    if config.llm_provider == "google":
-        from langchain_google_genai import GoogleGenerativeAIEmbeddings
-
-        return GoogleGenerativeAIEmbeddings(model=config.embedding_model)
-    elif config.llm_provider == "ollama":
-        from langchain_community.embeddings import OllamaEmbeddings
-
-        return OllamaEmbeddings(model=config.embedding_model)
-    else:
-        from langchain_openai import OpenAIEmbeddings
-
-        return OpenAIEmbeddings(model=config.embedding_model)
+    return create_embeddings(config)
 
 
 def ingest_documents(config: RAGConfig) -> List[Document]:
@@ -44,96 +64,206 @@ def ingest_documents_with_parents(
         Tuple of (child_chunks, parent_docs)
     """
     return load_documents_with_parents(
-        config.docs_path, config.chunk_size, config.chunk_overlap
+        config.docs_path, config.chunk_size, config.chunk_overlap, config.chunking_workers
+    )
+
+
+def _create_ingest_embeddings(config: RAGConfig) -> Embeddings:
+    """
+    Provider embeddings for ingestion.
+
+    Provider calls are rate limited and retried; the chunk embedding cache
+    sits in front when enabled so cache hits spend no rate budget.
+    """
+    embeddings: Embeddings = RateLimitedEmbeddings(
+        _create_embeddings(config),
+        RateLimiter(
+            config.embedding_requests_per_minute, config.embedding_tokens_per_minute
+        ),
+        max_retries=config.embedding_max_retries,
+    )
+    if not config.ingest_embedding_cache:
+        return embeddings
+
+    cache_path = Path(config.index_path) / INGEST_EMBEDDING_CACHE
+    return CachedEmbeddings(
+        embeddings,
+        model=embedding_model_key(config.embedding_model, config.embedding_dimensions),
+        max_size=0,
+        store=SQLiteVectorStore(str(cache_path)),
     )
 
 
-def build_vector_store(config: RAGConfig, documents: List[Document]) -> FAISS:
-    """Build a FAISS vector store from documents."""
-    embeddings = _create_embeddings(config)
-    return FAISS.from_documents(documents, embeddings)
+def _release_ingest_embeddings(store: FAISS, embeddings: Embeddings) -> None:
+    """Report cache reuse, close the cache file and detach it from the store."""
+    if not isinstance(embeddings, CachedEmbeddings):
+        return
+
+    stats = embeddings.stats()
+    print(
+        f"Embedding cache: reused {stats['document_hits']} vectors, "
+        f"embedded {stats['document_misses']} new chunks"
+    )
+    embeddings.store.close()
+    # The cache file is closed; later embedding calls go to the provider
+    store.embedding_function = embeddings.embeddings
+
+
+def _add_to_vector_store(
+    config: RAGConfig,
+    embeddings: Embeddings,
+    documents: Iterable[Document],
+    store: FAISS | None = None,
+) -> FAISS | None:
+    """
+    Embed documents through the batched pipeline and add them to a store.
+
+    Vectors are added as soon as each batch completes. A new store is
+    created from the first batch when ``store`` is None. Chunks carrying a
+    ``chunk_id`` are stored under that id so they can be replaced later.
+    """
+    for batch, vectors in embed_in_batches(
+        embeddings,
+        documents,
+        batch_size=config.embedding_batch_size,
+        concurrency=config.embedding_concurrency,
+    ):
+        text_embeddings = [(doc.page_content, vector) for doc, vector in zip(batch, vectors)]
+        metadatas = [doc.metadata for doc in batch]
+        ids = [doc.metadata.get("chunk_id") for doc in batch]
+        ids = ids if all(ids) else None
+        if store is None:
+            store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+        else:
+            store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    return store
+
+
+def build_vector_store(config: RAGConfig, documents: Iterable[Document]) -> FAISS:
+    """
+    Build a FAISS vector store from documents.
+
+    Chunks are embedded in concurrent, rate-limited batches. With
+    ``ingest_embedding_cache`` enabled, chunk vectors are looked up by
+    (embedding_model, sha256(text)) before calling the provider, so only new
+    or changed chunks are embedded.
+    """
+    embeddings = _create_ingest_embeddings(config)
+    try:
+        store = _add_to_vector_store(config, embeddings, documents)
+        if store is None:
+            raise ValueError("No documents to embed.")
+    except Exception:
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.store.close()
+        raise
+
+    _release_ingest_embeddings(store, embeddings)
+    _apply_index_factory(config, store)
+    return store
+
+
+def _apply_index_factory(config: RAGConfig, store: FAISS) -> None:
+    """Rebuild the flat index with ``faiss_index_factory`` (training it if needed)."""
+    factory = config.faiss_index_factory.strip()
+    if not factory or factory == "Flat":
+        return
+    try:
+        store.index = convert_index(store.index, factory, config.faiss_train_size)
+    except RuntimeError as exc:
+        print(f"Could not build FAISS index '{factory}' ({exc}); keeping a flat index.")
+        return
+    set_search_defaults(store.index, k_factor=config.faiss_refine_k_factor)
+    print(f"Built FAISS index '{factory}' over {store.index.ntotal} vectors")
 
 
 def save_vector_store(store: FAISS, index_path: str) -> None:
     """Save FAISS vector store to disk."""
     Path(index_path).mkdir(parents=True, exist_ok=True)
-    store.save_local(index_path)
+    save_faiss_store(store, index_path)
 
 
 def save_parent_docs(parent_docs: Dict[str, Document], index_path: str) -> None:
     """
     Save parent documents to disk for later retrieval.
 
-    Stores as pickle for full Document object preservation.
+    Stored in the compact document store (text blob + columnar metadata),
+    keyed by parent id.
     """
-    path = Path(index_path)
-    path.mkdir(parents=True, exist_ok=True)
+    DocumentStore.save(parent_docs.values(), index_path, "parents", ids=parent_docs.keys())
 
-    # Save as pickle for full fidelity
-    pickle_path = path / "parent_docs.pkl"
-    with open(pickle_path, "wb") as f:
-        pickle.dump(parent_docs, f)
-
-    # Also save a JSON index for debugging/inspection
-    json_path = path / "parent_docs_index.json"
-    index_data = {
-        pid: {
-            "source": doc.metadata.get("source", ""),
-            "breadcrumb": doc.metadata.get("breadcrumb", ""),
-            "tags": doc.metadata.get("tags", ""),
-            "content_preview": doc.page_content[:200] + "..."
-            if len(doc.page_content) > 200
-            else doc.page_content,
-        }
-        for pid, doc in parent_docs.items()
-    }
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(index_data, f, indent=2)
+
+def load_document_store(index_path: str, name: str) -> DocumentStore | None:
+    """Open a saved document store, noting when only a legacy pickle exists."""
+    store = DocumentStore.load(index_path, name)
+    legacy = LEGACY_PICKLES.get(name)
+    if store is None and legacy and (Path(index_path) / legacy).exists():
+        print(
+            f"Found legacy {legacy}; pickled documents are no longer loaded. "
+            "Re-run ingestion to rebuild the index."
+        )
+    return store
 
 
 def load_parent_docs(index_path: str) -> Dict[str, Document]:
     """Load parent documents from disk."""
-    pickle_path = Path(index_path) / "parent_docs.pkl"
-    if not pickle_path.exists():
+    store = load_document_store(index_path, "parents")
+    if store is None:
         return {}
-
-    with open(pickle_path, "rb") as f:
-        return pickle.load(f)
+    parent_docs = dict(zip(store.ids or [], store))
+    store.close()
+    return parent_docs
 
 
 def save_bm25_data(documents: List[Document], index_path: str) -> None:
     """
-    Save document data needed to reconstruct BM25 retriever.
+    Save the documents behind the BM25 index.
 
-    BM25Retriever cannot be pickled directly, so we store the
-    document contents and metadata to reconstruct it at query time.
+    Positions in the store are the document ids used by the prebuilt
+    index from ``save_bm25_index``; chunk ids are stored alongside so the
+    query server can resolve FAISS hits from the same store.
     """
-    path = Path(index_path)
-    path.mkdir(parents=True, exist_ok=True)
-
-    bm25_path = path / "bm25_docs.pkl"
-    # Store serializable representation
-    docs_data = [
-        {"page_content": doc.page_content, "metadata": doc.metadata}
-        for doc in documents
-    ]
-    with open(bm25_path, "wb") as f:
-        pickle.dump(docs_data, f)
+    DocumentStore.save(
+        documents, index_path, "chunks", ids=[chunk_key(doc) for doc in documents]
+    )
 
 
 def load_bm25_docs(index_path: str) -> List[Document]:
     """Load documents for BM25 reconstruction."""
-    bm25_path = Path(index_path) / "bm25_docs.pkl"
-    if not bm25_path.exists():
+    store = load_document_store(index_path, "chunks")
+    if store is None:
         return []
+    documents = list(store)
+    store.close()
+    return documents
 
-    with open(bm25_path, "rb") as f:
-        docs_data = pickle.load(f)
 
-    return [
-        Document(page_content=d["page_content"], metadata=d["metadata"])
-        for d in docs_data
-    ]
+def save_bm25_index(documents: List[Document], index_path: str) -> None:
+    """
+    Build and save a ready-to-query BM25 inverted index.
+
+    The query side memory-maps it instead of re-tokenizing the corpus.
+    Document ids follow the order of ``save_bm25_data``.
+    """
+    BM25Index.from_texts(doc.page_content for doc in documents).save(index_path)
+
+
+def save_attributes(
+    documents: List[Document], parent_docs: Dict[str, Document], index_path: str
+) -> None:
+    """
+    Save compact per-chunk and per-parent attribute arrays.
+
+    Language, content type, project area and source are stored as integer
+    codes so the query path filters without scanning text. Chunk rows
+    follow the order of ``save_bm25_data``.
+    """
+    AttributeTable.from_documents(
+        documents, [chunk_key(doc) for doc in documents]
+    ).save(index_path, "chunks")
+    AttributeTable.from_documents(
+        list(parent_docs.values()), list(parent_docs)
+    ).save(index_path, "parents")
 
 
 def save_ingestion_metadata(
@@ -151,6 +281,7 @@ def save_ingestion_metadata(
         "embedding_model": config.embedding_model,
         "use_hybrid_retrieval": config.use_hybrid_retrieval,
         "docs_path": config.docs_path,
+        "created_at": datetime.now(timezone.utc).isoformat(),
     }
 
     meta_path = path / "ingestion_metadata.json"
@@ -158,46 +289,255 @@ def save_ingestion_metadata(
         json.dump(metadata, f, indent=2)
 
 
-def run_ingestion(config: RAGConfig) -> int:
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ingestion_fingerprint(config: RAGConfig) -> Dict[str, Any]:
+    """Settings that invalidate every stored chunk when they change."""
+    return {
+        "docs_path": config.docs_path,
+        "chunk_size": config.chunk_size,
+        "chunk_overlap": config.chunk_overlap,
+        "llm_provider": config.llm_provider,
+        "embedding_model": config.embedding_model,
+        "embedding_dimensions": config.embedding_dimensions,
+        "faiss_index_factory": config.faiss_index_factory,
+    }
+
+
+def _manifest_entry(
+    file_path: str, chunks: List[Document], parents: Dict[str, Document]
+) -> Dict[str, Any]:
+    return {
+        "sha256": _file_sha256(file_path),
+        "chunk_ids": [chunk.metadata["chunk_id"] for chunk in chunks],
+        "parent_ids": list(parents),
+    }
+
+
+def save_manifest(
+    config: RAGConfig, files: Dict[str, Dict[str, Any]], index_path: str
+) -> None:
     """
-    Run the full ingestion pipeline.
+    Save the per-file manifest used by incremental ingestion.
 
-    For hybrid retrieval (default), creates:
-    - FAISS vector index
-    - Parent documents pickle
-    - BM25 document data
+    Maps each markdown file (relative to ``docs_path``) to its content hash
+    and the chunk ids (also the FAISS docstore ids) and parent ids it produced.
+    """
+    path = Path(index_path)
+    path.mkdir(parents=True, exist_ok=True)
 
-    Returns:
-        Number of chunks ingested.
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "fingerprint": _ingestion_fingerprint(config),
+        "files": files,
+    }
+    with open(path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def load_manifest(index_path: str) -> Dict[str, Any] | None:
+    """Load the ingestion manifest, or None if the index predates it."""
+    manifest_path = Path(index_path) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _save_hybrid_index(
+    config: RAGConfig,
+    store: FAISS,
+    documents: List[Document],
+    parent_docs: Dict[str, Document],
+    files: Dict[str, Dict[str, Any]],
+) -> None:
+    """Write every hybrid index artifact for the current corpus."""
+    save_vector_store(store, config.index_path)
+
+    # Save parent documents for context expansion
+    save_parent_docs(parent_docs, config.index_path)
+
+    # Save BM25 data and prebuilt index for hybrid retrieval
+    save_bm25_data(documents, config.index_path)
+    save_bm25_index(documents, config.index_path)
+    save_attributes(documents, parent_docs, config.index_path)
+
+    # Save metadata and the manifest for incremental runs
+    save_ingestion_metadata(
+        config, len(documents), len(parent_docs), config.index_path
+    )
+    save_manifest(config, files, config.index_path)
+
+    print(f"Saved {len(parent_docs)} parent documents")
+    print(f"Saved BM25 data for {len(documents)} chunks")
+
+
+def _chunk_files(
+    config: RAGConfig,
+    file_paths: Iterable[str],
+    documents: List[Document],
+    parent_docs: Dict[str, Document],
+    files: Dict[str, Dict[str, Any]],
+) -> Iterator[Document]:
     """
-    if config.use_hybrid_retrieval:
-        # Use new parent-child chunking
-        documents, parent_docs = ingest_documents_with_parents(config)
+    Chunk files and yield their chunks as each file completes.
 
-        if not documents:
-            return 0
+    Chunks, parents and manifest entries are also recorded into the given
+    containers, so embedding can consume the stream while chunking runs.
+    """
+    for file_path, chunks, parents in iter_files_with_parents(
+        file_paths, config.chunk_size, config.chunk_overlap, config.chunking_workers
+    ):
+        documents.extend(chunks)
+        parent_docs.update(parents)
+        rel_path = os.path.relpath(file_path, config.docs_path)
+        files[rel_path] = _manifest_entry(file_path, chunks, parents)
+        yield from chunks
+
+
+def _run_full_ingestion(config: RAGConfig) -> int:
+    documents: List[Document] = []
+    parent_docs: Dict[str, Document] = {}
+    files: Dict[str, Dict[str, Any]] = {}
+
+    chunk_stream = _chunk_files(
+        config, list_markdown_files(config.docs_path), documents, parent_docs, files
+    )
+    try:
+        store = build_vector_store(config, chunk_stream)
+    except ValueError:
+        if documents:
+            raise
+        return 0
 
-        # Build and save vector store
-        store = build_vector_store(config, documents)
-        save_vector_store(store, config.index_path)
+    _save_hybrid_index(config, store, documents, parent_docs, files)
+    return len(documents)
 
-        # Save parent documents for context expansion
-        save_parent_docs(parent_docs, config.index_path)
 
-        # Save BM25 data for hybrid retrieval
-        save_bm25_data(documents, config.index_path)
+def _run_incremental_ingestion(config: RAGConfig) -> int:
+    """
+    Apply only the changes since the last run, driven by per-file hashes.
 
-        # Save metadata
-        save_ingestion_metadata(
-            config, len(documents), len(parent_docs), config.index_path
+    Vectors, parents and BM25 entries of removed or changed files are
+    deleted; added or changed files are chunked and added. The BM25 index
+    is rebuilt from the updated chunk list because IDF and average document
+    length depend on the whole corpus (this needs no embedding calls).
+    Falls back to a full run when there is no usable manifest.
+    """
+    manifest = load_manifest(config.index_path)
+    if manifest is None or manifest["fingerprint"] != _ingestion_fingerprint(config):
+        print("No compatible manifest found; running full ingestion.")
+        return _run_full_ingestion(config)
+
+    previous: Dict[str, Dict[str, Any]] = manifest["files"]
+    current = {
+        os.path.relpath(file_path, config.docs_path): file_path
+        for file_path in list_markdown_files(config.docs_path)
+    }
+    current_hashes = {rel: _file_sha256(path) for rel, path in current.items()}
+
+    removed = [rel for rel in previous if rel not in current]
+    changed = [
+        rel
+        for rel in current
+        if rel in previous and previous[rel]["sha256"] != current_hashes[rel]
+    ]
+    added = [rel for rel in current if rel not in previous]
+    print(f"Incremental: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+
+    if not (added or changed or removed):
+        return sum(len(entry["chunk_ids"]) for entry in previous.values())
+
+    embeddings = _create_ingest_embeddings(config)
+    try:
+        store = FAISS.load_local(
+            config.index_path, embeddings, allow_dangerous_deserialization=True
         )
+    except Exception as exc:
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.store.close()
+        print(f"Could not load existing index ({exc}); running full ingestion.")
+        return _run_full_ingestion(config)
+    if (removed or changed) and not supports_removal(store.index):
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.store.close()
+        print("FAISS index does not support deleting vectors; running full ingestion.")
+        return _run_full_ingestion(config)
+
+    parent_docs = load_parent_docs(config.index_path)
+    documents = load_bm25_docs(config.index_path)
+    files = dict(previous)
+
+    # Drop entries of removed and changed files
+    stale_chunk_ids: set = set()
+    for rel in removed + changed:
+        entry = files.pop(rel)
+        stale_chunk_ids.update(entry["chunk_ids"])
+        for parent_id in entry["parent_ids"]:
+            parent_docs.pop(parent_id, None)
+    if stale_chunk_ids:
+        store.delete(list(stale_chunk_ids))
+        documents = [
+            doc for doc in documents if doc.metadata.get("chunk_id") not in stale_chunk_ids
+        ]
+
+    # Chunk and add new versions
+    chunk_stream = _chunk_files(
+        config,
+        [current[rel] for rel in sorted(added + changed)],
+        documents,
+        parent_docs,
+        files,
+    )
+    try:
+        _add_to_vector_store(config, embeddings, chunk_stream, store)
+    except Exception:
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.store.close()
+        raise
+    _release_ingest_embeddings(store, embeddings)
 
-        print(f"Saved {len(parent_docs)} parent documents")
-        print(f"Saved BM25 data for {len(documents)} chunks")
+    if not documents:
+        return 0
 
-        return len(documents)
+    _save_hybrid_index(config, store, documents, parent_docs, files)
+    return len(documents)
+
+
+def run_ingestion(config: RAGConfig, incremental: bool = False) -> int:
+    """
+    Run the full ingestion pipeline.
+
+    For hybrid retrieval (default), creates:
+    - FAISS vector index
+    - Parent and chunk document stores
+    - BM25 document data and inverted index
+    - A manifest of file hashes and the ids each file produced
+
+    With ``incremental=True`` only added, changed or removed files are
+    processed (hybrid mode only).
+
+    Returns:
+        Number of chunks in the index.
+    """
+    if config.use_hybrid_retrieval:
+        if incremental:
+            return _run_incremental_ingestion(config)
+        return _run_full_ingestion(config)
     else:
         # Legacy mode: simple chunking, vector-only retrieval
+        if incremental:
+            print("Incremental ingestion requires hybrid mode; running full ingestion.")
         documents = ingest_documents(config)
         if not documents:
             return 0
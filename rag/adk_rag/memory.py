@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import gc
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+
+GC_POLICIES = ("off", "always", "rss", "periodic")
+
+# Minimum seconds between two RSS-triggered collections, so a heap that
+# stays above the threshold is not collected on every query
+RSS_COLLECT_COOLDOWN = 30.0
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (0.0 if it cannot be read)."""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class MemoryManager:
+    """
+    Explicit garbage-collection policy for the query path.
+
+    - ``off``: never collect explicitly; CPython's generational GC runs as usual
+    - ``always``: full collection after every query (previous behaviour)
+    - ``rss``: full collection after a query once RSS exceeds ``rss_threshold_mb``
+    - ``periodic``: full collection every ``interval`` seconds on a background thread
+
+    Time spent in explicit collections is recorded for ``stats()``. The async
+    query path calls ``after_query`` in a worker thread; the collection still
+    holds the GIL, so ``always`` and ``rss`` briefly pause other sessions of
+    the process, which ``freeze()`` keeps short.
+    Independently of the policy, ``freeze()`` exempts the loaded indexes
+    from collection so each collection stays cheap. It acts on the whole
+    process, so only a server entry point should call it.
+    """
+
+    def __init__(
+        self,
+        policy: str = "off",
+        rss_threshold_mb: float = 2048.0,
+        interval: float = 300.0,
+        rss_reader: Callable[[], float] = current_rss_mb,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if policy not in GC_POLICIES:
+            print(f"Unknown gc_policy '{policy}', using 'off'.")
+            policy = "off"
+        self.policy = policy
+        self.rss_threshold_mb = rss_threshold_mb
+        self.interval = interval
+        self._rss_reader = rss_reader
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_collect = float("-inf")
+        self._collections = 0
+        self._collected_objects = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+        self._last_ms = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        if policy == "periodic" and interval > 0:
+            self._thread = threading.Thread(
+                target=self._run_periodic, name="rag-gc", daemon=True
+            )
+            self._thread.start()
+
+    def collect(self) -> float:
+        """Run a full collection and return its duration in milliseconds."""
+        start = time.perf_counter()
+        collected = gc.collect()
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self._last_collect = self._clock()
+            self._collections += 1
+            self._collected_objects += collected
+            self._total_ms += elapsed_ms
+            self._max_ms = max(self._max_ms, elapsed_ms)
+            self._last_ms = elapsed_ms
+        return elapsed_ms
+
+    def freeze(self) -> None:
+        """
+        Move every object alive now (the loaded indexes) out of GC tracking.
+
+        Later collections, explicit or automatic, then only scan objects
+        created after loading. Garbage is collected first so it is not
+        pinned forever.
+        """
+        gc.collect()
+        gc.freeze()
+
+    def after_query(self) -> None:
+        """Hook called once a query has finished."""
+        if self.policy == "always":
+            self.collect()
+        elif self.policy == "rss":
+            if self._clock() - self._last_collect < RSS_COLLECT_COOLDOWN:
+                return
+            if self._rss_reader() > self.rss_threshold_mb:
+                self.collect()
+
+    def _run_periodic(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.collect()
+
+    def stop(self) -> None:
+        """Stop the periodic collector thread, if any."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "collections": self._collections,
+                "collected_objects": self._collected_objects,
+                "total_ms": round(self._total_ms, 1),
+                "max_ms": round(self._max_ms, 1),
+                "last_ms": round(self._last_ms, 1),
+                "frozen_objects": gc.get_freeze_count(),
+                "rss_mb": round(self._rss_reader(), 1),
+            }
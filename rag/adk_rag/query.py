@@ -1,36 +1,70 @@
 from __future__ import annotations
 
-import gc
-import json
+import asyncio
 import os
-import re
-from dataclasses import dataclass
-from typing import Any, Dict, List
-
-from langchain_community.retrievers import BM25Retriever
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Sequence,
+    Tuple,
+)
+
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseChatModel
 
+from .attributes import AttributeTable, chunk_key
+from .bm25 import BM25Index
+from .cache import (
+    CachedEmbeddings,
+    RerankScoreCache,
+    SemanticCache,
+    SQLiteVectorStore,
+    content_hash,
+)
 from .config import RAGConfig
-from .ingest import load_bm25_docs, load_parent_docs
+from .context import ContextSection, pack_context, strip_chunk_tags, token_counter
+from .docstore import DocumentMap, DocumentStore
+from .embedding_pipeline import create_embeddings, embedding_model_key
+from .fusion import ScoredDocuments, fuse_results, leg_agreement
+from .ingest import load_document_store
+from .memory import MemoryManager
+from .rerankers import (
+    DEFAULT_CROSS_ENCODER_MODEL,
+    DEFAULT_FLASHRANK_MODEL,
+    CachedReranker,
+    CrossEncoderReranker,
+    FlashRankReranker,
+    LLMReranker,
+    Reranker,
+)
+from .vector_index import load_faiss_store, search_parameters, supports_selectors
+
+
+# Over-fetch factor for filtering vector hits after the search, for indexes
+# whose search does not accept an ID selector
+VECTOR_POSTFILTER_FACTOR = 4
 
 
 def _create_embeddings(config: RAGConfig) -> Embeddings:
     """Create embeddings instance based on provider."""
-    if config.llm_provider == "google":
-        from langchain_google_genai import GoogleGenerativeAIEmbeddings
-
-        return GoogleGenerativeAIEmbeddings(model=config.embedding_model)
-    elif config.llm_provider == "ollama":
-        from langchain_community.embeddings import OllamaEmbeddings
-
-        return OllamaEmbeddings(model=config.embedding_model)
-    else:
-        from langchain_openai import OpenAIEmbeddings
-
-        return OpenAIEmbeddings(model=config.embedding_model)
+    return create_embeddings(config)
 
 
 def _create_llm(config: RAGConfig, temperature: float | None = None) -> BaseChatModel:
@@ -67,59 +101,346 @@ def _create_rerank_llm(config: RAGConfig) -> BaseChatModel:
         return ChatOpenAI(model=config.rerank_model, temperature=0)
 
 
+def _create_reranker(
+    config: RAGConfig, detect_language: Callable[[str], str]
+) -> Reranker | None:
+    """
+    Create the reranker selected by ``config.reranker``.
+
+    Returns None (candidates keep their fused order) when a local backend
+    cannot be loaded, e.g. its package is not installed. With
+    ``rerank_cache_size`` the reranker is wrapped in a score cache.
+    """
+    backend = config.reranker
+    if backend in ("cross_encoder", "flashrank"):
+        try:
+            if backend == "cross_encoder":
+                model = config.reranker_model or DEFAULT_CROSS_ENCODER_MODEL
+                reranker: Reranker = CrossEncoderReranker(
+                    model,
+                    max_length=config.rerank_max_length,
+                    batch_size=config.rerank_batch_size,
+                    workers=config.rerank_workers,
+                    backend=config.cross_encoder_backend,
+                )
+            else:
+                model = config.reranker_model or DEFAULT_FLASHRANK_MODEL
+                reranker = FlashRankReranker(
+                    model,
+                    max_length=config.rerank_max_length,
+                    batch_size=config.rerank_batch_size,
+                    workers=config.rerank_workers,
+                )
+        except Exception as exc:
+            print(f"Reranker '{backend}' unavailable ({exc}); keeping fused order.")
+            return None
+    else:
+        if backend != "llm":
+            print(f"Unknown reranker '{backend}', using 'llm'.")
+        model = config.rerank_model
+        reranker = LLMReranker(
+            _create_rerank_llm(config),
+            detect_language,
+            shard_size=config.llm_rerank_shard_size,
+            concurrency=config.llm_rerank_concurrency,
+        )
+
+    if config.rerank_cache_size <= 0:
+        return reranker
+    # Local models truncate at rerank_max_length, which changes their scores
+    key_model = f"{reranker.name}:{model}:{config.rerank_max_length}"
+    cache = RerankScoreCache(config.rerank_cache_size, config.rerank_cache_ttl)
+    return CachedReranker(reranker, cache, key_model)
+
+
+def _timed(func: Callable[[str], ScoredDocuments], query: str) -> Tuple[ScoredDocuments, float]:
+    """Run a retrieval leg and return its results with elapsed milliseconds."""
+    start = time.perf_counter()
+    results = func(query)
+    return results, (time.perf_counter() - start) * 1000.0
+
+
 @dataclass
 class RAGResponse:
     answer: str
     contexts: List[str]
     sources: List[str]
+    metadata: Dict[str, Any] = field(default_factory=dict)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
             "answer": self.answer,
             "contexts": self.contexts,
             "sources": self.sources,
+            "metadata": self.metadata,
         }
 
 
 class RAGSystem:
     def __init__(self, config: RAGConfig):
         self.config = config
-        self.embeddings = _create_embeddings(config)
-        self.vector_store = self._load_vector_store()
+        self.embeddings = self._wrap_embeddings(_create_embeddings(config))
+        chunk_store = None
+        if config.use_hybrid_retrieval:
+            # Memory-mapped chunk store, shared by BM25 and the vector store
+            chunk_store = load_document_store(config.index_path, "chunks")
+        self.vector_store = self._load_vector_store(chunk_store)
         self.llm = _create_llm(config)
 
         # Hybrid retrieval components
-        self.parent_docs: Dict[str, Document] = {}
-        self.bm25_retriever: BM25Retriever | None = None
-        self.rerank_llm: BaseChatModel | None = None
+        self.parent_docs: Mapping[str, Document] = {}
+        self.bm25_docs: Sequence[Document] = []
+        self.bm25_index: BM25Index | None = None
+        self.chunk_attributes: AttributeTable | None = None
+        self.parent_attributes: AttributeTable | None = None
+        self._vector_rows: np.ndarray | None = None
+        self._language_filters: Dict[Tuple[str, ...], Tuple[Any, np.ndarray]] = {}
+        self._selector_support: Tuple[Any, bool] | None = None
+        self.reranker: Reranker | None = None
+        self._gate_counts = {"skip": 0, "shrink": 0, "full": 0}
+        self._gate_lock = threading.Lock()
+        self._retrieval_executor: ThreadPoolExecutor | None = None
 
         if config.use_hybrid_retrieval:
-            self._initialize_hybrid_components()
+            self._initialize_hybrid_components(chunk_store)
 
-    def _load_vector_store(self) -> FAISS | None:
+        self.semantic_cache: SemanticCache | None = None
+        if config.use_semantic_cache:
+            self.semantic_cache = SemanticCache(
+                config.semantic_cache_size, config.semantic_cache_threshold
+            )
+            self._index_version = self._read_index_version()
+
+        self.memory = MemoryManager(
+            config.gc_policy, config.gc_rss_threshold_mb, config.gc_interval
+        )
+
+    def _wrap_embeddings(self, embeddings: Embeddings) -> Embeddings:
+        """Put the query embedding cache in front of the provider, if enabled."""
+        if self.config.embedding_cache_size <= 0:
+            return embeddings
+        store = None
+        if self.config.embedding_cache_path:
+            store = SQLiteVectorStore(self.config.embedding_cache_path)
+        return CachedEmbeddings(
+            embeddings,
+            model=embedding_model_key(
+                self.config.embedding_model, self.config.embedding_dimensions
+            ),
+            max_size=self.config.embedding_cache_size,
+            ttl=self.config.embedding_cache_ttl,
+            store=store,
+        )
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Counters of the caches in front of remote calls and of explicit GC."""
+        stats: Dict[str, Any] = {}
+        if isinstance(self.embeddings, CachedEmbeddings):
+            stats["embedding"] = self.embeddings.stats()
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        if isinstance(self.reranker, CachedReranker):
+            stats["rerank"] = self.reranker.cache.stats()
+        if self.config.rerank_gate:
+            with self._gate_lock:
+                stats["rerank_gate"] = dict(self._gate_counts)
+        stats["gc"] = self.memory.stats()
+        return stats
+
+    def warm_up(self, query_text: str = "How do I create an agent with tools?") -> Dict[str, float]:
+        """
+        Exercise every component once so the first real query pays no setup cost.
+
+        Embeds ``query_text`` with the provider (bypassing the query cache),
+        runs it through the vector and BM25 indexes, builds the default
+        language filter, loads the context tokenizer, sends a one-word prompt
+        to the answer LLM and scores one passage with the reranker. Returns
+        the milliseconds spent per step; raises if the index is missing or a
+        provider call fails.
+        """
+        if not self.vector_store:
+            raise RuntimeError("Vector index not found. Run ingestion first.")
+
+        timings: Dict[str, float] = {}
+
+        def timed(name: str, func: Callable[[], Any]) -> Any:
+            start = time.perf_counter()
+            result = func()
+            timings[f"{name}_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+            return result
+
+        embeddings = self.embeddings
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings = embeddings.embeddings
+        vector = timed("embedding", lambda: embeddings.embed_query(query_text))
+        timed(
+            "vector",
+            lambda: self.vector_store.similarity_search_with_score_by_vector(
+                vector, k=self.config.top_k_vector
+            ),
+        )
+        if self.bm25_index is not None:
+            timed("bm25", lambda: self.bm25_index.search(query_text, self.config.top_k_bm25))
+            if self.config.language_prefilter:
+                timed("language_filter", lambda: self._language_filter("Python"))
+        timed("tokenizer", lambda: token_counter(self.config.llm_model).count(query_text))
+        timed("llm", lambda: self.llm.invoke("Reply with OK."))
+        if self.reranker is not None:
+            # Loads local models / opens the rerank LLM connection
+            warm_doc = Document(page_content=query_text)
+            timed("reranker", lambda: self.reranker.score(query_text, [warm_doc]))
+        return timings
+
+    def _read_index_version(self) -> str:
+        """Fingerprint of the ingestion run that produced the loaded index."""
+        meta_path = Path(self.config.index_path) / "ingestion_metadata.json"
+        if not meta_path.exists():
+            return "unknown"
+        return content_hash(meta_path.read_text(encoding="utf-8"))[:16]
+
+    def _semantic_cache_namespace(self, query_text: str) -> str:
+        """Scope cached answers to the index version and answer-shaping settings."""
+        cfg = self.config
+        return content_hash(
+            self._index_version,
+            cfg.llm_provider,
+            cfg.embedding_model,
+            cfg.llm_model,
+            cfg.rerank_model,
+            str(cfg.temperature),
+            str(cfg.use_hybrid_retrieval),
+            str(cfg.use_llm_reranking),
+            cfg.reranker,
+            cfg.reranker_model,
+            cfg.cross_encoder_backend,
+            str(cfg.rerank_max_length),
+            str(cfg.llm_rerank_shard_size),
+            # Retrieval, rerank gate and context packing shape the answer too
+            str(cfg.top_k_vector),
+            str(cfg.top_k_bm25),
+            str(cfg.faiss_nprobe),
+            str(cfg.faiss_ef_search),
+            str(cfg.faiss_refine_k_factor),
+            cfg.fusion_method,
+            str(cfg.weight_vector),
+            str(cfg.weight_bm25),
+            str(cfg.rrf_k),
+            str(cfg.fusion_top_n),
+            str(cfg.language_prefilter),
+            str(cfg.rerank_top_n),
+            str(cfg.rerank_gate),
+            str(cfg.rerank_gate_skip_overlap),
+            str(cfg.rerank_gate_min_margin),
+            str(cfg.rerank_gate_shrink_overlap),
+            str(cfg.rerank_gate_shrink_n),
+            str(cfg.context_token_budget),
+            str(cfg.context_section_max_tokens),
+            self._detect_requested_language(query_text),
+        )
+
+    def _load_vector_store(self, chunk_store: DocumentStore | None = None) -> FAISS | None:
+        documents = None
+        if chunk_store is not None and chunk_store.ids is not None:
+            documents = DocumentMap(chunk_store)
         try:
-            return FAISS.load_local(
+            return load_faiss_store(
                 self.config.index_path,
                 self.embeddings,
-                allow_dangerous_deserialization=True,
+                mmap=self.config.faiss_mmap,
+                ef_search=self.config.faiss_ef_search,
+                nprobe=self.config.faiss_nprobe,
+                k_factor=self.config.faiss_refine_k_factor,
+                documents=documents,
             )
         except Exception:
             return None
 
-    def _initialize_hybrid_components(self) -> None:
-        """Initialize BM25 retriever, parent docs, and reranker."""
-        # Load parent documents
-        self.parent_docs = load_parent_docs(self.config.index_path)
+    def _initialize_hybrid_components(self, chunk_store: DocumentStore | None = None) -> None:
+        """Initialize BM25 index, parent docs, and reranker."""
+        # Memory-map the document stores; documents are built on access
+        parent_store = load_document_store(self.config.index_path, "parents")
+        self.parent_docs = DocumentMap(parent_store) if parent_store is not None else {}
+        self.bm25_docs = chunk_store if chunk_store is not None else []
+
+        # Memory-map the prebuilt BM25 index
+        if self.bm25_docs:
+            self.bm25_index = BM25Index.load(self.config.index_path)
+            if self.bm25_index is None or self.bm25_index.n_docs != len(self.bm25_docs):
+                # Index predates the prebuilt BM25 format; build it in memory
+                print("Prebuilt BM25 index missing or stale; rebuilding in memory.")
+                self.bm25_index = BM25Index.from_texts(
+                    doc.page_content for doc in self.bm25_docs
+                )
+
+        # Attribute arrays for filtering without scanning document text
+        self.chunk_attributes = AttributeTable.load(self.config.index_path, "chunks")
+        if self.chunk_attributes is None or len(self.chunk_attributes) != len(self.bm25_docs):
+            self.chunk_attributes = AttributeTable.from_documents(
+                self.bm25_docs, [chunk_key(doc) for doc in self.bm25_docs]
+            )
+        self.parent_attributes = AttributeTable.load(self.config.index_path, "parents")
+        if self.parent_attributes is None or len(self.parent_attributes) != len(self.parent_docs):
+            self.parent_attributes = AttributeTable.from_documents(
+                list(self.parent_docs.values()), list(self.parent_docs)
+            )
+
+        if self.vector_store:
+            self._vector_rows = self._map_vector_rows()
 
-        # Load and build BM25 retriever
-        bm25_docs = load_bm25_docs(self.config.index_path)
-        if bm25_docs:
-            self.bm25_retriever = BM25Retriever.from_documents(bm25_docs)
-            self.bm25_retriever.k = self.config.top_k_bm25
+        # Shared pool for running the vector and BM25 legs concurrently
+        if self.config.concurrent_retrieval:
+            self._retrieval_executor = ThreadPoolExecutor(
+                max_workers=max(2, self.config.retrieval_workers),
+                thread_name_prefix="rag-retrieval",
+            )
 
-        # Initialize reranking LLM if enabled
+        # Initialize the reranker if enabled
         if self.config.use_llm_reranking:
-            self.rerank_llm = _create_rerank_llm(self.config)
+            self.reranker = _create_reranker(self.config, self._detect_requested_language)
+
+    def _map_vector_rows(self) -> np.ndarray:
+        """Chunk attribute row of every FAISS position (-1 when unknown)."""
+        store = self.vector_store
+        doc_ids = [store.index_to_docstore_id[pos] for pos in range(store.index.ntotal)]
+        rows = self.chunk_attributes.rows(doc_ids)
+        # Older indexes use random docstore ids; match those by content
+        for pos in np.flatnonzero(rows < 0):
+            doc = store.docstore.search(doc_ids[pos])
+            if isinstance(doc, Document):
+                rows[pos] = self.chunk_attributes.row(chunk_key(doc))
+        return rows
+
+    def _allowed_languages(self, requested_lang: str) -> Tuple[str, ...]:
+        # Include chunks with unknown language for Python (default) to avoid losing recall
+        return ("Python", "Unknown") if requested_lang == "Python" else (requested_lang,)
+
+    def _language_filter(self, requested_lang: str) -> Tuple[Any, np.ndarray]:
+        """FAISS ID selector and BM25 mask for a language, built once per language."""
+        allowed = self._allowed_languages(requested_lang)
+        cached = self._language_filters.get(allowed)
+        if cached is not None:
+            return cached
+
+        bm25_mask = self.chunk_attributes.mask("language", allowed)
+        vector_mask = np.zeros(0, dtype=bool)
+        if self._vector_rows is not None:
+            vector_mask = self.chunk_attributes.mask("language", allowed, self._vector_rows)
+            if "Unknown" in allowed:
+                vector_mask |= self._vector_rows < 0
+        selector = faiss.IDSelectorBatch(np.flatnonzero(vector_mask).astype(np.int64))
+
+        self._language_filters[allowed] = (selector, bm25_mask)
+        return selector, bm25_mask
+
+    def _index_supports_selectors(self, index: Any) -> bool:
+        """``supports_selectors`` for ``index``, probed once per index object."""
+        cached = self._selector_support
+        if cached is None or cached[0] is not index:
+            cached = self._selector_support = (index, supports_selectors(index))
+        return cached[1]
+
+    def _min_filtered_candidates(self) -> int:
+        return max(3, self.config.rerank_top_n)
 
     def _detect_requested_language(self, query: str) -> str:
         """Detect the programming language requested in the query."""
@@ -137,127 +458,437 @@ class RAGSystem:
         self, candidates: List[Document], requested_lang: str
     ) -> List[Document]:
         """Filter candidates to match the requested programming language."""
-        filtered = []
-
-        for doc in candidates:
-            # Extract language tag from chunk content
-            lang_match = re.search(r'\[LANG=(\w+)\]', doc.page_content)
-            chunk_lang = lang_match.group(1) if lang_match else "Unknown"
-
-            # Include chunks with unknown language for Python (default) to avoid losing recall
-            if requested_lang == "Python" and chunk_lang in ("Python", "Unknown"):
-                filtered.append(doc)
-            elif chunk_lang == requested_lang:
-                filtered.append(doc)
+        allowed = self._allowed_languages(requested_lang)
+        rows = self.chunk_attributes.rows(chunk_key(doc) for doc in candidates)
+        keep = self.chunk_attributes.mask("language", allowed, rows)
+        if requested_lang == "Python":
+            keep |= rows < 0
+        filtered = [doc for doc, matched in zip(candidates, keep) if matched]
 
         # Use filtered only if enough candidates remain
-        min_candidates = max(3, self.config.rerank_top_n)
-        if filtered and len(filtered) >= min_candidates:
+        if filtered and len(filtered) >= self._min_filtered_candidates():
             return filtered
 
         # Fallback to original candidates for recall preservation
         return candidates
 
-    def _hybrid_retrieve(self, query: str) -> List[Document]:
-        """Perform hybrid retrieval using vector + BM25 ensemble."""
-        candidates: List[Document] = []
-
-        # Vector retrieval
-        if self.vector_store:
-            vector_results = self.vector_store.similarity_search(
-                query, k=self.config.top_k_vector
+    def _query_vector(
+        self, query: str, embedded: Dict[str, List[float]] | None = None
+    ) -> List[float]:
+        """Embedding of ``query``, computed once per ``embedded`` memo."""
+        if embedded is None:
+            return self.embeddings.embed_query(query)
+        if query not in embedded:
+            embedded[query] = self.embeddings.embed_query(query)
+        return embedded[query]
+
+    async def _aquery_vector(
+        self, query: str, embedded: Dict[str, List[float]] | None = None
+    ) -> List[float]:
+        """Async counterpart of ``_query_vector``."""
+        if embedded is None:
+            return await self.embeddings.aembed_query(query)
+        if query not in embedded:
+            embedded[query] = await self.embeddings.aembed_query(query)
+        return embedded[query]
+
+    def _vector_search(
+        self,
+        query: str,
+        language: str | None = None,
+        embedded: Dict[str, List[float]] | None = None,
+    ) -> ScoredDocuments:
+        """Vector leg; L2 distances are mapped to (0, 1] so higher is better."""
+        vector = self._query_vector(query, embedded)
+        if language is None:
+            results = self.vector_store.similarity_search_with_score_by_vector(
+                vector, k=self.config.top_k_vector
             )
-            candidates.extend(vector_results)
-
-        # BM25 retrieval
-        if self.bm25_retriever:
-            bm25_results = self.bm25_retriever.invoke(query)
-            candidates.extend(bm25_results)
-
-        # Deduplicate by content hash
-        seen_content = set()
-        unique_candidates = []
-        for doc in candidates:
-            content_hash = hash(doc.page_content)
-            if content_hash not in seen_content:
-                seen_content.add(content_hash)
-                unique_candidates.append(doc)
-
-        return unique_candidates
-
-    def _llm_rerank(self, query: str, docs: List[Document]) -> List[Document]:
-        """Rerank candidates using LLM with enhanced prompt for multi-language & completeness."""
-        if not docs or not self.rerank_llm:
-            return docs[: self.config.rerank_top_n]
+            return [(doc, 1.0 / (1.0 + float(distance))) for doc, distance in results]
+        return self._filtered_vector_search(vector, language)
+
+    async def _avector_search(
+        self,
+        query: str,
+        language: str | None = None,
+        embedded: Dict[str, List[float]] | None = None,
+    ) -> ScoredDocuments:
+        """Async vector leg: awaits the embedding call, searches FAISS in a thread."""
+        vector = await self._aquery_vector(query, embedded)
+        if language is not None:
+            return await asyncio.to_thread(self._filtered_vector_search, vector, language)
+        results = await asyncio.to_thread(
+            self.vector_store.similarity_search_with_score_by_vector,
+            vector,
+            k=self.config.top_k_vector,
+        )
+        return [(doc, 1.0 / (1.0 + float(distance))) for doc, distance in results]
 
-        # Detect requested language for emphasis
-        requested_lang = self._detect_requested_language(query)
+    def _filtered_vector_search(
+        self, vector: List[float], language: str
+    ) -> ScoredDocuments:
+        """
+        Search only the FAISS positions of chunks in ``language``.
 
-        packed = []
-        for i, doc in enumerate(docs):
-            snippet = doc.page_content[:1400].replace('\n', ' ').strip()
+        Indexes that reject ID selectors (LSH) are searched for
+        ``VECTOR_POSTFILTER_FACTOR`` times more hits, which are then filtered.
+        """
+        store = self.vector_store
+        selector, _ = self._language_filter(language)
+        query = np.asarray([vector], dtype=np.float32)
+        if store._normalize_L2:
+            faiss.normalize_L2(query)
+        k = self.config.top_k_vector
+        if self._index_supports_selectors(store.index):
+            distances, positions = store.index.search(
+                query, k, params=search_parameters(store.index, selector)
+            )
+        else:
+            fetch = min(store.index.ntotal, k * VECTOR_POSTFILTER_FACTOR)
+            distances, positions = store.index.search(query, fetch)
+            keep = [
+                i for i, pos in enumerate(positions[0])
+                if pos >= 0 and selector.is_member(int(pos))
+            ][:k]
+            distances, positions = distances[:, keep], positions[:, keep]
+
+        results: ScoredDocuments = []
+        for distance, pos in zip(distances[0], positions[0]):
+            if pos < 0:
+                continue
+            doc = store.docstore.search(store.index_to_docstore_id[int(pos)])
+            if isinstance(doc, Document):
+                results.append((doc, 1.0 / (1.0 + float(distance))))
+        return results
+
+    def _bm25_search(self, query: str, language: str | None = None) -> ScoredDocuments:
+        """BM25 leg returning the top ``top_k_bm25`` documents with their scores."""
+        mask = self._language_filter(language)[1] if language is not None else None
+        hits = self.bm25_index.search(query, self.config.top_k_bm25, mask)
+        return [(self.bm25_docs[doc_id], score) for doc_id, score in hits]
+
+    async def _abm25_search(
+        self, query: str, language: str | None = None
+    ) -> ScoredDocuments:
+        return await asyncio.to_thread(self._bm25_search, query, language)
+
+    def _run_retrieval_legs(
+        self,
+        query: str,
+        legs: Dict[str, Tuple[Callable[[str], ScoredDocuments], float]],
+        stats: Dict[str, Any],
+    ) -> Dict[str, ScoredDocuments]:
+        """
+        Run retrieval legs, concurrently when a pool is available.
 
-            # Detect completeness (presence of full API definitions)
-            completeness_tag = "[COMPLETE_API]" if re.search(
-                r'\b(class|func|def|interface|type|package|func\s+main)\s+\w*',
-                snippet, re.I
-            ) else "[PARTIAL]"
+        A leg that raises or exceeds its timeout is dropped so the query
+        degrades to the remaining leg instead of failing. Per-leg timings
+        and status are recorded in ``stats``.
 
-            # Check if chunk matches requested language
-            lang = doc.metadata.get("language", "unknown").lower()
-            requested_lang_tag = "[REQUESTED_LANG]" if lang == requested_lang.lower() else ""
+        Returns:
+            Mapping of leg name to retrieved documents for successful legs.
+        """
+        results: Dict[str, ScoredDocuments] = {}
+
+        if self._retrieval_executor is None or len(legs) < 2:
+            for name, (search, _timeout) in legs.items():
+                start = time.perf_counter()
+                try:
+                    results[name], elapsed_ms = _timed(search, query)
+                    stats[name] = {"ms": round(elapsed_ms, 1), "status": "ok"}
+                except Exception as e:
+                    print(f"{name} retrieval failed: {e}")
+                    elapsed_ms = (time.perf_counter() - start) * 1000.0
+                    stats[name] = {"ms": round(elapsed_ms, 1), "status": "error"}
+            return results
+
+        started = time.perf_counter()
+        futures = {
+            name: self._retrieval_executor.submit(_timed, search, query)
+            for name, (search, _timeout) in legs.items()
+        }
+        for name, future in futures.items():
+            timeout = legs[name][1]
+            remaining = None
+            if timeout and timeout > 0:
+                remaining = max(0.0, timeout - (time.perf_counter() - started))
+            try:
+                results[name], elapsed_ms = future.result(timeout=remaining)
+                stats[name] = {"ms": round(elapsed_ms, 1), "status": "ok"}
+            except FuturesTimeoutError:
+                future.cancel()
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                print(f"{name} retrieval timed out after {elapsed_ms:.0f} ms")
+                stats[name] = {"ms": round(elapsed_ms, 1), "status": "timeout"}
+            except Exception as e:
+                print(f"{name} retrieval failed: {e}")
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                stats[name] = {"ms": round(elapsed_ms, 1), "status": "error"}
+
+        return results
+
+    def _hybrid_retrieve(
+        self,
+        query: str,
+        stats: Dict[str, Any] | None = None,
+        language: str | None = None,
+        embedded: Dict[str, List[float]] | None = None,
+    ) -> List[Document]:
+        """
+        Perform hybrid retrieval using vector + BM25 ensemble.
+
+        Both legs run concurrently so latency is bounded by the slower leg
+        rather than their sum. Their scored results are fused with
+        ``fusion_method`` using ``weight_vector`` / ``weight_bm25``, giving a
+        deduplicated list ordered by fused score. Per-leg timings are
+        written to ``stats``. With ``language``, both legs only search
+        chunks in that language. ``embedded`` memoizes the query embedding
+        across calls.
+        """
+        if stats is None:
+            stats = {}
 
-            tags = doc.metadata.get("tags", "")
-            breadcrumb = doc.metadata.get("breadcrumb", "")
+        legs: Dict[str, Tuple[Callable[[str], ScoredDocuments], float]] = {}
+        if self.vector_store:
+            search = self._vector_search
+            if language is not None or embedded is not None:
+                search = partial(self._vector_search, language=language, embedded=embedded)
+            legs["vector"] = (search, self.config.vector_timeout)
+        if self.bm25_index:
+            search = self._bm25_search
+            if language is not None:
+                search = partial(self._bm25_search, language=language)
+            legs["bm25"] = (search, self.config.bm25_timeout)
+
+        start = time.perf_counter()
+        results = self._run_retrieval_legs(query, legs, stats)
+        stats["total_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+
+        return self._fuse_legs(list(legs), results, stats)
+
+    async def _arun_retrieval_legs(
+        self,
+        query: str,
+        legs: Dict[str, Tuple[Callable[[str], Awaitable[ScoredDocuments]], float]],
+        stats: Dict[str, Any],
+    ) -> Dict[str, ScoredDocuments]:
+        """Async counterpart of ``_run_retrieval_legs``; legs run as concurrent tasks."""
+        results: Dict[str, ScoredDocuments] = {}
+
+        async def run_leg(name: str, search, timeout: float) -> None:
+            start = time.perf_counter()
+            try:
+                results[name] = await asyncio.wait_for(
+                    search(query), timeout if timeout and timeout > 0 else None
+                )
+                stats[name] = {"ms": round((time.perf_counter() - start) * 1000.0, 1), "status": "ok"}
+            except asyncio.TimeoutError:
+                elapsed_ms = (time.perf_counter() - start) * 1000.0
+                print(f"{name} retrieval timed out after {elapsed_ms:.0f} ms")
+                stats[name] = {"ms": round(elapsed_ms, 1), "status": "timeout"}
+            except Exception as e:
+                print(f"{name} retrieval failed: {e}")
+                elapsed_ms = (time.perf_counter() - start) * 1000.0
+                stats[name] = {"ms": round(elapsed_ms, 1), "status": "error"}
+
+        await asyncio.gather(
+            *(run_leg(name, search, timeout) for name, (search, timeout) in legs.items())
+        )
+        return results
+
+    async def _ahybrid_retrieve(
+        self,
+        query: str,
+        stats: Dict[str, Any] | None = None,
+        language: str | None = None,
+        embedded: Dict[str, List[float]] | None = None,
+    ) -> List[Document]:
+        """Async counterpart of ``_hybrid_retrieve``."""
+        if stats is None:
+            stats = {}
 
-            packed.append(
-                f"[{i}] {completeness_tag} {requested_lang_tag} Tags:{tags} Breadcrumb:{breadcrumb}\n{snippet}"
+        legs: Dict[str, Tuple[Callable[[str], Awaitable[ScoredDocuments]], float]] = {}
+        if self.vector_store:
+            legs["vector"] = (
+                partial(self._avector_search, language=language, embedded=embedded),
+                self.config.vector_timeout,
+            )
+        if self.bm25_index:
+            legs["bm25"] = (
+                partial(self._abm25_search, language=language),
+                self.config.bm25_timeout,
             )
 
-        prompt = (
-            "Role: ADK Expert Reranker.\n"
-            "Goal: Score each chunk from 0 to 100 for relevance to the query.\n"
-            "Prioritize chunks with:\n"
-            "- Exact API names matching the query\n"
-            "- Complete API definitions over partial snippets\n"
-            "- Code examples in the user's requested programming language\n"
-            "- Proper handling of multi-language snippets\n"
-            f"User Query: {query}\n\n"
-            "Chunks:\n" + "\n\n".join(packed) + "\n\n"
-            "Return JSON object with 'scores' mapping chunk IDs to numeric scores."
+        start = time.perf_counter()
+        results = await self._arun_retrieval_legs(query, legs, stats)
+        stats["total_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+
+        return self._fuse_legs(list(legs), results, stats)
+
+    def _retrieve_candidates(
+        self, query_text: str, requested_lang: str, stats: Dict[str, Any]
+    ) -> List[Document]:
+        """
+        Hybrid retrieval restricted to the requested language when enabled.
+
+        If too few chunks in that language match, retrieval is repeated
+        unfiltered so recall is preserved (as the post-filter always did),
+        reusing the query embedding; the filtered attempt's leg stats are
+        kept under ``stats["prefiltered"]``.
+        """
+        if not self.config.language_prefilter:
+            return self._hybrid_retrieve(query_text, stats)
+
+        embedded: Dict[str, List[float]] = {}
+        filtered_stats: Dict[str, Any] = {}
+        candidates = self._hybrid_retrieve(query_text, filtered_stats, requested_lang, embedded)
+        if len(candidates) >= self._min_filtered_candidates():
+            stats.update(filtered_stats)
+            stats["prefilter"] = requested_lang
+            return candidates
+        stats["prefilter"] = "fallback"
+        stats["prefiltered"] = filtered_stats
+        return self._hybrid_retrieve(query_text, stats, embedded=embedded)
+
+    async def _aretrieve_candidates(
+        self, query_text: str, requested_lang: str, stats: Dict[str, Any]
+    ) -> List[Document]:
+        """Async counterpart of ``_retrieve_candidates``."""
+        if not self.config.language_prefilter:
+            return await self._ahybrid_retrieve(query_text, stats)
+
+        embedded: Dict[str, List[float]] = {}
+        filtered_stats: Dict[str, Any] = {}
+        candidates = await self._ahybrid_retrieve(
+            query_text, filtered_stats, requested_lang, embedded
         )
+        if len(candidates) >= self._min_filtered_candidates():
+            stats.update(filtered_stats)
+            stats["prefilter"] = requested_lang
+            return candidates
+        stats["prefilter"] = "fallback"
+        stats["prefiltered"] = filtered_stats
+        return await self._ahybrid_retrieve(query_text, stats, embedded=embedded)
+
+    def _fuse_legs(
+        self,
+        names: List[str],
+        results: Dict[str, ScoredDocuments],
+        stats: Dict[str, Any],
+    ) -> List[Document]:
+        """Fuse the legs' scored results into one deduplicated ranking."""
+        for name in names:
+            stats[name]["count"] = len(results.get(name, []))
+
+        fused = fuse_results(
+            results,
+            weights={
+                "vector": self.config.weight_vector,
+                "bm25": self.config.weight_bm25,
+            },
+            method=self.config.fusion_method,
+            rrf_k=self.config.rrf_k,
+        )
+        stats["fusion"] = self.config.fusion_method
+        stats["agreement"] = leg_agreement(results, fused, self.config.rerank_top_n)
 
-        try:
-            response = self.rerank_llm.invoke(prompt)
-            match = re.search(r'\{.*\}', response.content, re.DOTALL)
+        return [doc for doc, _score in fused]
 
-            if not match:
-                return docs[: self.config.rerank_top_n]
+    def _gate_rerank(
+        self,
+        candidates: List[Document],
+        retrieval_stats: Dict[str, Any],
+        metadata: Dict[str, Any],
+    ) -> Tuple[List[Document], bool]:
+        """
+        Decide how much reranking the fused candidates need.
 
-            scores = json.loads(match.group(0)).get("scores", {})
-            ranked_indices = sorted(
-                range(len(docs)),
-                key=lambda i: float(scores.get(str(i), scores.get(i, 0))),
-                reverse=True,
-            )
-            return [docs[i] for i in ranked_indices[: self.config.rerank_top_n]]
+        With ``rerank_gate``, legs that agree strongly (same top chunk, top-n
+        overlap and fused margin above the skip thresholds) keep their fused
+        order without reranking; moderate overlap reranks only the first
+        ``rerank_gate_shrink_n`` candidates. Returns the candidates and
+        whether to rerank them.
+        """
+        if not self.config.rerank_gate or self.reranker is None or not candidates:
+            return candidates, True
+
+        cfg = self.config
+        agreement = retrieval_stats.get("agreement", {})
+        overlap = agreement.get("overlap", 0.0)
+        if (
+            agreement.get("top1_agree")
+            and overlap >= cfg.rerank_gate_skip_overlap
+            and agreement.get("margin", 0.0) >= cfg.rerank_gate_min_margin
+        ):
+            decision = "skip"
+        elif overlap >= cfg.rerank_gate_shrink_overlap:
+            decision = "shrink"
+        else:
+            decision = "full"
+
+        with self._gate_lock:
+            self._gate_counts[decision] += 1
+        metadata["rerank_gate"] = {"decision": decision, **agreement}
 
+        if decision == "skip":
+            return candidates[: cfg.rerank_top_n], False
+        if decision == "shrink":
+            return candidates[: max(cfg.rerank_gate_shrink_n, cfg.rerank_top_n)], True
+        return candidates, True
+
+    def _rerank(
+        self, query: str, docs: List[Document], metadata: Dict[str, Any]
+    ) -> List[Document]:
+        """Order candidates with the configured reranker, keeping the best ``rerank_top_n``."""
+        if not docs or self.reranker is None:
+            return docs[: self.config.rerank_top_n]
+
+        start = time.perf_counter()
+        try:
+            ranked = self.reranker.rerank(query, docs, self.config.rerank_top_n)
         except Exception as e:
             print(f"Reranking failed: {e}")
+            ranked = docs[: self.config.rerank_top_n]
+        metadata["rerank"] = {
+            "backend": self.reranker.name,
+            "ms": round((time.perf_counter() - start) * 1000.0, 1),
+        }
+        return ranked
+
+    async def _arerank(
+        self, query: str, docs: List[Document], metadata: Dict[str, Any]
+    ) -> List[Document]:
+        """Async counterpart of ``_rerank``."""
+        if not docs or self.reranker is None:
             return docs[: self.config.rerank_top_n]
 
+        start = time.perf_counter()
+        try:
+            ranked = await self.reranker.arerank(query, docs, self.config.rerank_top_n)
+        except Exception as e:
+            print(f"Reranking failed: {e}")
+            ranked = docs[: self.config.rerank_top_n]
+        metadata["rerank"] = {
+            "backend": self.reranker.name,
+            "ms": round((time.perf_counter() - start) * 1000.0, 1),
+        }
+        return ranked
+
     def _expand_to_parents(
         self, chunks: List[Document], requested_lang: str
     ) -> tuple[List[str], str]:
         """
         Expand retrieved chunks to their parent documents for broader context.
 
+        The block is packed within ``context_token_budget`` tokens; parents
+        longer than ``context_section_max_tokens`` (or the budget left) are
+        windowed around the matched chunk.
+
         Returns:
             Tuple of (context_list, formatted_context_block)
         """
-        final_contexts: List[str] = []
+        sections: List[ContextSection] = []
         seen_parents: set = set()
-        context_block = ""
 
         for chunk in chunks:
             parent_id = chunk.metadata.get("parent_id")
@@ -265,9 +896,10 @@ class RAGSystem:
             if parent_id and parent_id in self.parent_docs and parent_id not in seen_parents:
                 parent = self.parent_docs[parent_id]
 
-                # Optional: filter parent by language tag
-                lang_match = re.search(r'\[LANG=(\w+)\]', parent.page_content)
-                parent_lang = lang_match.group(1) if lang_match else "Unknown"
+                # Optional: filter parent by its precomputed language
+                parent_lang = self.parent_attributes.value(
+                    "language", self.parent_attributes.row(parent_id)
+                )
 
                 # Accept unknown language parents for Python queries
                 if requested_lang == "Python" and parent_lang not in ("Python", "Unknown"):
@@ -276,39 +908,41 @@ class RAGSystem:
                     continue
 
                 seen_parents.add(parent_id)
-                final_contexts.append(parent.page_content)
-
-                src = os.path.basename(parent.metadata.get("source", "unknown"))
-                breadcrumb = parent.metadata.get("breadcrumb", "")
-
-                # XML-style tags for clearer separation
-                context_block += (
-                    f'<source file="{src}" section="{breadcrumb}">\n'
-                    f"{parent.page_content}\n"
-                    f"</source>\n\n"
+                sections.append(
+                    ContextSection(
+                        os.path.basename(parent.metadata.get("source", "unknown")),
+                        parent.metadata.get("breadcrumb", ""),
+                        parent.page_content,
+                        # Windows over long parents center on the matched chunk
+                        anchor=strip_chunk_tags(chunk.page_content),
+                    )
                 )
 
         # If no parents found, fall back to chunks directly
-        if not final_contexts:
+        if not sections:
             for chunk in chunks:
                 # Strip the tags prefix for cleaner context
-                content = re.sub(r'^\[DOC_\w+\] \[LANG=\w+\] \[\w+\] [^\n]*\n', '', chunk.page_content)
-                final_contexts.append(content)
-                src = os.path.basename(chunk.metadata.get("source", "unknown"))
-                breadcrumb = chunk.metadata.get("breadcrumb", "")
-                context_block += (
-                    f'<source file="{src}" section="{breadcrumb}">\n'
-                    f"{content}\n"
-                    f"</source>\n\n"
+                content = strip_chunk_tags(chunk.page_content)
+                sections.append(
+                    ContextSection(
+                        os.path.basename(chunk.metadata.get("source", "unknown")),
+                        chunk.metadata.get("breadcrumb", ""),
+                        content,
+                    )
                 )
 
-        return final_contexts, context_block
+        return pack_context(
+            sections,
+            token_counter(self.config.llm_model),
+            budget=self.config.context_token_budget,
+            section_max_tokens=self.config.context_section_max_tokens,
+        )
 
-    def _generate_answer(
+    def _build_answer_prompt(
         self, query: str, context_block: str, requested_lang: str
     ) -> str:
-        """Generate answer using strict grounding prompt."""
-        prompt = (
+        """Strict grounding prompt for the hybrid pipeline."""
+        return (
             "You are a technical expert on Google ADK. Answer the user's question "
             "STRICTLY using the provided context. Follow these rules:\n"
             "1. If the answer is not in the context, explicitly state "
@@ -325,64 +959,296 @@ class RAGSystem:
             "Answer:"
         )
 
-        response = self.llm.invoke(prompt)
-        return response.content
-
     def query(self, query_text: str) -> Dict[str, Any]:
         """
         Query the RAG system.
 
         For hybrid mode:
-        1. Hybrid retrieval (vector + BM25)
+        1. Hybrid retrieval (vector + BM25, rank-fused)
         2. Cross-language filtering
-        3. LLM reranking
+        3. Reranking (LLM or local cross-encoder)
         4. Parent document expansion
         5. Grounded answer generation
 
         For legacy mode:
         - Simple vector retrieval + generation
+
+        With ``use_semantic_cache``, a previous answer to a sufficiently
+        similar query is returned before any of the above runs.
         """
         if not self.vector_store:
-            return {
-                "answer": "Vector index not found. Run ingestion before querying.",
-                "contexts": [],
-                "sources": [],
+            return self._missing_index_response()
+
+        cached, namespace, vector = self._semantic_cache_lookup(query_text)
+        if cached is not None:
+            return cached
+
+        response, prompt = self._prepare_query(query_text)
+        if prompt is not None:
+            response.answer = self.llm.invoke(prompt).content
+        self.memory.after_query()
+
+        result = response.to_dict()
+        self._semantic_cache_store(namespace, vector, result)
+        return result
+
+    def stream_query(self, query_text: str) -> Iterator[Dict[str, Any]]:
+        """
+        Query the RAG system, streaming the answer as it is generated.
+
+        Yields events in order:
+        - ``{"type": "retrieval", "contexts", "sources", "metadata"}`` once
+          retrieval, reranking and parent expansion are done
+        - ``{"type": "token", "text"}`` for each generated answer fragment
+        - ``{"type": "done", "answer", "contexts", "sources", "metadata"}``
+          with the same payload ``query`` would return
+        """
+        if not self.vector_store:
+            yield from self._stream_result(self._missing_index_response())
+            return
+
+        cached, namespace, vector = self._semantic_cache_lookup(query_text)
+        if cached is not None:
+            yield from self._stream_result(cached)
+            return
+
+        response, prompt = self._prepare_query(query_text)
+        yield {
+            "type": "retrieval",
+            "contexts": response.contexts,
+            "sources": response.sources,
+            "metadata": response.metadata,
+        }
+
+        if prompt is None:
+            yield {"type": "token", "text": response.answer}
+        else:
+            parts: List[str] = []
+            for chunk in self.llm.stream(prompt):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield {"type": "token", "text": chunk.content}
+            response.answer = "".join(parts)
+        self.memory.after_query()
+
+        result = response.to_dict()
+        self._semantic_cache_store(namespace, vector, result)
+        yield {"type": "done", **result}
+
+    async def aquery(self, query_text: str) -> Dict[str, Any]:
+        """
+        Async counterpart of ``query``.
+
+        Embedding, reranking and generation calls are awaited (``aembed_query``,
+        ``ainvoke``) and CPU-bound searches run in worker threads, so many
+        queries can be served concurrently from one event loop.
+        """
+        if not self.vector_store:
+            return self._missing_index_response()
+
+        cached, namespace, vector = await self._asemantic_cache_lookup(query_text)
+        if cached is not None:
+            return cached
+
+        response, prompt = await self._aprepare_query(query_text)
+        if prompt is not None:
+            response.answer = (await self.llm.ainvoke(prompt)).content
+        # Off the event loop: a full collection here would stall every session
+        await asyncio.to_thread(self.memory.after_query)
+
+        result = response.to_dict()
+        self._semantic_cache_store(namespace, vector, result)
+        return result
+
+    async def astream_query(self, query_text: str) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of ``stream_query``, yielding the same events."""
+        if not self.vector_store:
+            for event in self._stream_result(self._missing_index_response()):
+                yield event
+            return
+
+        cached, namespace, vector = await self._asemantic_cache_lookup(query_text)
+        if cached is not None:
+            for event in self._stream_result(cached):
+                yield event
+            return
+
+        response, prompt = await self._aprepare_query(query_text)
+        yield {
+            "type": "retrieval",
+            "contexts": response.contexts,
+            "sources": response.sources,
+            "metadata": response.metadata,
+        }
+
+        if prompt is None:
+            yield {"type": "token", "text": response.answer}
+        else:
+            parts: List[str] = []
+            async for chunk in self.llm.astream(prompt):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield {"type": "token", "text": chunk.content}
+            response.answer = "".join(parts)
+        await asyncio.to_thread(self.memory.after_query)
+
+        result = response.to_dict()
+        self._semantic_cache_store(namespace, vector, result)
+        yield {"type": "done", **result}
+
+    def _stream_result(self, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Replay an already complete result as stream events."""
+        yield {
+            "type": "retrieval",
+            "contexts": result["contexts"],
+            "sources": result["sources"],
+            "metadata": result.get("metadata", {}),
+        }
+        yield {"type": "token", "text": result["answer"]}
+        yield {"type": "done", **result}
+
+    def _missing_index_response(self) -> Dict[str, Any]:
+        return {
+            "answer": "Vector index not found. Run ingestion before querying.",
+            "contexts": [],
+            "sources": [],
+        }
+
+    def _semantic_cache_lookup(
+        self, query_text: str
+    ) -> Tuple[Dict[str, Any] | None, str, List[float] | None]:
+        """
+        Look the query up in the semantic cache.
+
+        Returns ``(cached_response, namespace, query_vector)``; the response
+        is None on a miss or when the cache is disabled.
+        """
+        if self.semantic_cache is None:
+            return None, "", None
+
+        # Semantic cache: a close enough earlier query skips retrieval,
+        # reranking and generation entirely.
+        start = time.perf_counter()
+        namespace = self._semantic_cache_namespace(query_text)
+        vector = self.embeddings.embed_query(query_text)
+        return self._semantic_cache_match(namespace, vector, start), namespace, vector
+
+    async def _asemantic_cache_lookup(
+        self, query_text: str
+    ) -> Tuple[Dict[str, Any] | None, str, List[float] | None]:
+        """Async counterpart of ``_semantic_cache_lookup``."""
+        if self.semantic_cache is None:
+            return None, "", None
+
+        start = time.perf_counter()
+        namespace = self._semantic_cache_namespace(query_text)
+        vector = await self.embeddings.aembed_query(query_text)
+        return self._semantic_cache_match(namespace, vector, start), namespace, vector
+
+    def _semantic_cache_match(
+        self, namespace: str, vector: List[float], start: float
+    ) -> Dict[str, Any] | None:
+        hit = self.semantic_cache.lookup(namespace, vector)
+        if hit is None:
+            return None
+
+        response, similarity = hit
+        response["metadata"] = {
+            "semantic_cache": {
+                "hit": True,
+                "similarity": round(similarity, 4),
+                "ms": round((time.perf_counter() - start) * 1000.0, 2),
             }
+        }
+        return response
+
+    def _semantic_cache_store(
+        self, namespace: str, vector: List[float] | None, result: Dict[str, Any]
+    ) -> None:
+        if self.semantic_cache is None or vector is None:
+            return
+        if result["contexts"]:
+            self.semantic_cache.store(namespace, vector, {**result, "metadata": {}})
+        result.setdefault("metadata", {})["semantic_cache"] = {"hit": False}
+
+    def _prepare_query(self, query_text: str) -> Tuple[RAGResponse, str | None]:
+        """
+        Run the pipeline up to answer generation.
+
+        Returns the response (without its answer) and the generation prompt,
+        or a finished response and None when there is nothing to generate.
+        """
+        if self.config.use_hybrid_retrieval:
+            return self._prepare_hybrid(query_text)
+        else:
+            return self._prepare_legacy(query_text)
 
+    async def _aprepare_query(self, query_text: str) -> Tuple[RAGResponse, str | None]:
+        """Async counterpart of ``_prepare_query``."""
         if self.config.use_hybrid_retrieval:
-            return self._query_hybrid(query_text)
+            return await self._aprepare_hybrid(query_text)
         else:
-            return self._query_legacy(query_text)
+            return await self._aprepare_legacy(query_text)
 
-    def _query_hybrid(self, query_text: str) -> Dict[str, Any]:
+    def _prepare_hybrid(self, query_text: str) -> Tuple[RAGResponse, str | None]:
         """Hybrid retrieval query pipeline."""
         # 1. Detect requested language
         requested_lang = self._detect_requested_language(query_text)
 
         # 2. Hybrid retrieval
-        candidates = self._hybrid_retrieve(query_text)
+        retrieval_stats: Dict[str, Any] = {}
+        candidates = self._retrieve_candidates(query_text, requested_lang, retrieval_stats)
+        metadata: Dict[str, Any] = {"retrieval": retrieval_stats}
 
         if not candidates:
-            return {
-                "answer": "No relevant documents found.",
-                "contexts": [],
-                "sources": [],
-            }
+            return RAGResponse("No relevant documents found.", [], [], metadata), None
 
-        # 3. Cross-language filtering
+        # 3. Cross-language filtering, then keep the best fused candidates
         candidates = self._filter_by_language(candidates, requested_lang)
+        candidates = candidates[: self.config.fusion_top_n]
 
-        # 4. LLM Reranking
-        if self.config.use_llm_reranking:
-            top_chunks = self._llm_rerank(query_text, candidates)
+        # 4. Reranking (skipped or narrowed when the legs already agree)
+        candidates, rerank = self._gate_rerank(candidates, retrieval_stats, metadata)
+        top_chunks = self._rerank(query_text, candidates, metadata) if rerank else candidates
+
+        return self._finish_hybrid(query_text, top_chunks, requested_lang, metadata)
+
+    async def _aprepare_hybrid(self, query_text: str) -> Tuple[RAGResponse, str | None]:
+        """Async hybrid pipeline; same steps as ``_prepare_hybrid``."""
+        requested_lang = self._detect_requested_language(query_text)
+
+        retrieval_stats: Dict[str, Any] = {}
+        candidates = await self._aretrieve_candidates(
+            query_text, requested_lang, retrieval_stats
+        )
+        metadata: Dict[str, Any] = {"retrieval": retrieval_stats}
+
+        if not candidates:
+            return RAGResponse("No relevant documents found.", [], [], metadata), None
+
+        candidates = self._filter_by_language(candidates, requested_lang)
+        candidates = candidates[: self.config.fusion_top_n]
+
+        candidates, rerank = self._gate_rerank(candidates, retrieval_stats, metadata)
+        if rerank:
+            top_chunks = await self._arerank(query_text, candidates, metadata)
         else:
-            top_chunks = candidates[: self.config.rerank_top_n]
+            top_chunks = candidates
 
+        return self._finish_hybrid(query_text, top_chunks, requested_lang, metadata)
+
+    def _finish_hybrid(
+        self,
+        query_text: str,
+        top_chunks: List[Document],
+        requested_lang: str,
+        metadata: Dict[str, Any],
+    ) -> Tuple[RAGResponse, str]:
         # 5. Expand to parent documents
         contexts, context_block = self._expand_to_parents(top_chunks, requested_lang)
 
-        # 6. Generate answer
-        answer = self._generate_answer(query_text, context_block, requested_lang)
+        # 6. Answer prompt (generation is done by the caller)
+        prompt = self._build_answer_prompt(query_text, context_block, requested_lang)
 
         # Collect sources
         sources = list(
@@ -392,11 +1258,9 @@ class RAGSystem:
             )
         )
 
-        gc.collect()
-
-        return RAGResponse(answer, contexts, sources).to_dict()
+        return RAGResponse("", contexts, sources, metadata), prompt
 
-    def _query_legacy(self, query_text: str) -> Dict[str, Any]:
+    def _prepare_legacy(self, query_text: str) -> Tuple[RAGResponse, str | None]:
         """Legacy vector-only query pipeline."""
         try:
             retrieved = self.vector_store.max_marginal_relevance_search(
@@ -406,7 +1270,23 @@ class RAGSystem:
             retrieved = self.vector_store.similarity_search(
                 query_text, k=self.config.top_k
             )
+        return self._finish_legacy(query_text, retrieved)
+
+    async def _aprepare_legacy(self, query_text: str) -> Tuple[RAGResponse, str | None]:
+        """Async legacy pipeline; same steps as ``_prepare_legacy``."""
+        try:
+            retrieved = await self.vector_store.amax_marginal_relevance_search(
+                query_text, k=self.config.top_k, fetch_k=self.config.fetch_k
+            )
+        except AttributeError:
+            retrieved = await self.vector_store.asimilarity_search(
+                query_text, k=self.config.top_k
+            )
+        return self._finish_legacy(query_text, retrieved)
 
+    def _finish_legacy(
+        self, query_text: str, retrieved: List[Document]
+    ) -> Tuple[RAGResponse, str]:
         contexts = [doc.page_content for doc in retrieved]
         sources = [doc.metadata.get("source", "unknown") for doc in retrieved]
 
@@ -424,5 +1304,4 @@ class RAGSystem:
             "If you cannot answer from the context, say 'I don't know based on the provided context.'"
         )
 
-        response = self.llm.invoke(prompt)
-        return RAGResponse(response.content, contexts, sources).to_dict()
+        return RAGResponse("", contexts, sources), prompt
@@ -0,0 +1,496 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from langchain_core.documents import Document
+
+from .cache import RerankScoreCache
+
+RERANKERS = ("llm", "cross_encoder", "flashrank")
+
+DEFAULT_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_FLASHRANK_MODEL = "ms-marco-MiniLM-L-12-v2"
+
+
+class Reranker:
+    """
+    Scores candidates for a query; higher scores are more relevant.
+
+    Subclasses implement ``score`` (and ``ascore`` when they have a native
+    async path); ordering and truncation are shared. ``listwise`` rerankers
+    grade candidates relative to the others in the same call, so their
+    scores from separate calls are offset from each other.
+    """
+
+    name = "none"
+    listwise = False
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        raise NotImplementedError
+
+    async def ascore(self, query: str, docs: List[Document]) -> List[float]:
+        return await asyncio.to_thread(self.score, query, docs)
+
+    def score_partial(self, query: str, docs: List[Document]) -> List[float | None]:
+        """Like ``score``, with None for candidates that could not be scored."""
+        return self.score(query, docs)
+
+    async def ascore_partial(self, query: str, docs: List[Document]) -> List[float | None]:
+        return await self.ascore(query, docs)
+
+    def rerank(self, query: str, docs: List[Document], top_n: int) -> List[Document]:
+        return _order(docs, self.score(query, docs), top_n)
+
+    async def arerank(self, query: str, docs: List[Document], top_n: int) -> List[Document]:
+        return _order(docs, await self.ascore(query, docs), top_n)
+
+
+def fill_unscored(scores: List[float | None]) -> List[float]:
+    """Give unscored candidates (None) the mean of the scored ones."""
+    known = [score for score in scores if score is not None]
+    if not known:
+        raise RuntimeError("no candidate could be scored")
+    mean = sum(known) / len(known)
+    return [mean if score is None else score for score in scores]
+
+
+def _order(docs: List[Document], scores: List[float], top_n: int) -> List[Document]:
+    # Stable sort: ties (e.g. unscored candidates) keep their fused order
+    ranked = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+    return [docs[i] for i in ranked[:top_n]]
+
+
+# Structured output schema for rerank calls (a list, as strict JSON schema
+# modes do not allow free-form object keys)
+RERANK_SCHEMA = {
+    "title": "RerankScores",
+    "description": "Relevance score from 0 to 100 for each chunk id.",
+    "type": "object",
+    "properties": {
+        "scores": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "score": {"type": "number"},
+                },
+                "required": ["id", "score"],
+                "additionalProperties": False,
+            },
+        }
+    },
+    "required": ["scores"],
+    "additionalProperties": False,
+}
+
+
+def _structured_llm(llm: Any) -> Any:
+    """``llm`` constrained to ``RERANK_SCHEMA``, or None if unsupported."""
+    if not hasattr(llm, "with_structured_output"):
+        return None
+    try:
+        return llm.with_structured_output(RERANK_SCHEMA)
+    except (NotImplementedError, ValueError, TypeError):
+        return None
+
+
+def merge_shard_scores(
+    count: int, shards: List[List[int]], shard_scores: List[List[float | None] | None]
+) -> List[float | None]:
+    """
+    Merge per-shard scores into one comparable list.
+
+    Scores from separate calls drift (one call grades harsher than another),
+    and shards are stratified by fused rank so each sees a similar mix of
+    candidates; each shard's mean is therefore shifted to the overall mean.
+    Candidates of failed shards (None) and candidates a shard left unscored
+    (None entries) stay None.
+    """
+    raw = [
+        score
+        for scores in shard_scores if scores is not None
+        for score in scores if score is not None
+    ]
+    if not raw:
+        raise RuntimeError("every rerank shard failed")
+    overall_mean = sum(raw) / len(raw)
+
+    merged: List[float | None] = [None] * count
+    for indices, scores in zip(shards, shard_scores):
+        if scores is None:
+            continue
+        known = [score for score in scores if score is not None]
+        if not known:
+            continue
+        shard_mean = sum(known) / len(known)
+        for index, score in zip(indices, scores):
+            if score is not None:
+                merged[index] = score - shard_mean + overall_mean
+    return merged
+
+
+class LLMReranker(Reranker):
+    """
+    Listwise reranking by a chat model scoring candidates from 0 to 100.
+
+    Candidates are split into shards of ``shard_size`` (0 = one prompt),
+    scored with up to ``concurrency`` calls in flight, using structured
+    output where the model supports it, and merged with
+    ``merge_shard_scores``. A failed shard only loses its own scores: its
+    candidates get the mean of the others (``fill_unscored``).
+    ``detect_language`` maps the query to the requested programming
+    language, which the prompt uses to flag matching chunks.
+    """
+
+    name = "llm"
+    listwise = True
+
+    def __init__(
+        self,
+        llm: Any,
+        detect_language: Callable[[str], str],
+        shard_size: int = 0,
+        concurrency: int = 4,
+    ):
+        self.llm = llm
+        self.structured_llm = _structured_llm(llm)
+        self.detect_language = detect_language
+        self.shard_size = shard_size
+        self.concurrency = max(1, concurrency)
+        self._executor: ThreadPoolExecutor | None = None
+        if self.concurrency > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="rag-llm-rerank"
+            )
+
+    def shards(self, count: int) -> List[List[int]]:
+        """Candidate indices per shard, dealt round-robin by fused rank."""
+        if self.shard_size <= 0 or count <= self.shard_size:
+            return [list(range(count))]
+        n_shards = -(-count // self.shard_size)
+        return [list(range(start, count, n_shards)) for start in range(n_shards)]
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        return fill_unscored(self.score_partial(query, docs))
+
+    async def ascore(self, query: str, docs: List[Document]) -> List[float]:
+        return fill_unscored(await self.ascore_partial(query, docs))
+
+    def score_partial(self, query: str, docs: List[Document]) -> List[float | None]:
+        shards = self.shards(len(docs))
+
+        def run(indices: List[int]) -> List[float | None] | None:
+            try:
+                return self._score_shard(query, [docs[i] for i in indices])
+            except Exception as exc:
+                print(f"Rerank shard of {len(indices)} failed: {exc}")
+                return None
+
+        if self._executor is None or len(shards) < 2:
+            shard_scores = [run(indices) for indices in shards]
+        else:
+            shard_scores = list(self._executor.map(run, shards))
+        return merge_shard_scores(len(docs), shards, shard_scores)
+
+    async def ascore_partial(self, query: str, docs: List[Document]) -> List[float | None]:
+        shards = self.shards(len(docs))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(indices: List[int]) -> List[float | None] | None:
+            async with semaphore:
+                try:
+                    return await self._ascore_shard(query, [docs[i] for i in indices])
+                except Exception as exc:
+                    print(f"Rerank shard of {len(indices)} failed: {exc}")
+                    return None
+
+        shard_scores = await asyncio.gather(*(run(indices) for indices in shards))
+        return merge_shard_scores(len(docs), shards, list(shard_scores))
+
+    def _score_shard(self, query: str, docs: List[Document]) -> List[float | None]:
+        prompt = self.build_prompt(query, docs)
+        if self.structured_llm is not None:
+            try:
+                return self.parse_scores(self.structured_llm.invoke(prompt), len(docs))
+            except Exception as exc:
+                print(f"Structured rerank output failed ({exc}); parsing text instead")
+        return self.parse_scores(self.llm.invoke(prompt).content, len(docs))
+
+    async def _ascore_shard(self, query: str, docs: List[Document]) -> List[float | None]:
+        prompt = self.build_prompt(query, docs)
+        if self.structured_llm is not None:
+            try:
+                return self.parse_scores(await self.structured_llm.ainvoke(prompt), len(docs))
+            except Exception as exc:
+                print(f"Structured rerank output failed ({exc}); parsing text instead")
+        return self.parse_scores((await self.llm.ainvoke(prompt)).content, len(docs))
+
+    def build_prompt(self, query: str, docs: List[Document]) -> str:
+        """Prompt asking the rerank model to score each candidate from 0 to 100."""
+        # Detect requested language for emphasis
+        requested_lang = self.detect_language(query)
+
+        packed = []
+        for i, doc in enumerate(docs):
+            snippet = doc.page_content[:1400].replace('\n', ' ').strip()
+
+            # Detect completeness (presence of full API definitions)
+            completeness_tag = "[COMPLETE_API]" if re.search(
+                r'\b(class|func|def|interface|type|package|func\s+main)\s+\w*',
+                snippet, re.I
+            ) else "[PARTIAL]"
+
+            # Check if chunk matches requested language
+            lang = doc.metadata.get("language", "unknown").lower()
+            requested_lang_tag = "[REQUESTED_LANG]" if lang == requested_lang.lower() else ""
+
+            tags = doc.metadata.get("tags", "")
+            breadcrumb = doc.metadata.get("breadcrumb", "")
+
+            packed.append(
+                f"[{i}] {completeness_tag} {requested_lang_tag} Tags:{tags} Breadcrumb:{breadcrumb}\n{snippet}"
+            )
+
+        return (
+            "Role: ADK Expert Reranker.\n"
+            "Goal: Score each chunk from 0 to 100 for relevance to the query.\n"
+            "Prioritize chunks with:\n"
+            "- Exact API names matching the query\n"
+            "- Complete API definitions over partial snippets\n"
+            "- Code examples in the user's requested programming language\n"
+            "- Proper handling of multi-language snippets\n"
+            f"User Query: {query}\n\n"
+            "Chunks:\n" + "\n\n".join(packed) + "\n\n"
+            'Return a JSON object {"scores": [{"id": <chunk id>, "score": <0-100>}, ...]} '
+            "with one entry per chunk."
+        )
+
+    @staticmethod
+    def parse_scores(content: str | Dict[str, Any], count: int) -> List[float | None]:
+        """
+        Scores from a rerank response (None for ids it leaves out).
+
+        Accepts structured output (a dict) or text containing a JSON object;
+        ``scores`` may be a list of ``{"id", "score"}`` or an id -> score map.
+        Raises ValueError when the response holds no scores.
+        """
+        if isinstance(content, dict):
+            data = content
+        else:
+            match = re.search(r'\{.*\}', content, re.DOTALL)
+            if not match:
+                raise ValueError("no JSON object in rerank response")
+            data = json.loads(match.group(0))
+
+        scores = data.get("scores")
+        if isinstance(scores, list):
+            scores = {str(item["id"]): item["score"] for item in scores}
+        if not isinstance(scores, dict):
+            raise ValueError("rerank response has no 'scores'")
+        parsed = []
+        for i in range(count):
+            score = scores.get(str(i), scores.get(i))
+            parsed.append(None if score is None else float(score))
+        return parsed
+
+
+class CachedReranker(Reranker):
+    """
+    Reranker wrapper that reuses scores of (query, chunk) pairs seen before.
+
+    Only candidates missing from ``cache`` are passed to the wrapped
+    reranker, so repeated and retried queries send no duplicate pairs.
+    Candidates the wrapped reranker could not score are not cached.
+    ``model`` identifies the scorer in cache keys.
+
+    Fresh scores of a ``listwise`` reranker are on a different scale than
+    cached ones, so up to ``anchors`` cached candidates (spread over the
+    cached scores) are scored again with the missing ones and the fresh
+    scores are shifted by the mean cached - fresh difference of those
+    anchors. If no anchor gets a fresh score, every candidate is rescored.
+    """
+
+    def __init__(
+        self, reranker: Reranker, cache: RerankScoreCache, model: str, anchors: int = 3
+    ):
+        self.reranker = reranker
+        self.cache = cache
+        self.model = model
+        self.anchors = anchors
+        self.name = reranker.name
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        return fill_unscored(self.score_partial(query, docs))
+
+    async def ascore(self, query: str, docs: List[Document]) -> List[float]:
+        return fill_unscored(await self.ascore_partial(query, docs))
+
+    def score_partial(self, query: str, docs: List[Document]) -> List[float | None]:
+        keys, scores, missing = self._lookup(query, docs)
+        if missing:
+            anchors = self._anchors(scores)
+            batch = self.reranker.score_partial(query, [docs[i] for i in missing + anchors])
+            new_scores = self._calibrate(scores, anchors, batch, len(missing))
+            if new_scores is None:
+                missing = list(range(len(docs)))
+                new_scores = self.reranker.score_partial(query, docs)
+            self._remember(keys, scores, missing, new_scores)
+        return scores
+
+    async def ascore_partial(self, query: str, docs: List[Document]) -> List[float | None]:
+        keys, scores, missing = self._lookup(query, docs)
+        if missing:
+            anchors = self._anchors(scores)
+            batch = await self.reranker.ascore_partial(
+                query, [docs[i] for i in missing + anchors]
+            )
+            new_scores = self._calibrate(scores, anchors, batch, len(missing))
+            if new_scores is None:
+                missing = list(range(len(docs)))
+                new_scores = await self.reranker.ascore_partial(query, docs)
+            self._remember(keys, scores, missing, new_scores)
+        return scores
+
+    def _anchors(self, scores: List[float | None]) -> List[int]:
+        """Cached candidates rescored to put fresh listwise scores on the cached scale."""
+        hits = sorted(
+            (i for i, score in enumerate(scores) if score is not None), key=lambda i: scores[i]
+        )
+        count = min(self.anchors, len(hits))
+        if not self.reranker.listwise or count == 0:
+            return []
+        if count == 1:
+            return [hits[len(hits) // 2]]
+        return [hits[round(j * (len(hits) - 1) / (count - 1))] for j in range(count)]
+
+    @staticmethod
+    def _calibrate(
+        scores: List[float | None],
+        anchors: List[int],
+        batch: List[float | None],
+        count: int,
+    ) -> List[float | None] | None:
+        """Fresh scores of the first ``count`` batch entries, shifted by the anchors' offset."""
+        fresh = batch[:count]
+        if not anchors:
+            return fresh
+        offsets = [
+            scores[i] - score for i, score in zip(anchors, batch[count:]) if score is not None
+        ]
+        if not offsets:
+            return None
+        offset = sum(offsets) / len(offsets)
+        return [None if score is None else score + offset for score in fresh]
+
+    def _lookup(self, query: str, docs: List[Document]):
+        keys = self.cache.keys(self.model, query, [doc.page_content for doc in docs])
+        scores = self.cache.get_many(keys)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        return keys, scores, missing
+
+    def _remember(
+        self,
+        keys: List[tuple[str, str, str]],
+        scores: List[float | None],
+        missing: List[int],
+        new_scores: List[float | None],
+    ) -> None:
+        fresh = {}
+        for i, score in zip(missing, new_scores):
+            scores[i] = score
+            if score is not None:
+                fresh[keys[i]] = score
+        self.cache.set_many(fresh)
+
+
+class PointwiseReranker(Reranker):
+    """
+    Base for local models scoring each (query, passage) pair independently.
+
+    Candidates are split into batches of ``batch_size`` and scored on a pool
+    of ``workers`` threads (model inference releases the GIL).
+    """
+
+    def __init__(self, batch_size: int = 16, workers: int = 1):
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self._executor: ThreadPoolExecutor | None = None
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="rag-rerank"
+            )
+
+    def _score_batch(self, query: str, texts: List[str]) -> List[float]:
+        raise NotImplementedError
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        texts = [doc.page_content for doc in docs]
+        batches = [
+            texts[start : start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        if self._executor is None or len(batches) < 2:
+            results = [self._score_batch(query, batch) for batch in batches]
+        else:
+            results = list(self._executor.map(lambda batch: self._score_batch(query, batch), batches))
+        return [score for batch_scores in results for score in batch_scores]
+
+
+class CrossEncoderReranker(PointwiseReranker):
+    """sentence-transformers cross-encoder on CPU (``backend``: torch or onnx)."""
+
+    name = "cross_encoder"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_CROSS_ENCODER_MODEL,
+        max_length: int = 512,
+        batch_size: int = 16,
+        workers: int = 1,
+        backend: str = "torch",
+    ):
+        super().__init__(batch_size, workers)
+        from sentence_transformers import CrossEncoder
+
+        kwargs = {"backend": backend} if backend != "torch" else {}
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu", **kwargs)
+
+    def _score_batch(self, query: str, texts: List[str]) -> List[float]:
+        scores = self.model.predict(
+            [(query, text) for text in texts],
+            batch_size=len(texts),
+            show_progress_bar=False,
+        )
+        return [float(score) for score in scores]
+
+
+class FlashRankReranker(PointwiseReranker):
+    """FlashRank ONNX cross-encoder; small quantized models, no torch needed."""
+
+    name = "flashrank"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_FLASHRANK_MODEL,
+        max_length: int = 512,
+        batch_size: int = 16,
+        workers: int = 1,
+    ):
+        super().__init__(batch_size, workers)
+        from flashrank import Ranker, RerankRequest
+
+        self._request = RerankRequest
+        self.ranker = Ranker(model_name=model_name, max_length=max_length)
+
+    def _score_batch(self, query: str, texts: List[str]) -> List[float]:
+        passages = [{"id": i, "text": text} for i, text in enumerate(texts)]
+        results = self.ranker.rerank(self._request(query=query, passages=passages))
+        scores = [0.0] * len(texts)
+        for result in results:
+            scores[int(result["id"])] = float(result["score"])
+        return scores
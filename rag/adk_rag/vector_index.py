@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, List
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .docstore import MappingDocstore
+
+# Read the index file through mmap instead of copying it to the heap
+# (flat, SQ and PQ codes, IVF inverted lists, HNSW vectors)
+MMAP_IO_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+# Docstore id of every FAISS position, in position order
+INDEX_IDS_FILE = "index_ids.json"
+
+
+def build_index(vectors: np.ndarray, factory: str, train_size: int = 0) -> Any:
+    """
+    Create a FAISS index from a factory string and add ``vectors``.
+
+    Indexes that need training (IVF, PQ, SQ, PCA) are trained on at most
+    ``train_size`` vectors (0 = all), sampled with a fixed seed so the same
+    corpus gives the same index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], factory)
+    if not index.is_trained:
+        sample = vectors
+        if 0 < train_size < len(vectors):
+            rows = np.random.default_rng(0).choice(len(vectors), train_size, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    index.add(vectors)
+    return index
+
+
+def convert_index(index: Any, factory: str, train_size: int = 0) -> Any:
+    """Rebuild a flat index (as built during ingestion) with ``factory``."""
+    vectors = index.reconstruct_n(0, index.ntotal)
+    return build_index(vectors, factory, train_size)
+
+
+def supports_removal(index: Any) -> bool:
+    """
+    Whether vectors can be deleted in place with LangChain's ``FAISS.delete``.
+
+    HNSW graphs cannot delete at all. IVF indexes can, but keep the surviving
+    vectors' original ids while ``FAISS.delete`` renumbers positions to
+    ``0..n-1``, so ids and docstore entries would no longer match.
+    """
+    if faiss.try_extract_index_ivf(index) is not None:
+        return False
+    try:
+        index.remove_ids(faiss.IDSelectorBatch(np.empty(0, dtype=np.int64)))
+    except RuntimeError:
+        return False
+    return True
+
+
+def _search_index(index: Any) -> Any:
+    """Index doing the candidate search, below PCA transforms and refinement."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexPreTransform, faiss.IndexRefine)):
+        inner = index.index if isinstance(index, faiss.IndexPreTransform) else index.base_index
+        index = faiss.downcast_index(inner)
+    return index
+
+
+def set_search_defaults(
+    index: Any, ef_search: int = 0, nprobe: int = 0, k_factor: float = 0.0
+) -> None:
+    """
+    Set the parameters used by plain searches (0 = keep the index's own).
+
+    ``ef_search`` applies to HNSW, ``nprobe`` to IVF and ``k_factor`` (how
+    many candidates per result are re-scored with full vectors) to ``RFlat``.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe > 0:
+        ivf.nprobe = nprobe
+    hnsw = _search_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW) and ef_search > 0:
+        hnsw.hnsw.efSearch = ef_search
+    refine = faiss.downcast_index(index)
+    if isinstance(refine, faiss.IndexRefine) and k_factor > 0:
+        refine.k_factor = k_factor
+
+
+def search_parameters(index: Any, selector: Any = None) -> Any:
+    """
+    FAISS search parameters carrying an ID selector, typed for the index.
+
+    Parameter objects do not inherit the index's ``efSearch``/``nprobe``/
+    ``k_factor``, so the current values are copied over.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        base_params = search_parameters(index.base_index, selector)
+        params = faiss.IndexRefineSearchParameters()
+        params.k_factor = index.k_factor
+        params.base_index_params = base_params
+        # The C++ struct holds a raw pointer; keep the Python object alive
+        params.referenced_objects = [base_params]
+        return params
+    if isinstance(index, faiss.IndexPreTransform):
+        return search_parameters(index.index, selector)
+
+    if isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = index.hnsw.efSearch
+    elif isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = index.nprobe
+    else:
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def supports_selectors(index: Any) -> bool:
+    """Whether searches accept an ID selector (``IndexLSH`` rejects them)."""
+    params = search_parameters(index, faiss.IDSelectorAll())
+    try:
+        index.search(np.zeros((1, index.d), dtype=np.float32), 1, params=params)
+    except RuntimeError:
+        return False
+    return True
+
+
+def load_faiss_store(
+    index_path: str,
+    embeddings: Embeddings,
+    mmap: bool = False,
+    ef_search: int = 0,
+    nprobe: int = 0,
+    k_factor: float = 0.0,
+    documents: Mapping[str, Document] | None = None,
+) -> FAISS:
+    """
+    Load a saved FAISS store, optionally memory-mapping the index file.
+
+    When ``documents`` (chunk id -> Document) covers every id in
+    ``index_ids.json``, hits are resolved from it and the pickled docstore
+    is not loaded, so processes sharing the index files hold no private
+    copy of the chunks.
+    """
+    io_flags = MMAP_IO_FLAGS if mmap else 0
+    ids = _load_index_ids(index_path) if documents is not None else None
+    if ids is not None and all(doc_id in documents for doc_id in ids):
+        index = faiss.read_index(str(Path(index_path) / "index.faiss"), io_flags)
+        if index.ntotal != len(ids):
+            raise ValueError(f"{INDEX_IDS_FILE} does not match index.faiss")
+        store = FAISS(embeddings, index, MappingDocstore(documents), dict(enumerate(ids)))
+    else:
+        store = FAISS.load_local(
+            index_path,
+            embeddings,
+            allow_dangerous_deserialization=True,
+            io_flags=io_flags,
+        )
+    set_search_defaults(store.index, ef_search, nprobe, k_factor)
+    ivf = faiss.try_extract_index_ivf(store.index)
+    if ivf is not None:
+        # Needed by reconstruct() (MMR search); held in memory only
+        ivf.make_direct_map()
+    return store
+
+
+def _load_index_ids(index_path: str) -> List[str] | None:
+    path = Path(index_path) / INDEX_IDS_FILE
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_faiss_store(store: FAISS, index_path: str) -> None:
+    """
+    Save a FAISS store, replacing the previous files atomically.
+
+    Readers that memory-mapped the old ``index.faiss`` keep a valid mapping
+    because the file is replaced rather than rewritten in place. The
+    docstore id of every position is also written to ``index_ids.json``.
+    """
+    path = Path(index_path)
+    tmp_path = path / ".index.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    store.save_local(str(tmp_path))
+    ids = [store.index_to_docstore_id[pos] for pos in range(store.index.ntotal)]
+    with open(tmp_path / INDEX_IDS_FILE, "w", encoding="utf-8") as f:
+        json.dump(ids, f, separators=(",", ":"))
+    for name in ("index.faiss", "index.pkl", INDEX_IDS_FILE):
+        os.replace(tmp_path / name, path / name)
+    shutil.rmtree(tmp_path, ignore_errors=True)
@@ -23,6 +23,11 @@ def main() -> None:
         action="store_true",
         help="Disable hybrid retrieval (use legacy vector-only mode)",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-process markdown files added, changed or removed since the last run",
+    )
     args = parser.parse_args()
 
     config = load_config(args.config)
@@ -49,15 +54,16 @@ def main() -> None:
     print(f"Chunk size: {config.chunk_size}")
     print(f"Chunk overlap: {config.chunk_overlap}")
     print(f"Hybrid retrieval: {config.use_hybrid_retrieval}")
+    print(f"Incremental: {args.incremental}")
     print("=" * 50)
 
-    count = run_ingestion(config)
+    count = run_ingestion(config, incremental=args.incremental)
     if count == 0:
         print("No documents ingested. Check the docs path.")
     else:
         print(f"Successfully ingested {count} chunks.")
         if config.use_hybrid_retrieval:
-            print("Created: FAISS index, parent docs, BM25 data")
+            print("Created: FAISS index, parent docs, BM25 data, manifest")
 
 
 if __name__ == "__main__":
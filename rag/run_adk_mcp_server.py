@@ -1,70 +1,371 @@
 import argparse
+import asyncio
+import contextlib
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List
 
+import anyio
+import httpx
 import uvicorn
 from dotenv import load_dotenv
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 from mcp.server.sse import SseServerTransport
 from starlette.applications import Starlette
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import JSONResponse, Response, StreamingResponse
 from starlette.routing import Mount, Route
 
 from rag.adk_rag import load_config
 from rag.adk_rag.query import RAGSystem
 
 mcp = FastMCP("adk_rag_server")
-_sse_transport = SseServerTransport("/messages/")
 _rag_system: RAGSystem | None = None
+_rag_system_lock = threading.Lock()
 _config = None
+_eager = False
+_readiness: Dict[str, Any] = {"status": "starting"}
+
+# Answer tokens are sent as progress notifications at most every
+# PROGRESS_INTERVAL seconds (or once PROGRESS_MAX_CHARS are buffered)
+PROGRESS_INTERVAL = 0.25
+PROGRESS_MAX_CHARS = 400
+
+
+class TokenBatcher:
+    """Buffer streamed answer tokens into throttled progress messages."""
+
+    def __init__(
+        self,
+        interval: float = PROGRESS_INTERVAL,
+        max_chars: int = PROGRESS_MAX_CHARS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval = interval
+        self.max_chars = max_chars
+        self._clock = clock
+        self._last = clock()
+        self._buffer: List[str] = []
+        self._chars = 0
+
+    def add(self, text: str) -> str | None:
+        """Buffer a token; return the buffered text when it is time to send it."""
+        self._buffer.append(text)
+        self._chars += len(text)
+        if self._chars >= self.max_chars or self._clock() - self._last >= self.interval:
+            return self.flush()
+        return None
+
+    def flush(self) -> str | None:
+        """Return and clear the buffered text (None if empty)."""
+        self._last = self._clock()
+        if not self._buffer:
+            return None
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._chars = 0
+        return text
 
 
 def get_rag_system() -> RAGSystem:
     global _rag_system
     if _config is None:
         raise RuntimeError("RAG config not loaded.")
-    if _rag_system is None:
-        _rag_system = RAGSystem(_config)
+    # Concurrent first requests must not each load the indexes
+    with _rag_system_lock:
+        if _rag_system is None:
+            rag = RAGSystem(_config)
+            if _config.gc_freeze_after_load:
+                # This process exists to serve the loaded indexes
+                rag.memory.freeze()
+            _rag_system = rag
     return _rag_system
 
 
+def warm_up() -> None:
+    """Load the indexes and warm every client, then mark the server ready."""
+    global _readiness
+    start = time.perf_counter()
+    try:
+        timings = get_rag_system().warm_up()
+    except Exception as exc:
+        print(f"Warm-up failed: {exc}")
+        _readiness = {"status": "failed", "message": str(exc)}
+        return
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+    print(f"Warm-up finished in {timings['total_ms']:.0f} ms")
+    _readiness = {"status": "ready", "warmup": timings}
+
+
 @mcp.tool()
-def get_adk_info(query: str) -> dict:
+async def get_adk_info(query: str, ctx: Context) -> dict:
     """
     Retrieve information about Google ADK using the local RAG index.
 
+    The answer is streamed as MCP progress notifications while it is
+    generated: tokens are batched (TokenBatcher) and each message holds the
+    text since the previous one, progress counting the tokens so far. The
+    tool result holds the complete answer, contexts and sources.
+
     Args:
         query: The question about Google ADK.
     """
     try:
-        rag = get_rag_system()
-        return rag.query(query)
+        # First call loads the indexes; keep that off the event loop
+        rag = await anyio.to_thread.run_sync(get_rag_system)
+        result: dict = {}
+        tokens = 0
+        batcher = TokenBatcher()
+        async for event in rag.astream_query(query):
+            if event["type"] == "retrieval":
+                await ctx.report_progress(
+                    0, message=f"Retrieved {len(event['sources'])} sources"
+                )
+            elif event["type"] == "token":
+                tokens += 1
+                text = batcher.add(event["text"])
+                if text is not None:
+                    await ctx.report_progress(tokens, message=text)
+            else:
+                text = batcher.flush()
+                if text is not None:
+                    await ctx.report_progress(tokens, message=text)
+                result = {key: value for key, value in event.items() if key != "type"}
+        return result
     except Exception as exc:
         return {"status": "error", "message": str(exc)}
 
 
-async def handle_sse(request: Request):
-    async with _sse_transport.connect_sse(
-        request.scope, request.receive, request._send
-    ) as (reader, writer):
-        await mcp._mcp_server.run(
-            reader,
-            writer,
-            mcp._mcp_server.create_initialization_options(),
+async def handle_stats(request: Request):
+    """Cache hit-rate and saved-latency counters of the loaded RAG system."""
+    if _rag_system is None:
+        return JSONResponse({"status": "not_loaded", "pid": os.getpid()})
+    return JSONResponse({**_rag_system.cache_stats(), "pid": os.getpid()})
+
+
+async def handle_healthz(request: Request):
+    """Liveness: the process is up and serving HTTP."""
+    return JSONResponse({"status": "ok"})
+
+
+async def handle_readyz(request: Request):
+    """
+    Readiness: 200 once the server can answer without cold-start cost.
+
+    With --eager that is after the indexes are loaded and the warm-up query
+    has run (503 until then, or if it failed). Lazy servers are always
+    ready and load on the first tool call.
+    """
+    if not _eager:
+        return JSONResponse(
+            {"status": "ready", "mode": "lazy", "loaded": _rag_system is not None}
         )
-    return Response()
+    status_code = 200 if _readiness["status"] == "ready" else 503
+    return JSONResponse({**_readiness, "mode": "eager"}, status_code=status_code)
+
 
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    if _eager:
+        # Warm up in the background so /healthz answers while indexes load
+        threading.Thread(target=warm_up, name="rag-warmup", daemon=True).start()
+    yield
 
-app = Starlette(
-    debug=True,
-    routes=[
-        Route("/sse", endpoint=handle_sse),
-        Mount("/messages/", app=_sse_transport.handle_post_message),
-    ],
-)
+
+def build_app(message_path: str = "/messages/") -> Starlette:
+    """
+    MCP server app whose SSE sessions post to ``message_path``.
+
+    Clients post a session's messages to the relative
+    ``<message_path>?session_id=`` endpoint announced on its /sse stream.
+    """
+    sse_transport = SseServerTransport(message_path)
+
+    async def handle_sse(request: Request):
+        async with sse_transport.connect_sse(
+            request.scope, request.receive, request._send
+        ) as (reader, writer):
+            await mcp._mcp_server.run(
+                reader,
+                writer,
+                mcp._mcp_server.create_initialization_options(),
+            )
+        return Response()
+
+    return Starlette(
+        debug=True,
+        lifespan=lifespan,
+        routes=[
+            Route("/sse", endpoint=handle_sse),
+            Route("/stats", endpoint=handle_stats),
+            Route("/healthz", endpoint=handle_healthz),
+            Route("/readyz", endpoint=handle_readyz),
+            Mount(message_path, app=sse_transport.handle_post_message),
+        ],
+    )
+
+
+app = build_app()
+
+
+def worker_message_path(index: int) -> str:
+    """Message endpoint of worker ``index``; its prefix routes POSTs back to it."""
+    return f"/w{index}/messages/"
+
+
+def build_router_app(worker_urls: List[str], client: httpx.AsyncClient | None = None) -> Starlette:
+    """
+    Single entry point in front of the --workers processes.
+
+    Each /sse stream is proxied to the next worker in turn. Worker ``i``
+    announces ``/w<i>/messages/`` as its message endpoint, which the client
+    resolves against this server's URL, so every POST of a session is
+    forwarded by its path to the worker that holds the session. Any proxy
+    that routes ``/w<i>/`` to worker ``i`` works the same way.
+    """
+    client = client or httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+    next_worker = itertools.cycle(range(len(worker_urls)))
+
+    async def proxy_sse(request: Request):
+        upstream = client.build_request(
+            "GET", f"{worker_urls[next(next_worker)]}/sse", headers={"accept": "text/event-stream"}
+        )
+        response = await client.send(upstream, stream=True)
+
+        async def stream():
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await response.aclose()
+
+        return StreamingResponse(
+            stream(),
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type"),
+            headers={"cache-control": "no-store"},
+        )
+
+    async def proxy_message(request: Request):
+        index = request.path_params["worker"]
+        if index >= len(worker_urls):
+            return JSONResponse({"error": f"no worker {index}"}, status_code=404)
+        response = await client.post(
+            f"{worker_urls[index]}{request.url.path}",
+            params=request.query_params,
+            content=await request.body(),
+            headers={"content-type": request.headers.get("content-type", "application/json")},
+        )
+        return Response(
+            response.content,
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type"),
+        )
+
+    async def gather(path: str) -> List[httpx.Response | None]:
+        async def fetch(url: str) -> httpx.Response | None:
+            try:
+                return await client.get(f"{url}{path}")
+            except httpx.HTTPError:
+                return None
+
+        return list(await asyncio.gather(*(fetch(url) for url in worker_urls)))
+
+    async def handle_router_readyz(request: Request):
+        """Ready once every worker is ready."""
+        responses = await gather("/readyz")
+        workers = [
+            response.json() if response is not None else {"status": "unreachable"}
+            for response in responses
+        ]
+        ready = all(response is not None and response.status_code == 200 for response in responses)
+        return JSONResponse(
+            {"status": "ready" if ready else "not_ready", "workers": workers},
+            status_code=200 if ready else 503,
+        )
+
+    async def handle_router_stats(request: Request):
+        """Stats of every worker."""
+        responses = await gather("/stats")
+        return JSONResponse(
+            {
+                "workers": [
+                    response.json() if response is not None else {"status": "unreachable"}
+                    for response in responses
+                ]
+            }
+        )
+
+    @contextlib.asynccontextmanager
+    async def router_lifespan(app: Starlette):
+        yield
+        await client.aclose()
+
+    return Starlette(
+        lifespan=router_lifespan,
+        routes=[
+            Route("/sse", endpoint=proxy_sse),
+            Route("/w{worker:int}/messages/", endpoint=proxy_message, methods=["POST"]),
+            Route("/stats", endpoint=handle_router_stats),
+            Route("/healthz", endpoint=handle_healthz),
+            Route("/readyz", endpoint=handle_router_readyz),
+        ],
+    )
+
+
+def serve(
+    config, host: str, port: int, eager: bool = False, message_path: str = "/messages/"
+) -> None:
+    """Run one server process (also the target of each --workers process)."""
+    global _config, _eager
+    _config = config
+    _eager = eager
+    server_app = app if message_path == "/messages/" else build_app(message_path)
+    uvicorn.run(server_app, host=host, port=port)
+
+
+def run_workers(config, host: str, port: int, workers: int, eager: bool = False) -> None:
+    """
+    Run ``workers`` server processes behind one entry point on ``port``.
+
+    Worker ``i`` listens on ``port + 1 + i``; the router on ``port``
+    (``build_router_app``) spreads /sse streams over them and keeps each
+    session's POSTs on the worker that holds it, so clients keep using the
+    single server URL. Workers load the index files with mmap (faiss_mmap,
+    the BM25 arrays and the document stores), so the page cache holds one
+    copy shared by all of them.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=serve,
+            args=(config, host, port + 1 + i, eager, worker_message_path(i)),
+            name=f"rag-worker-{i}",
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    print(f"Started {workers} workers on ports {port + 1}-{port + workers}")
+    print(f"Routing sessions from {host}:{port}")
+
+    worker_urls = [f"http://{host}:{port + 1 + i}" for i in range(workers)]
+    try:
+        uvicorn.run(build_router_app(worker_urls), host=host, port=port)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
 
 
 def main() -> None:
-    global _config
     load_dotenv()
 
     parser = argparse.ArgumentParser(description="Run the ADK RAG MCP server.")
@@ -85,34 +386,50 @@ def main() -> None:
         action="store_true",
         help="Disable LLM reranking",
     )
+    parser.add_argument(
+        "--eager",
+        action="store_true",
+        help="Load indexes and warm up clients at startup (/readyz waits for it)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Server processes behind a session router on --port (sharing mmap'd indexes)",
+    )
     args = parser.parse_args()
 
-    _config = load_config(args.config)
+    config = load_config(args.config)
     if args.index_path:
-        _config.index_path = args.index_path
+        config.index_path = args.index_path
     if args.llm_model:
-        _config.llm_model = args.llm_model
+        config.llm_model = args.llm_model
     if args.embedding_model:
-        _config.embedding_model = args.embedding_model
+        config.embedding_model = args.embedding_model
     if args.temperature is not None:
-        _config.temperature = args.temperature
+        config.temperature = args.temperature
     if args.no_hybrid:
-        _config.use_hybrid_retrieval = False
+        config.use_hybrid_retrieval = False
     if args.no_reranking:
-        _config.use_llm_reranking = False
+        config.use_llm_reranking = False
 
     print("=" * 50)
     print("ADK RAG MCP Server")
     print("=" * 50)
-    print(f"Provider: {_config.llm_provider}")
+    print(f"Provider: {config.llm_provider}")
     print(f"Host: {args.host}:{args.port}")
-    print(f"Index path: {_config.index_path}")
-    print(f"LLM model: {_config.llm_model}")
-    print(f"Embedding model: {_config.embedding_model}")
-    print(f"Hybrid retrieval: {_config.use_hybrid_retrieval}")
-    print(f"LLM reranking: {_config.use_llm_reranking}")
+    print(f"Index path: {config.index_path}")
+    print(f"LLM model: {config.llm_model}")
+    print(f"Embedding model: {config.embedding_model}")
+    print(f"Hybrid retrieval: {config.use_hybrid_retrieval}")
+    print(f"LLM reranking: {config.use_llm_reranking}")
+    print(f"Startup: {'eager (warm-up before ready)' if args.eager else 'lazy'}")
+    print(f"Workers: {args.workers}")
     print("=" * 50)
-    uvicorn.run(app, host=args.host, port=args.port)
+    if args.workers > 1:
+        run_workers(config, args.host, args.port, args.workers, args.eager)
+    else:
+        serve(config, args.host, args.port, args.eager)
 
 
 if __name__ == "__main__":
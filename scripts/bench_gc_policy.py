@@ -0,0 +1,157 @@
+"""
+Benchmark query latency under each garbage-collection policy.
+
+Builds a synthetic hybrid index sized like the ADK docs index (chunks and
+parents), then runs the same queries through RAGSystem with each
+``gc_policy``. Embeddings and the LLM are local stand-ins, so the numbers
+isolate the pipeline's own overhead (retrieval, fusion, parent expansion
+and explicit collections) and no API key is needed.
+
+Usage:
+    python scripts/bench_gc_policy.py --queries 300 --chunks 12600 --parents 2400
+    python scripts/bench_gc_policy.py --no-freeze   # without gc_freeze_after_load
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from rag.adk_rag import query as query_module  # noqa: E402
+from rag.adk_rag.config import RAGConfig  # noqa: E402
+from rag.adk_rag.ingest import save_bm25_data, save_bm25_index, save_parent_docs  # noqa: E402
+
+DIMENSION = 64
+WORDS = [
+    "agent", "tool", "session", "memory", "runner", "callback", "workflow", "mcp",
+    "a2a", "python", "go", "java", "function", "state", "event", "model", "stream",
+    "deploy", "config", "artifact", "evaluate", "sequential", "parallel", "loop",
+]
+
+
+class HashEmbeddings(Embeddings):
+    def embed_query(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).random(DIMENSION, dtype=np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+class EchoLLM:
+    def invoke(self, prompt: str):
+        class _Resp:
+            content = prompt[-200:]
+
+        return _Resp()
+
+
+def build_index(index_path: str, n_chunks: int, n_parents: int) -> None:
+    rng = random.Random(0)
+    parents = {}
+    for i in range(n_parents):
+        text = " ".join(rng.choice(WORDS) for _ in range(300))
+        parents[f"p{i}"] = Document(
+            page_content=f"[LANG=Python] {text}",
+            metadata={"source": f"doc{i % 200}.md", "breadcrumb": f"Section {i}", "parent_id": f"p{i}"},
+        )
+
+    chunks = []
+    for i in range(n_chunks):
+        text = " ".join(rng.choice(WORDS) for _ in range(60))
+        chunks.append(
+            Document(
+                page_content=f"[DOC_TEXT] [LANG=Python] [GENERAL] {text}",
+                metadata={"source": f"doc{i % 200}.md", "parent_id": f"p{i % n_parents}"},
+            )
+        )
+
+    vectors = np.random.default_rng(0).random((n_chunks, DIMENSION), dtype=np.float32)
+    store = FAISS.from_embeddings(
+        [(doc.page_content, vector.tolist()) for doc, vector in zip(chunks, vectors)],
+        HashEmbeddings(),
+        metadatas=[doc.metadata for doc in chunks],
+    )
+    store.save_local(index_path)
+    save_parent_docs(parents, index_path)
+    save_bm25_data(chunks, index_path)
+    save_bm25_index(chunks, index_path)
+
+
+def run_policy(index_path: str, policy: str, queries: List[str], args) -> None:
+    cfg = RAGConfig(
+        index_path=index_path,
+        use_llm_reranking=False,
+        embedding_cache_size=0,
+        gc_policy=policy,
+        gc_rss_threshold_mb=args.rss_threshold_mb,
+        gc_interval=args.interval,
+    )
+    cfg.embedding_model = cfg.llm_model = cfg.rerank_model = "bench"
+    rag = query_module.RAGSystem(cfg)
+    if not args.no_freeze:
+        # As the MCP server does with gc_freeze_after_load
+        rag.memory.freeze()
+
+    latencies: List[float] = []
+    for query in queries:
+        start = time.perf_counter()
+        rag.query(query)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    rag.memory.stop()
+
+    latencies.sort()
+    gc_stats = rag.memory.stats()
+    print(
+        f"{policy:<9} p50={statistics.median(latencies):7.2f} ms  "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms  "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:7.2f} ms  "
+        f"collections={gc_stats['collections']:<4} gc_total={gc_stats['total_ms']:.1f} ms  "
+        f"gc_max={gc_stats['max_ms']:.1f} ms  rss={gc_stats['rss_mb']:.0f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare query latency across gc policies.")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--chunks", type=int, default=12600)
+    parser.add_argument("--parents", type=int, default=2400)
+    parser.add_argument("--rss-threshold-mb", type=float, default=2048.0)
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument(
+        "--no-freeze", action="store_true", help="Do not gc.freeze() the loaded index"
+    )
+    parser.add_argument(
+        "--policies", nargs="+", default=["always", "off", "rss", "periodic"]
+    )
+    args = parser.parse_args()
+
+    # Local stand-ins for the provider clients
+    query_module._create_embeddings = lambda cfg: HashEmbeddings()
+    query_module._create_llm = lambda cfg, temperature=None: EchoLLM()
+
+    rng = random.Random(1)
+    queries = [" ".join(rng.choice(WORDS) for _ in range(6)) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Building synthetic index ({args.chunks} chunks, {args.parents} parents)...")
+        build_index(tmp, args.chunks, args.parents)
+        for policy in args.policies:
+            run_policy(tmp, policy, queries, args)
+
+
+if __name__ == "__main__":
+    main()
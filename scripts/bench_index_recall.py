@@ -0,0 +1,108 @@
+"""
+Measure recall, size and latency of FAISS index types against exact search.
+
+Vectors come from an existing index (``--index``, e.g. rag/index) or are
+generated. Queries are corpus vectors with a little noise added, and each
+factory is scored by recall@k against the exact (flat) neighbours.
+``--dimensions`` truncates and re-normalizes vectors first, which shows
+what a smaller ``embedding_dimensions`` would cost (only meaningful with
+``--index``: generated vectors are not Matryoshka-trained).
+
+Usage:
+    python scripts/bench_index_recall.py --index rag/index
+    python scripts/bench_index_recall.py --vectors 20000 --dim 3072 \\
+        --factories Flat HNSW32 SQ8,RFlat PCA256,SQ8,RFlat LSH,RFlat
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from rag.adk_rag.vector_index import build_index, set_search_defaults  # noqa: E402
+
+DEFAULT_FACTORIES = [
+    "Flat",
+    "HNSW32",
+    "SQ8",
+    "SQ8,RFlat",
+    "PCA256,SQ8,RFlat",
+    "LSH,RFlat",
+    "IVF256,PQ32,RFlat",
+]
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.index:
+        index = faiss.read_index(str(Path(args.index) / "index.faiss"))
+        return index.reconstruct_n(0, index.ntotal)
+    rng = np.random.default_rng(0)
+    # Clustered data behaves more like text embeddings than uniform noise
+    centers = rng.standard_normal((64, args.dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), args.vectors)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def truncate(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    head = np.ascontiguousarray(vectors[:, :dimensions])
+    return head / np.linalg.norm(head, axis=1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare FAISS index types by recall and size.")
+    parser.add_argument("--index", help="Directory with an index.faiss to take vectors from")
+    parser.add_argument("--vectors", type=int, default=12600)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--dimensions", type=int, default=0, help="Truncate vectors first")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--train-size", type=int, default=50000)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--k-factor", type=float, default=4.0)
+    parser.add_argument("--factories", nargs="+", default=DEFAULT_FACTORIES)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[rows] + 0.05 * rng.standard_normal((len(rows), vectors.shape[1])).astype(np.float32)
+
+    # Ground truth is always exact search over the full vectors
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    if args.dimensions:
+        vectors, queries = truncate(vectors, args.dimensions), truncate(queries, args.dimensions)
+    print(f"{len(vectors)} vectors, {vectors.shape[1]} dims, recall@{args.k} vs exact float32")
+
+    for factory in args.factories:
+        try:
+            index = build_index(vectors, factory, args.train_size)
+        except RuntimeError as exc:
+            print(f"{factory:<20} failed: {exc}")
+            continue
+        set_search_defaults(index, args.ef_search, args.nprobe, args.k_factor)
+
+        start = time.perf_counter()
+        _, found = index.search(queries, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0 / len(queries)
+
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        size_mb = faiss.serialize_index(index).nbytes / (1024 * 1024)
+        print(
+            f"{factory:<20} recall={recall:.3f}  size={size_mb:8.1f} MB  "
+            f"search={elapsed_ms:6.2f} ms/query"
+        )
+
+
+if __name__ == "__main__":
+    main()
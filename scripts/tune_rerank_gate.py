@@ -0,0 +1,190 @@
+"""
+Tune the rerank confidence gate against the ground-truth questions.
+
+Every question in ``rag/docs/ground_truth`` is retrieved and reranked with
+the configured index and reranker (API keys required). For each candidate
+threshold the script reports how often the gate would skip or shrink
+reranking and what that does to the ground truth: ``hit`` is the context
+hit rate of the final top-n (the share of a question's ground-truth
+contexts found in some chunk, averaged over questions) when the gated
+questions skip or shrink reranking and the others are reranked in full,
+``delta`` its change from always reranking. ``kept`` is the share of the
+reranked top-n already in the fused top-n (what skipping keeps),
+``covered`` the share found within the first ``rerank_gate_shrink_n``
+candidates (what shrinking keeps).
+
+A context counts as found when a chunk contains at least ``--min-coverage``
+of its words.
+
+Usage:
+    python scripts/tune_rerank_gate.py
+    python scripts/tune_rerank_gate.py --config rag/adk_rag/config.yaml --shrink-n 10
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from rag.adk_rag.config import load_config  # noqa: E402
+from rag.adk_rag.query import RAGSystem  # noqa: E402
+
+GROUND_TRUTH_DIR = Path(__file__).resolve().parents[1] / "rag" / "docs" / "ground_truth"
+
+
+def _contexts(item: Dict[str, Any]) -> List[str]:
+    """Ground-truth contexts of an item (lists may be stored as their repr)."""
+    value = item.get("context") or item.get("ground_truth_context") or []
+    if isinstance(value, str):
+        if value.startswith("["):
+            try:
+                value = ast.literal_eval(value)
+            except (SyntaxError, ValueError):
+                value = [value]
+        else:
+            value = [value]
+    return [str(context) for context in value if str(context).strip()]
+
+
+def load_questions(path: Path) -> List[Dict[str, Any]]:
+    questions = []
+    for file in sorted(path.glob("*.json")):
+        with open(file, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                question = item.get("input") or item.get("query")
+                contexts = _contexts(item)
+                if question and contexts:
+                    questions.append({"question": question, "contexts": contexts})
+    return questions
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9_]+", text.lower()))
+
+
+def context_hit(contexts: List[str], chunks: List[str], min_coverage: float) -> float:
+    """Share of ``contexts`` with at least ``min_coverage`` of their words in one chunk."""
+    chunk_words = [_words(chunk) for chunk in chunks]
+    found = 0
+    for context in contexts:
+        words = _words(context)
+        if words and any(len(words & chunk) / len(words) >= min_coverage for chunk in chunk_words):
+            found += 1
+    return found / len(contexts)
+
+
+def _share(found: List[str], reference: List[str]) -> float:
+    return len(set(found) & set(reference)) / len(reference) if reference else 1.0
+
+
+def measure(
+    rag: RAGSystem, item: Dict[str, Any], shrink_n: int, min_coverage: float
+) -> Dict[str, Any] | None:
+    cfg = rag.config
+    question = item["question"]
+    requested_lang = rag._detect_requested_language(question)
+    stats: Dict[str, Any] = {}
+    candidates = rag._retrieve_candidates(question, requested_lang, stats)
+    candidates = rag._filter_by_language(candidates, requested_lang)[: cfg.fusion_top_n]
+    if not candidates:
+        return None
+
+    top_n = cfg.rerank_top_n
+    texts = [doc.page_content for doc in candidates]
+    reranked = [doc.page_content for doc in rag.reranker.rerank(question, candidates, top_n)]
+    shrunk = [
+        doc.page_content
+        for doc in rag.reranker.rerank(question, candidates[: max(shrink_n, top_n)], top_n)
+    ]
+    return {
+        **stats["agreement"],
+        "kept": _share(texts[:top_n], reranked),
+        "covered": _share(texts[:shrink_n], reranked),
+        "hit_full": context_hit(item["contexts"], reranked, min_coverage),
+        "hit_skip": context_hit(item["contexts"], texts[:top_n], min_coverage),
+        "hit_shrink": context_hit(item["contexts"], shrunk, min_coverage),
+    }
+
+
+def _mean(rows: List[Dict[str, Any]], key: str) -> float:
+    return sum(row[key] for row in rows) / len(rows) if rows else float("nan")
+
+
+def _gated_hit(rows: List[Dict[str, Any]], gated: List[bool], key: str) -> float:
+    """Hit rate when gated rows use ``key`` and the others are fully reranked."""
+    hits = [row[key] if gate else row["hit_full"] for row, gate in zip(rows, gated)]
+    return sum(hits) / len(hits) if hits else float("nan")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tune rerank_gate thresholds on ground truth.")
+    parser.add_argument("--config", help="Config file (default: rag/adk_rag/config.yaml)")
+    parser.add_argument("--ground-truth", default=str(GROUND_TRUTH_DIR))
+    parser.add_argument("--shrink-n", type=int, default=0, help="Default: rerank_gate_shrink_n")
+    parser.add_argument(
+        "--min-coverage",
+        type=float,
+        default=0.6,
+        help="Share of a context's words a chunk must contain to count as a hit",
+    )
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    cfg.use_hybrid_retrieval = True
+    cfg.use_llm_reranking = True
+    cfg.rerank_gate = False
+    shrink_n = args.shrink_n or cfg.rerank_gate_shrink_n
+
+    rag = RAGSystem(cfg)
+    if rag.reranker is None:
+        raise SystemExit(f"Reranker '{cfg.reranker}' is not available")
+
+    rows = []
+    for item in load_questions(Path(args.ground_truth)):
+        row = measure(rag, item, shrink_n, args.min_coverage)
+        if row is not None:
+            rows.append(row)
+    if not rows:
+        raise SystemExit("No ground-truth question retrieved any candidate")
+
+    baseline = _mean(rows, "hit_full")
+    print(f"{len(rows)} questions, rerank_top_n={cfg.rerank_top_n}, shrink_n={shrink_n}")
+    print(f"always rerank: hit={baseline:.3f} (ground-truth context hit rate)")
+    print(
+        f"never rerank:  hit={_mean(rows, 'hit_skip'):.3f}, "
+        f"kept={_mean(rows, 'kept'):.3f} (fused top-n vs reranked top-n)\n"
+    )
+
+    print("skip_overlap  min_margin  skip_rate    hit   delta  kept")
+    for overlap in (0.5, 0.625, 0.75, 0.875, 1.0):
+        for margin in (0.0, 0.2, 0.3, 0.4, 0.5):
+            gated = [
+                row["top1_agree"] and row["overlap"] >= overlap and row["margin"] >= margin
+                for row in rows
+            ]
+            skipped = [row for row, gate in zip(rows, gated) if gate]
+            hit = _gated_hit(rows, gated, "hit_skip")
+            print(
+                f"{overlap:12.3f}  {margin:10.2f}  {len(skipped) / len(rows):9.2f}  "
+                f"{hit:.3f}  {hit - baseline:+.3f}  {_mean(skipped, 'kept'):.3f}"
+            )
+
+    print("\nshrink_overlap  shrink_rate    hit   delta  covered")
+    for overlap in (0.25, 0.375, 0.5, 0.625, 0.75):
+        gated = [row["overlap"] >= overlap for row in rows]
+        shrunk = [row for row, gate in zip(rows, gated) if gate]
+        hit = _gated_hit(rows, gated, "hit_shrink")
+        print(
+            f"{overlap:14.3f}  {len(shrunk) / len(rows):11.2f}  {hit:.3f}  "
+            f"{hit - baseline:+.3f}  {_mean(shrunk, 'covered'):.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -29,8 +29,20 @@ class DummyLLM:
         self._content = content
 
     def invoke(self, _prompt: str):
-        class _Resp:
-            def __init__(self, content: str):
-                self.content = content
-
         return _Resp(self._content)
+
+    def stream(self, _prompt: str):
+        for word in self._content.split(" "):
+            yield _Resp(word + " ")
+
+    async def ainvoke(self, prompt: str):
+        return self.invoke(prompt)
+
+    async def astream(self, prompt: str):
+        for chunk in self.stream(prompt):
+            yield chunk
+
+
+class _Resp:
+    def __init__(self, content: str):
+        self.content = content
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from rag.adk_rag.attributes import AttributeTable, chunk_key
+
+
+DOCS = [
+    Document(
+        page_content="[DOC_CODE] [LANG=Python] [MCP] Tools\ncode",
+        metadata={"chunk_id": "p1-0", "source": "a.md", "project_area": "[MCP]"},
+    ),
+    Document(
+        page_content="[DOC_TEXT] [LANG=Go] [GENERAL] Agents\ntext",
+        metadata={"chunk_id": "p2-0", "source": "b.md", "project_area": "[GENERAL]"},
+    ),
+    Document(page_content="untagged legacy chunk", metadata={"source": "a.md"}),
+]
+
+
+def _table():
+    return AttributeTable.from_documents(DOCS, [chunk_key(doc) for doc in DOCS])
+
+
+def test_attribute_table_encodes_columns():
+    table = _table()
+
+    assert [table.value("language", row) for row in range(3)] == ["Python", "Go", "Unknown"]
+    assert [table.value("content_type", row) for row in range(3)] == ["code", "text", "unknown"]
+    assert table.value("source", 2) == "a.md"
+    assert table.columns["language"].itemsize == 1
+
+
+def test_attribute_table_masks_rows():
+    table = _table()
+
+    assert table.mask("language", ["Python", "Unknown"]).tolist() == [True, False, True]
+    rows = table.rows([chunk_key(DOCS[1]), "missing", chunk_key(DOCS[0])])
+    assert rows.tolist() == [1, -1, 0]
+    assert table.mask("language", ["Go"], rows).tolist() == [True, False, False]
+
+
+def test_attribute_table_roundtrip(tmp_path: Path):
+    _table().save(str(tmp_path), "chunks")
+
+    loaded = AttributeTable.load(str(tmp_path), "chunks")
+
+    assert loaded.ids == _table().ids
+    assert loaded.row("p2-0") == 1
+    assert loaded.value("language", 1) == "Go"
+    assert AttributeTable.load(str(tmp_path), "parents") is None
+    # Written under temporary names, then renamed into place
+    assert sorted(p.name for p in (tmp_path / "attributes").iterdir()) == [
+        "chunks.json",
+        "chunks.npz",
+    ]
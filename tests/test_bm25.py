@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from rag.adk_rag.bm25 import BM25Index
+
+CORPUS = [
+    "FunctionTool wraps a Python function as a tool",
+    "LoopAgent runs its sub agents in a loop",
+    "SequentialAgent runs sub agents one after another",
+    "ParallelAgent runs sub agents concurrently",
+    "MCPToolset connects an agent to an MCP server",
+    "FunctionTool FunctionTool schema is inferred from the signature",
+]
+
+
+def test_scores_match_rank_bm25():
+    index = BM25Index.from_texts(CORPUS)
+    reference = BM25Okapi([text.split() for text in CORPUS])
+
+    for query in ["FunctionTool", "sub agents", "MCP server agent", "unknown term"]:
+        expected = reference.get_scores(query.split())
+        np.testing.assert_allclose(index.get_scores(query), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_search_returns_best_first():
+    index = BM25Index.from_texts(CORPUS)
+    hits = index.search("FunctionTool", k=2)
+
+    assert [doc_id for doc_id, _ in hits] == [5, 0]
+    assert hits[0][1] >= hits[1][1]
+
+
+def test_save_and_load_roundtrip(tmp_path: Path):
+    index = BM25Index.from_texts(CORPUS)
+    index.save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert loaded is not None
+    # Postings are views over the memory-mapped files, not copies
+    assert not loaded.matrix.data.flags.owndata
+    assert not loaded.matrix.indices.flags.owndata
+    assert loaded.search("sub agents", k=3) == index.search("sub agents", k=3)
+
+
+def test_save_does_not_rewrite_mapped_files(tmp_path: Path):
+    BM25Index.from_texts(CORPUS).save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    before = loaded.search("sub agents", k=3)
+
+    BM25Index.from_texts(["sub agents only here"]).save(str(tmp_path))
+
+    # The old mapping still reads the old arrays; a new load sees the new ones
+    assert loaded.search("sub agents", k=3) == before
+    assert BM25Index.load(str(tmp_path)).n_docs == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bm25"]
+
+
+def test_load_missing_index_returns_none(tmp_path: Path):
+    assert BM25Index.load(str(tmp_path)) is None
+
+
+def test_search_skips_documents_without_query_terms():
+    index = BM25Index.from_texts(CORPUS)
+
+    assert [doc_id for doc_id, _ in index.search("MCPToolset", k=5)] == [4]
+    assert index.search("unknown term", k=5) == []
+
+
+def test_search_batch_matches_single_queries():
+    index = BM25Index.from_texts(CORPUS)
+    queries = ["FunctionTool", "sub agents", "MCP server agent"]
+
+    assert index.search_batch(queries, k=3) == [index.search(q, k=3) for q in queries]
+
+
+def test_search_respects_document_mask():
+    index = BM25Index.from_texts(CORPUS)
+    mask = np.ones(len(CORPUS), dtype=bool)
+    mask[5] = False
+
+    hits = index.search("FunctionTool", k=5, mask=mask)
+
+    assert [doc_id for doc_id, _ in hits] == [0]
@@ -0,0 +1,149 @@
+import asyncio
+from pathlib import Path
+
+from rag.adk_rag.cache import (
+    CachedEmbeddings,
+    LRUCache,
+    RerankScoreCache,
+    SemanticCache,
+    SQLiteVectorStore,
+)
+
+from conftest import FakeEmbeddings
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        self.query_calls = 0
+        self.embedded_documents = []
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return super().embed_query(text)
+
+    def embed_documents(self, texts):
+        self.embedded_documents.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_expires_entries_after_ttl():
+    now = [100.0]
+    cache = LRUCache(max_size=10, ttl=5.0, clock=lambda: now[0])
+    cache.set("a", 1)
+
+    now[0] = 104.0
+    assert cache.get("a") == 1
+    now[0] = 106.0
+    assert cache.get("a") is None
+
+
+def test_cached_embeddings_reuses_normalized_queries():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, model="test-model", max_size=10)
+
+    first = cached.embed_query("What is  a FunctionTool?")
+    second = cached.embed_query("what is a functiontool?")
+
+    assert first == second
+    assert inner.query_calls == 1
+    stats = cached.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cached_embeddings_async_queries_share_cache():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, model="test-model", max_size=10)
+
+    first = asyncio.run(cached.aembed_query("What is a FunctionTool?"))
+    second = cached.embed_query("what is a functiontool?")
+
+    assert first == second
+    assert inner.query_calls == 1
+    assert cached.stats()["hits"] == 1
+
+
+def test_cached_embeddings_keys_include_model():
+    inner = CountingEmbeddings()
+    cache_a = CachedEmbeddings(inner, model="model-a")
+    cache_b = CachedEmbeddings(inner, model="model-b")
+
+    assert cache_a._query_key("query") != cache_b._query_key("query")
+
+
+def test_cached_embeddings_disk_tier_survives_restart(tmp_path: Path):
+    path = str(tmp_path / "cache.sqlite")
+    inner = CountingEmbeddings()
+
+    CachedEmbeddings(inner, model="m", store=SQLiteVectorStore(path)).embed_query("query")
+    restarted = CachedEmbeddings(inner, model="m", store=SQLiteVectorStore(path))
+    vector = restarted.embed_query("query")
+
+    assert inner.query_calls == 1
+    assert restarted.stats()["disk_hits"] == 1
+    assert len(vector) == FakeEmbeddings.embedding_dimension
+
+
+def test_document_embeddings_only_embed_changed_chunks(tmp_path: Path):
+    path = str(tmp_path / "cache.sqlite")
+    inner = CountingEmbeddings()
+
+    first = CachedEmbeddings(inner, model="m", store=SQLiteVectorStore(path))
+    first.embed_documents(["chunk a", "chunk b", "chunk b"])
+    assert inner.embedded_documents == ["chunk a", "chunk b"]
+
+    inner.embedded_documents.clear()
+    second = CachedEmbeddings(inner, model="m", store=SQLiteVectorStore(path))
+    vectors = second.embed_documents(["chunk a", "chunk b changed"])
+
+    assert inner.embedded_documents == ["chunk b changed"]
+    assert len(vectors) == 2
+    assert second.stats()["document_hits"] == 1
+    assert second.stats()["document_misses"] == 1
+
+
+def test_semantic_cache_matches_similar_vectors_in_namespace():
+    cache = SemanticCache(max_size=4, threshold=0.9)
+    cache.store("ns", [1.0, 0.0, 0.0], {"answer": "A"})
+
+    hit = cache.lookup("ns", [0.99, 0.05, 0.0])
+    assert hit is not None
+    assert hit[0]["answer"] == "A"
+    assert cache.lookup("ns", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("other-ns", [1.0, 0.0, 0.0]) is None
+
+
+def test_semantic_cache_evicts_least_recently_used():
+    cache = SemanticCache(max_size=2, threshold=0.99)
+    cache.store("ns", [1.0, 0.0, 0.0], {"answer": "A"})
+    cache.store("ns", [0.0, 1.0, 0.0], {"answer": "B"})
+    cache.lookup("ns", [1.0, 0.0, 0.0])
+    cache.store("ns", [0.0, 0.0, 1.0], {"answer": "C"})
+
+    assert len(cache) == 2
+    assert cache.lookup("ns", [1.0, 0.0, 0.0])[0]["answer"] == "A"
+    assert cache.lookup("ns", [0.0, 1.0, 0.0]) is None
+
+
+def test_rerank_score_cache_keys_normalize_query_and_include_model():
+    cache = RerankScoreCache(max_size=8)
+    cache.set_many({key: 0.5 for key in cache.keys("m1", "How  do Agents work", ["chunk"])})
+
+    assert cache.get_many(cache.keys("m1", "how do agents work", ["chunk"])) == [0.5]
+    assert cache.get_many(cache.keys("m2", "how do agents work", ["chunk"])) == [None]
+    assert cache.get_many(cache.keys("m1", "how do agents work", ["chunk!"])) == [None]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
@@ -1,6 +1,12 @@
 from pathlib import Path
 
-from rag.adk_rag.chunking import chunk_document, load_documents
+from rag.adk_rag.chunking import (
+    chunk_document,
+    chunk_document_with_parents,
+    iter_documents_with_parents,
+    load_documents,
+    load_documents_with_parents,
+)
 
 
 def test_chunk_document_splits_code_and_text():
@@ -19,3 +25,50 @@ def test_load_documents_skips_navigation(tmp_path: Path):
     # The navigation chunk should be skipped, leaving only real content
     assert any("Actual content" in doc.page_content for doc in docs)
     assert all("Skip to main content" not in doc.page_content for doc in docs)
+
+
+def test_parent_and_chunk_ids_are_deterministic():
+    text = "# Title\n\nIntro text.\n\n## Section\n\nMore text about FunctionTool."
+    first_chunks, first_parents = chunk_document_with_parents(text, "a.md", 500, 100)
+    second_chunks, second_parents = chunk_document_with_parents(text, "a.md", 500, 100)
+    other_chunks, _ = chunk_document_with_parents(text, "b.md", 500, 100)
+
+    assert list(first_parents) == list(second_parents)
+    assert [c.metadata["chunk_id"] for c in first_chunks] == [
+        c.metadata["chunk_id"] for c in second_chunks
+    ]
+    assert len({c.metadata["chunk_id"] for c in first_chunks}) == len(first_chunks)
+    assert first_chunks[0].metadata["chunk_id"] != other_chunks[0].metadata["chunk_id"]
+
+
+def test_parallel_chunking_matches_serial(tmp_path: Path):
+    for i in range(6):
+        (tmp_path / f"doc{i}.md").write_text(
+            f"# Doc {i}\n\nIntro {i}.\n\n## Usage\n\n```python\nprint({i})\n```\n",
+            encoding="utf-8",
+        )
+    (tmp_path / "bad.md").write_bytes(b"\xff\xfe not utf-8")
+
+    serial_chunks, serial_parents = load_documents_with_parents(str(tmp_path), 200, 20)
+    parallel_chunks, parallel_parents = load_documents_with_parents(
+        str(tmp_path), 200, 20, workers=2
+    )
+
+    assert [c.metadata["chunk_id"] for c in parallel_chunks] == [
+        c.metadata["chunk_id"] for c in serial_chunks
+    ]
+    assert [c.page_content for c in parallel_chunks] == [c.page_content for c in serial_chunks]
+    assert list(parallel_parents) == list(serial_parents)
+
+
+def test_iter_documents_with_parents_yields_per_file(tmp_path: Path):
+    (tmp_path / "a.md").write_text("# A\n\nAlpha.", encoding="utf-8")
+    (tmp_path / "b.md").write_text("# B\n\nBeta.", encoding="utf-8")
+
+    results = list(iter_documents_with_parents(str(tmp_path), 200, 20))
+
+    assert len(results) == 2
+    assert [chunks[0].metadata["source"] for chunks, _ in results] == [
+        str(tmp_path / "a.md"),
+        str(tmp_path / "b.md"),
+    ]
@@ -0,0 +1,60 @@
+from rag.adk_rag.context import (
+    ContextSection,
+    TokenCounter,
+    pack_context,
+    strip_chunk_tags,
+    window_around,
+)
+
+
+def _counter():
+    # Character estimate (4 chars per token), independent of tiktoken files
+    counter = TokenCounter()
+    counter.encoding = None
+    return counter
+
+
+PARENT = "\n".join(f"line {i:02d} " + "x" * 30 for i in range(20))
+
+
+def test_window_centers_on_anchor_line():
+    window = window_around(PARENT, "line 10 xxx", max_tokens=40, counter=_counter())
+
+    # 10 tokens per line plus 1 per joining newline
+    assert [line[:7] for line in window.split("\n")] == ["line 09", "line 10", "line 11"]
+
+
+def test_window_starts_at_top_without_anchor():
+    window = window_around(PARENT, "not in the text", max_tokens=25, counter=_counter())
+
+    assert window.startswith("line 00")
+    assert _counter().count(window) <= 25
+
+
+def test_pack_context_respects_budget_and_section_cap():
+    counter = _counter()
+    sections = [
+        ContextSection("a.md", "A", PARENT, anchor="line 15"),
+        ContextSection("b.md", "B", "short section"),
+        ContextSection("c.md", "C", PARENT),
+    ]
+
+    contexts, block = pack_context(sections, counter, budget=160, section_max_tokens=60)
+
+    assert "line 15" in contexts[0]
+    assert counter.count(contexts[0]) <= 60
+    assert contexts[1] == "short section"
+    assert len(contexts) == 2
+    assert block.count("<source ") == 2
+    assert counter.count(block) <= 160
+
+
+def test_pack_context_without_limits_keeps_full_sections():
+    contexts, block = pack_context([ContextSection("a.md", "A", PARENT)], _counter())
+
+    assert contexts == [PARENT]
+    assert block == f'<source file="a.md" section="A">\n{PARENT}\n</source>\n\n'
+
+
+def test_strip_chunk_tags_removes_tag_line():
+    assert strip_chunk_tags("[DOC_CODE] [LANG=Python] [AGENTS] Agents > Tools\nbody") == "body"
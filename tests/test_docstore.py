@@ -0,0 +1,58 @@
+from langchain_core.documents import Document
+
+from rag.adk_rag.docstore import DocumentMap, DocumentStore
+from rag.adk_rag.ingest import load_bm25_docs, load_parent_docs, save_bm25_data, save_parent_docs
+
+
+DOCS = [
+    Document(page_content="[LANG=Python] héllo", metadata={"source": "a.md", "start": 0}),
+    Document(page_content="", metadata={"source": "a.md", "tags": ["x", "y"]}),
+    Document(page_content="third", metadata={}),
+]
+
+
+def test_store_roundtrip_preserves_text_and_metadata(tmp_path):
+    DocumentStore.save(DOCS, str(tmp_path), "chunks")
+    store = DocumentStore.load(str(tmp_path), "chunks")
+
+    assert len(store) == 3
+    assert [doc.page_content for doc in store] == [doc.page_content for doc in DOCS]
+    assert [doc.metadata for doc in store] == [doc.metadata for doc in DOCS]
+    assert store[-1].page_content == "third"
+    assert [doc.page_content for doc in store[1:]] == ["", "third"]
+    store.close()
+
+
+def test_store_missing_or_empty(tmp_path):
+    assert DocumentStore.load(str(tmp_path), "chunks") is None
+
+    DocumentStore.save([], str(tmp_path), "chunks")
+    store = DocumentStore.load(str(tmp_path), "chunks")
+    assert len(store) == 0
+    assert list(store) == []
+
+
+def test_document_map_looks_up_by_id(tmp_path):
+    DocumentStore.save(DOCS, str(tmp_path), "parents", ids=["p1", "p2", "p3"])
+    parents = DocumentMap(DocumentStore.load(str(tmp_path), "parents"))
+
+    assert "p2" in parents and "p4" not in parents
+    assert list(parents) == ["p1", "p2", "p3"]
+    assert parents["p3"].page_content == "third"
+
+
+def test_save_replaces_existing_store(tmp_path):
+    save_bm25_data(DOCS, str(tmp_path))
+    save_bm25_data(DOCS[:1], str(tmp_path))
+
+    assert [doc.page_content for doc in load_bm25_docs(str(tmp_path))] == ["[LANG=Python] héllo"]
+
+
+def test_parent_docs_roundtrip_without_pickle(tmp_path):
+    parents = {"p1": DOCS[0], "p2": DOCS[2]}
+    save_parent_docs(parents, str(tmp_path))
+
+    loaded = load_parent_docs(str(tmp_path))
+    assert list(loaded) == ["p1", "p2"]
+    assert loaded["p1"].metadata == {"source": "a.md", "start": 0}
+    assert not list(tmp_path.glob("*.pkl"))
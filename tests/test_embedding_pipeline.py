@@ -0,0 +1,177 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from rag.adk_rag.config import RAGConfig
+from rag.adk_rag.embedding_pipeline import (
+    RateLimitedEmbeddings,
+    RateLimiter,
+    TruncatedEmbeddings,
+    create_embeddings,
+    embed_in_batches,
+    embedding_model_key,
+    is_transient_error,
+)
+
+from conftest import FakeEmbeddings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FlakyEmbeddings(FakeEmbeddings):
+    def __init__(self, failures, status_code=429):
+        self.failures = failures
+        self.status_code = status_code
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ProviderError(self.status_code)
+        return super().embed_documents(texts)
+
+
+class SlowFirstEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        # The first batch finishes last
+        time.sleep(0.05 if texts[0] == "doc-0" else 0.01)
+        with self._lock:
+            self.active -= 1
+        return super().embed_documents(texts)
+
+
+def test_rate_limiter_paces_requests_per_minute():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=60, clock=clock, sleep=clock.sleep)
+
+    for _ in range(62):
+        limiter.acquire()
+
+    # The first minute's budget is free, then one request per second
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_rate_limiter_paces_tokens_per_minute():
+    clock = FakeClock()
+    limiter = RateLimiter(tokens_per_minute=600, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire(600)
+    limiter.acquire(100)
+
+    assert clock.now == pytest.approx(10.0)
+
+
+def test_rate_limited_embeddings_retries_failures():
+    clock = FakeClock()
+    flaky = FlakyEmbeddings(failures=2)
+    embeddings = RateLimitedEmbeddings(flaky, max_retries=3, sleep=clock.sleep)
+
+    vectors = embeddings.embed_documents(["a", "b"])
+
+    assert vectors == FakeEmbeddings().embed_documents(["a", "b"])
+    assert flaky.calls == 3
+    assert len(clock.sleeps) == 2
+
+
+def test_rate_limited_embeddings_gives_up_after_max_retries():
+    clock = FakeClock()
+    embeddings = RateLimitedEmbeddings(
+        FlakyEmbeddings(failures=10), max_retries=2, sleep=clock.sleep
+    )
+
+    with pytest.raises(ProviderError):
+        embeddings.embed_documents(["a"])
+
+
+def test_rate_limited_embeddings_raises_permanent_errors_at_once():
+    clock = FakeClock()
+    flaky = FlakyEmbeddings(failures=10, status_code=401)
+    embeddings = RateLimitedEmbeddings(flaky, max_retries=5, sleep=clock.sleep)
+
+    with pytest.raises(ProviderError):
+        embeddings.embed_documents(["a"])
+    assert flaky.calls == 1
+    assert clock.sleeps == []
+
+
+def test_is_transient_error():
+    class APITimeoutError(Exception):
+        pass
+
+    assert is_transient_error(ProviderError(429))
+    assert is_transient_error(ProviderError(503))
+    assert is_transient_error(APITimeoutError())
+    assert is_transient_error(ConnectionResetError())
+    assert not is_transient_error(ProviderError(400))
+    assert not is_transient_error(ValueError("input too long"))
+
+
+def test_embed_in_batches_yields_in_input_order():
+    docs = [Document(page_content=f"doc-{i}") for i in range(10)]
+    embeddings = SlowFirstEmbeddings()
+
+    batches = list(embed_in_batches(embeddings, iter(docs), batch_size=3, concurrency=3))
+
+    assert [len(batch) for batch, _ in batches] == [3, 3, 3, 1]
+    flat_docs = [doc for batch, _ in batches for doc in batch]
+    flat_vectors = [vector for _, vectors in batches for vector in vectors]
+    assert flat_docs == docs
+    assert flat_vectors == FakeEmbeddings().embed_documents([d.page_content for d in docs])
+    assert 1 < embeddings.max_active <= 3
+
+
+def test_truncated_embeddings_keep_unit_length_prefix():
+    embeddings = TruncatedEmbeddings(FakeEmbeddings(), 4)
+
+    vector = embeddings.embed_query("FunctionTool")
+    full = FakeEmbeddings().embed_query("FunctionTool")
+
+    assert len(vector) == 4
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert np.allclose(np.asarray(vector) * np.linalg.norm(full[:4]), full[:4], atol=1e-6)
+    assert [len(v) for v in embeddings.embed_documents(["a", "b"])] == [4, 4]
+
+
+def test_embedding_model_key_separates_dimensions():
+    assert embedding_model_key("text-embedding-3-large") == "text-embedding-3-large"
+    assert embedding_model_key("text-embedding-3-large", 256) != embedding_model_key(
+        "text-embedding-3-large", 1024
+    )
+
+
+def test_create_embeddings_truncates_client_side_except_openai():
+    cfg = RAGConfig(llm_provider="ollama", embedding_model="nomic-embed-text", embedding_dimensions=256)
+    embeddings = create_embeddings(cfg)
+    assert isinstance(embeddings, TruncatedEmbeddings)
+    assert embeddings.dimensions == 256
+
+    cfg.embedding_dimensions = 0
+    assert not isinstance(create_embeddings(cfg), TruncatedEmbeddings)
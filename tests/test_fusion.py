@@ -0,0 +1,71 @@
+from langchain_core.documents import Document
+
+from rag.adk_rag.fusion import (
+    fuse_results,
+    leg_agreement,
+    reciprocal_rank_fusion,
+    weighted_score_fusion,
+)
+
+
+def _docs(*names):
+    return [Document(page_content=name) for name in names]
+
+
+def test_rrf_rewards_documents_found_by_both_legs():
+    a, b, c = _docs("a", "b", "c")
+    legs = {
+        "vector": [(a, 0.9), (b, 0.8)],
+        "bm25": [(c, 12.0), (b, 10.0)],
+    }
+    fused = reciprocal_rank_fusion(legs, {"vector": 0.5, "bm25": 0.5})
+
+    assert [doc.page_content for doc, _ in fused][0] == "b"
+    assert len(fused) == 3
+
+
+def test_rrf_respects_leg_weights():
+    a, c = _docs("a", "c")
+    legs = {"vector": [(a, 0.9)], "bm25": [(c, 12.0)]}
+    fused = reciprocal_rank_fusion(legs, {"vector": 0.2, "bm25": 0.8})
+
+    assert [doc.page_content for doc, _ in fused] == ["c", "a"]
+
+
+def test_weighted_fusion_normalizes_score_scales():
+    a, b, c = _docs("a", "b", "c")
+    legs = {
+        "vector": [(a, 0.9), (b, 0.1)],
+        "bm25": [(b, 40.0), (c, 5.0)],
+    }
+    fused = weighted_score_fusion(legs, {"vector": 0.5, "bm25": 0.5})
+    scores = {doc.page_content: score for doc, score in fused}
+
+    assert scores["a"] == 0.5
+    assert scores["b"] == 0.5
+    assert scores["c"] == 0.0
+
+
+def test_fuse_results_dispatches_on_method():
+    a, b = _docs("a", "b")
+    legs = {"vector": [(a, 0.9), (b, 0.5)]}
+    weights = {"vector": 1.0}
+
+    assert fuse_results(legs, weights, method="weighted")[0][1] == 1.0
+    assert fuse_results(legs, weights, method="rrf", rrf_k=60)[0][1] == 1.0 / 61
+
+
+def test_leg_agreement_measures_overlap_and_margin():
+    a, b, c, d = _docs("a", "b", "c", "d")
+    legs = {
+        "vector": [(a, 0.9), (b, 0.8), (d, 0.1)],
+        "bm25": [(a, 12.0), (c, 10.0), (b, 1.0)],
+    }
+    fused = reciprocal_rank_fusion(legs, {"vector": 0.5, "bm25": 0.5})
+
+    agreement = leg_agreement(legs, fused, top_n=2)
+
+    assert agreement["top1_agree"] is True
+    assert agreement["overlap"] == 0.5
+    assert 0.0 < agreement["margin"] < 1.0
+    assert leg_agreement({"vector": legs["vector"], "bm25": []}, fused, 2)["overlap"] == 0.0
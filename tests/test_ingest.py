@@ -0,0 +1,170 @@
+from pathlib import Path
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from rag.adk_rag import ingest as ingest_module
+from rag.adk_rag.attributes import AttributeTable
+from rag.adk_rag.config import RAGConfig
+from rag.adk_rag.vector_index import load_faiss_store
+
+from conftest import FakeEmbeddings
+
+
+class RecordingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_build_vector_store_reuses_cached_chunk_vectors(tmp_path: Path, monkeypatch):
+    embeddings = RecordingEmbeddings()
+    monkeypatch.setattr(ingest_module, "_create_embeddings", lambda cfg: embeddings)
+    cfg = RAGConfig(index_path=str(tmp_path / "index"), embedding_model="test")
+
+    docs = [Document(page_content="alpha"), Document(page_content="beta")]
+    ingest_module.build_vector_store(cfg, docs)
+    embeddings.embedded.clear()
+
+    docs[1] = Document(page_content="beta v2")
+    store = ingest_module.build_vector_store(cfg, docs)
+
+    assert embeddings.embedded == ["beta v2"]
+    assert store.index.ntotal == 2
+
+
+def _write_docs(docs_dir: Path, files):
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    for name, text in files.items():
+        (docs_dir / name).write_text(text, encoding="utf-8")
+
+
+def test_incremental_ingestion_only_processes_changed_files(tmp_path: Path, monkeypatch):
+    embeddings = RecordingEmbeddings()
+    monkeypatch.setattr(ingest_module, "_create_embeddings", lambda cfg: embeddings)
+    docs_dir = tmp_path / "docs"
+    cfg = RAGConfig(
+        docs_path=str(docs_dir), index_path=str(tmp_path / "index"), embedding_model="test"
+    )
+    cfg.llm_provider = "openai"
+
+    _write_docs(docs_dir, {
+        "keep.md": "# Keep\n\nFunctionTool wraps functions.",
+        "change.md": "# Change\n\nLoopAgent repeats.",
+        "remove.md": "# Remove\n\nParallelAgent fans out.",
+    })
+    assert ingest_module.run_ingestion(cfg) == 3
+
+    _write_docs(docs_dir, {
+        "change.md": "# Change\n\nLoopAgent repeats until escalation.",
+        "add.md": "# Add\n\nSequentialAgent runs in order.",
+    })
+    (docs_dir / "remove.md").unlink()
+    embeddings.embedded.clear()
+
+    count = ingest_module.run_ingestion(cfg, incremental=True)
+
+    assert count == 3
+    assert len(embeddings.embedded) == 2
+    assert all("Keep" not in text for text in embeddings.embedded)
+
+    manifest = ingest_module.load_manifest(cfg.index_path)
+    assert sorted(manifest["files"]) == ["add.md", "change.md", "keep.md"]
+
+    bm25_docs = ingest_module.load_bm25_docs(cfg.index_path)
+    assert sorted(doc.metadata["chunk_id"] for doc in bm25_docs) == sorted(
+        chunk_id for entry in manifest["files"].values() for chunk_id in entry["chunk_ids"]
+    )
+    assert all("ParallelAgent" not in doc.page_content for doc in bm25_docs)
+
+    parents = ingest_module.load_parent_docs(cfg.index_path)
+    assert sorted(parents) == sorted(
+        parent_id for entry in manifest["files"].values() for parent_id in entry["parent_ids"]
+    )
+
+    chunk_attributes = AttributeTable.load(cfg.index_path, "chunks")
+    assert chunk_attributes.ids == [doc.metadata["chunk_id"] for doc in bm25_docs]
+    assert sorted(AttributeTable.load(cfg.index_path, "parents").ids) == sorted(parents)
+
+    store = FAISS.load_local(cfg.index_path, embeddings, allow_dangerous_deserialization=True)
+    assert store.index.ntotal == 3
+    assert sorted(store.index_to_docstore_id.values()) == sorted(
+        doc.metadata["chunk_id"] for doc in bm25_docs
+    )
+
+
+def test_incremental_ingestion_without_manifest_runs_full(tmp_path: Path, monkeypatch):
+    embeddings = RecordingEmbeddings()
+    monkeypatch.setattr(ingest_module, "_create_embeddings", lambda cfg: embeddings)
+    docs_dir = tmp_path / "docs"
+    _write_docs(docs_dir, {"a.md": "# A\n\nFunctionTool wraps functions."})
+    cfg = RAGConfig(
+        docs_path=str(docs_dir), index_path=str(tmp_path / "index"), embedding_model="test"
+    )
+
+    assert ingest_module.run_ingestion(cfg, incremental=True) == 1
+    assert ingest_module.load_manifest(cfg.index_path) is not None
+
+
+def test_build_vector_store_applies_index_factory(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(ingest_module, "_create_embeddings", lambda cfg: FakeEmbeddings())
+    cfg = RAGConfig(
+        index_path=str(tmp_path / "index"), embedding_model="test", faiss_index_factory="HNSW8"
+    )
+
+    docs = [Document(page_content=f"chunk {i}") for i in range(10)]
+    store = ingest_module.build_vector_store(cfg, docs)
+
+    assert isinstance(faiss.downcast_index(store.index), faiss.IndexHNSW)
+    assert store.similarity_search("chunk 4", k=1)[0].page_content == "chunk 4"
+
+
+def test_incremental_ingestion_rebuilds_index_without_removal(tmp_path: Path, monkeypatch):
+    embeddings = RecordingEmbeddings()
+    monkeypatch.setattr(ingest_module, "_create_embeddings", lambda cfg: embeddings)
+    docs_dir = tmp_path / "docs"
+    cfg = RAGConfig(
+        docs_path=str(docs_dir),
+        index_path=str(tmp_path / "index"),
+        embedding_model="test",
+        faiss_index_factory="HNSW8",
+    )
+    cfg.llm_provider = "openai"
+
+    _write_docs(docs_dir, {"a.md": "# A\n\nFunctionTool.", "b.md": "# B\n\nLoopAgent."})
+    ingest_module.run_ingestion(cfg)
+    (docs_dir / "b.md").unlink()
+
+    assert ingest_module.run_ingestion(cfg, incremental=True) == 1
+    store = FAISS.load_local(cfg.index_path, embeddings, allow_dangerous_deserialization=True)
+    assert store.index.ntotal == 1
+
+
+def test_incremental_ingestion_keeps_ivf_ids_consistent(tmp_path: Path, monkeypatch):
+    embeddings = RecordingEmbeddings()
+    monkeypatch.setattr(ingest_module, "_create_embeddings", lambda cfg: embeddings)
+    docs_dir = tmp_path / "docs"
+    cfg = RAGConfig(
+        docs_path=str(docs_dir),
+        index_path=str(tmp_path / "index"),
+        embedding_model="test",
+        faiss_index_factory="IVF2,Flat",
+    )
+    cfg.llm_provider = "openai"
+
+    names = ["Function", "Loop", "Parallel", "Sequential", "Llm", "Custom", "Remote", "Base"]
+    _write_docs(docs_dir, {f"{name}.md": f"# {name}\n\n{name}Agent docs." for name in names})
+    ingest_module.run_ingestion(cfg)
+    for name in names[:3]:
+        (docs_dir / f"{name}.md").unlink()
+
+    assert ingest_module.run_ingestion(cfg, incremental=True) == 5
+    store = load_faiss_store(cfg.index_path, embeddings, nprobe=2)
+    for doc in ingest_module.load_bm25_docs(cfg.index_path):
+        vector = embeddings.embed_query(doc.page_content)
+        hit = store.similarity_search_by_vector(vector, k=1)[0]
+        assert hit.metadata["chunk_id"] == doc.metadata["chunk_id"]
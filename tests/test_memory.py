@@ -0,0 +1,72 @@
+import gc
+import time
+
+from rag.adk_rag.memory import RSS_COLLECT_COOLDOWN, MemoryManager
+
+
+def test_off_policy_never_collects():
+    memory = MemoryManager("off")
+    for _ in range(3):
+        memory.after_query()
+
+    assert memory.stats()["collections"] == 0
+
+
+def test_always_policy_collects_after_each_query():
+    memory = MemoryManager("always")
+    for _ in range(3):
+        memory.after_query()
+
+    stats = memory.stats()
+    assert stats["collections"] == 3
+    assert stats["total_ms"] >= stats["max_ms"] >= 0
+
+
+def test_rss_policy_collects_above_threshold_with_cooldown():
+    rss = [100.0]
+    now = [1000.0]
+    memory = MemoryManager(
+        "rss", rss_threshold_mb=500, rss_reader=lambda: rss[0], clock=lambda: now[0]
+    )
+
+    memory.after_query()
+    assert memory.stats()["collections"] == 0
+
+    rss[0] = 900.0
+    memory.after_query()
+    memory.after_query()
+    assert memory.stats()["collections"] == 1
+
+    now[0] += RSS_COLLECT_COOLDOWN + 1
+    memory.after_query()
+    assert memory.stats()["collections"] == 2
+
+
+def test_periodic_policy_collects_in_background():
+    memory = MemoryManager("periodic", interval=0.01)
+    try:
+        deadline = time.monotonic() + 2.0
+        while memory.stats()["collections"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert memory.stats()["collections"] > 0
+    finally:
+        memory.stop()
+
+
+def test_unknown_policy_falls_back_to_off():
+    memory = MemoryManager("sometimes")
+    memory.after_query()
+
+    assert memory.policy == "off"
+    assert memory.stats()["collections"] == 0
+
+
+def test_freeze_moves_live_objects_out_of_collection():
+    before = gc.get_freeze_count()
+    kept = [[] for _ in range(1000)]  # noqa: F841 - tracked containers, alive while frozen
+    try:
+        MemoryManager().freeze()
+
+        assert gc.get_freeze_count() >= before + 1000
+    finally:
+        gc.unfreeze()
@@ -1,10 +1,19 @@
+import asyncio
+import gc
+import threading
 from pathlib import Path
 
+import pytest
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
 from rag.adk_rag.config import RAGConfig
+from rag.adk_rag.ingest import save_bm25_data
+from rag.adk_rag import ingest as ingest_module
 from rag.adk_rag import query as query_module
+from rag.adk_rag.docstore import MappingDocstore
+from rag.adk_rag.rerankers import Reranker
+from rag.adk_rag.vector_index import convert_index
 
 from conftest import DummyLLM, FakeEmbeddings
 
@@ -50,3 +59,384 @@ def test_query_returns_answer(tmp_path: Path, monkeypatch):
     assert result["answer"] == "ANSWER"
     assert result["contexts"]
     assert result["sources"] == ["a.md"]
+
+
+def _build_hybrid_rag(tmp_path: Path, monkeypatch, docs, **overrides):
+    embeddings = FakeEmbeddings()
+    index_path = tmp_path / "index"
+    FAISS.from_documents(docs, embeddings).save_local(str(index_path))
+    save_bm25_data(docs, str(index_path))
+
+    monkeypatch.setattr(query_module, "_create_embeddings", lambda cfg: embeddings)
+    monkeypatch.setattr(query_module, "_create_llm", lambda cfg, temperature=None: DummyLLM("ANSWER"))
+
+    overrides.setdefault("use_llm_reranking", False)
+    cfg = RAGConfig(index_path=str(index_path), **overrides)
+    cfg.llm_provider = "openai"
+    cfg.embedding_model = "test"
+    cfg.llm_model = "test"
+    return query_module.RAGSystem(cfg)
+
+
+HYBRID_DOCS = [
+    Document(page_content="[DOC_TEXT] [LANG=Python] FunctionTool wraps a function", metadata={"source": "a.md"}),
+    Document(page_content="[DOC_TEXT] [LANG=Python] LoopAgent repeats sub agents", metadata={"source": "b.md"}),
+    Document(page_content="[DOC_TEXT] [LANG=Go] SequentialAgent runs sub agents in order", metadata={"source": "c.md"}),
+]
+
+
+def test_hybrid_query_reports_leg_timings(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+    result = rag.query("FunctionTool")
+
+    retrieval = result["metadata"]["retrieval"]
+    assert result["answer"] == "ANSWER"
+    assert retrieval["vector"]["status"] == "ok"
+    assert retrieval["bm25"]["status"] == "ok"
+    assert retrieval["vector"]["ms"] >= 0
+    assert "total_ms" in retrieval
+
+
+def test_hybrid_retrieve_degrades_to_single_leg(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+
+    def failing_search(_query):
+        raise RuntimeError("embedding service down")
+
+    monkeypatch.setattr(rag, "_vector_search", failing_search)
+    stats = {}
+    candidates = rag._hybrid_retrieve("FunctionTool", stats)
+
+    assert candidates
+    assert stats["vector"]["status"] == "error"
+    assert stats["bm25"]["status"] == "ok"
+
+
+def test_hybrid_retrieve_drops_leg_on_timeout(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS, bm25_timeout=0.05)
+    release = threading.Event()
+
+    def slow_search(_query):
+        release.wait(2)
+        return []
+
+    monkeypatch.setattr(rag, "_bm25_search", slow_search)
+    stats = {}
+    candidates = rag._hybrid_retrieve("FunctionTool", stats)
+    release.set()
+
+    assert candidates
+    assert stats["bm25"]["status"] == "timeout"
+    assert stats["bm25"]["count"] == 0
+    assert stats["vector"]["status"] == "ok"
+
+
+def test_repeated_query_hits_embedding_cache(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+    first = rag.query("FunctionTool")
+    rag.query("functiontool ")
+
+    # The unfiltered fallback reuses the prefiltered attempt's embedding
+    assert first["metadata"]["retrieval"]["prefilter"] == "fallback"
+    stats = rag.cache_stats()["embedding"]
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_semantic_cache_skips_llm_on_repeated_question(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS, use_semantic_cache=True)
+    first = rag.query("How do I use FunctionTool?")
+
+    rag.llm = None  # any generation call would now fail
+    second = rag.query("how do I use  functiontool?")
+
+    assert first["metadata"]["semantic_cache"] == {"hit": False}
+    assert second["metadata"]["semantic_cache"]["hit"] is True
+    assert second["answer"] == first["answer"]
+    assert second["contexts"] == first["contexts"]
+
+
+def test_semantic_cache_namespace_tracks_answer_shaping_settings(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS, use_semantic_cache=True)
+    question = "How do I use FunctionTool?"
+    namespace = rag._semantic_cache_namespace(question)
+
+    for field, value in (
+        ("context_token_budget", 100),
+        ("rerank_gate", True),
+        ("fusion_method", "weighted"),
+        ("rerank_top_n", 3),
+        ("llm_rerank_shard_size", 2),
+        ("faiss_nprobe", 4),
+    ):
+        original = getattr(rag.config, field)
+        setattr(rag.config, field, value)
+        assert rag._semantic_cache_namespace(question) != namespace, field
+        setattr(rag.config, field, original)
+    assert rag._semantic_cache_namespace(question) == namespace
+
+
+def test_stream_query_emits_retrieval_before_tokens(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+    rag.llm = DummyLLM("FunctionTool wraps functions")
+
+    events = list(rag.stream_query("FunctionTool"))
+
+    assert events[0]["type"] == "retrieval"
+    assert events[0]["contexts"]
+    tokens = [event["text"] for event in events if event["type"] == "token"]
+    assert len(tokens) == 3
+    assert events[-1]["type"] == "done"
+    assert events[-1]["answer"] == "".join(tokens)
+    assert events[-1]["contexts"] == events[0]["contexts"]
+
+
+def test_stream_query_replays_missing_index(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+    rag.vector_store = None
+
+    events = list(rag.stream_query("FunctionTool"))
+
+    assert [event["type"] for event in events] == ["retrieval", "token", "done"]
+    assert "Run ingestion" in events[-1]["answer"]
+
+
+def test_aquery_matches_sync_query(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+
+    expected = rag.query("FunctionTool")
+    result = asyncio.run(rag.aquery("FunctionTool"))
+
+    assert result["answer"] == expected["answer"] == "ANSWER"
+    assert result["contexts"] == expected["contexts"]
+    assert result["sources"] == expected["sources"]
+    assert result["metadata"]["retrieval"]["vector"]["status"] == "ok"
+    assert result["metadata"]["retrieval"]["bm25"]["status"] == "ok"
+
+
+def test_aquery_serves_concurrent_questions(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+
+    async def run_all():
+        return await asyncio.gather(
+            *(rag.aquery(q) for q in ["FunctionTool", "LoopAgent", "SequentialAgent go"])
+        )
+
+    results = asyncio.run(run_all())
+    assert all(result["answer"] == "ANSWER" for result in results)
+
+
+def test_astream_query_emits_same_events(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+    rag.llm = DummyLLM("FunctionTool wraps functions")
+
+    async def collect():
+        return [event async for event in rag.astream_query("FunctionTool")]
+
+    events = asyncio.run(collect())
+
+    assert [event["type"] for event in events] == ["retrieval", "token", "token", "token", "done"]
+    assert events[-1]["answer"] == "FunctionTool wraps functions "
+
+
+def test_async_queries_collect_garbage_off_the_event_loop(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+    threads = []
+    rag.memory.after_query = lambda: threads.append(threading.current_thread())
+
+    async def run():
+        await rag.aquery("FunctionTool")
+        return [event async for event in rag.astream_query("LoopAgent")]
+
+    asyncio.run(run())
+
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+
+def test_filter_by_language_uses_attribute_arrays(tmp_path: Path, monkeypatch):
+    docs = [
+        Document(page_content=f"[DOC_TEXT] [LANG={lang}] agent {i}", metadata={"source": f"{i}.md"})
+        for i, lang in enumerate(["Go", "Python", "Go", "Java", "Go", "Python"])
+    ]
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, docs, rerank_top_n=3)
+
+    go_docs = rag._filter_by_language(docs, "Go")
+    python_docs = rag._filter_by_language(docs, "Python")
+
+    assert go_docs == [docs[0], docs[2], docs[4]]
+    # Too few Python matches: fall back to all candidates
+    assert python_docs == docs
+
+
+LANGUAGE_DOCS = [
+    Document(
+        page_content=f"[DOC_TEXT] [LANG={lang}] agent tool example {i}",
+        metadata={"source": f"{lang}{i}.md", "chunk_id": f"{lang}-{i}"},
+    )
+    for lang in ["Python", "Go", "Java"]
+    for i in range(5)
+]
+
+
+def test_language_prefilter_searches_only_requested_language(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, LANGUAGE_DOCS, rerank_top_n=3)
+
+    stats = {}
+    candidates = rag._retrieve_candidates("agent tool in go", "Go", stats)
+
+    assert stats["prefilter"] == "Go"
+    assert len(candidates) == 5
+    assert all("[LANG=Go]" in doc.page_content for doc in candidates)
+    assert all("[LANG=Go]" in doc.page_content for doc, _ in rag._vector_search("agent", "Go"))
+    assert all("[LANG=Go]" in doc.page_content for doc, _ in rag._bm25_search("agent", "Go"))
+
+
+def test_language_prefilter_falls_back_when_too_few_match(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, LANGUAGE_DOCS, rerank_top_n=8)
+
+    stats = {}
+    candidates = rag._retrieve_candidates("agent tool in go", "Go", stats)
+
+    assert stats["prefilter"] == "fallback"
+    assert len(candidates) == len(LANGUAGE_DOCS)
+    # The filtered attempt's leg stats are kept apart from the fallback's
+    assert stats["prefiltered"]["vector"]["count"] == 5
+    assert stats["vector"]["count"] == len(LANGUAGE_DOCS)
+
+
+def test_language_prefilter_on_approximate_indexes(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(
+        tmp_path, monkeypatch, LANGUAGE_DOCS, rerank_top_n=3, faiss_ef_search=32
+    )
+    for factory in ("HNSW8", "SQ8,RFlat", "LSH", "LSH,RFlat"):
+        rag.vector_store.index = convert_index(rag.vector_store.index, factory)
+        results = rag._vector_search("agent", "Go")
+
+        assert len(results) == 5
+        assert all("[LANG=Go]" in doc.page_content for doc, _ in results)
+
+
+def test_warm_up_touches_every_component(tmp_path: Path, monkeypatch):
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS)
+
+    timings = rag.warm_up()
+
+    assert {
+        "embedding_ms", "vector_ms", "bm25_ms", "language_filter_ms", "tokenizer_ms", "llm_ms"
+    } <= set(timings)
+    assert rag._language_filters
+    assert rag.cache_stats()["embedding"]["misses"] == 0
+
+
+def test_warm_up_fails_without_index(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(query_module, "_create_embeddings", lambda cfg: FakeEmbeddings())
+    monkeypatch.setattr(query_module, "_create_llm", lambda cfg, temperature=None: DummyLLM())
+    cfg = RAGConfig(index_path=str(tmp_path / "missing"), use_llm_reranking=False)
+    cfg.llm_provider = "openai"
+    cfg.embedding_model = "test"
+    cfg.llm_model = "test"
+
+    with pytest.raises(RuntimeError):
+        query_module.RAGSystem(cfg).warm_up()
+
+
+def test_vector_store_resolves_hits_from_chunk_store(tmp_path: Path, monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(ingest_module, "_create_embeddings", lambda cfg: embeddings)
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    (docs_dir / "a.md").write_text("# Tools\n\nFunctionTool wraps functions.", encoding="utf-8")
+    (docs_dir / "b.md").write_text("# Loops\n\nLoopAgent repeats.", encoding="utf-8")
+    cfg = RAGConfig(
+        docs_path=str(docs_dir), index_path=str(tmp_path / "index"), use_llm_reranking=False
+    )
+    cfg.llm_provider = "openai"
+    cfg.embedding_model = "test"
+    cfg.llm_model = "test"
+    ingest_module.run_ingestion(cfg)
+    (tmp_path / "index" / "index.pkl").unlink()  # never needed with a chunk store
+
+    monkeypatch.setattr(query_module, "_create_embeddings", lambda cfg: embeddings)
+    monkeypatch.setattr(query_module, "_create_llm", lambda cfg, temperature=None: DummyLLM())
+    rag = query_module.RAGSystem(cfg)
+
+    assert isinstance(rag.vector_store.docstore, MappingDocstore)
+    results = rag._vector_search("FunctionTool wraps functions.")
+    assert {doc.metadata["chunk_id"] for doc, _ in results} == set(rag.chunk_attributes.ids)
+    assert (rag._vector_rows >= 0).all()
+
+
+def test_hybrid_query_uses_configured_reranker(tmp_path: Path, monkeypatch):
+    class ReverseReranker(Reranker):
+        name = "reverse"
+
+        def score(self, query, docs):
+            return [float(i) for i in range(len(docs))]
+
+    monkeypatch.setattr(query_module, "_create_reranker", lambda cfg, detect: ReverseReranker())
+    rag = _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS, use_llm_reranking=True)
+    candidates = rag._retrieve_candidates("agent", "Python", {})
+
+    metadata = {}
+    ranked = rag._rerank("agent", candidates, metadata)
+
+    assert ranked == list(reversed(candidates))[: rag.config.rerank_top_n]
+    assert metadata["rerank"]["backend"] == "reverse"
+    assert rag.query("agent")["metadata"]["rerank"]["backend"] == "reverse"
+
+
+def test_rerank_gate_skips_or_shrinks_confident_retrieval(tmp_path: Path, monkeypatch):
+    class FlatReranker(Reranker):
+        name = "flat"
+
+        def __init__(self):
+            self.calls = []
+
+        def score(self, query, docs):
+            self.calls.append(len(docs))
+            return [0.0] * len(docs)
+
+    reranker = FlatReranker()
+    monkeypatch.setattr(query_module, "_create_reranker", lambda cfg, detect: reranker)
+    rag = _build_hybrid_rag(
+        tmp_path,
+        monkeypatch,
+        HYBRID_DOCS,
+        use_llm_reranking=True,
+        rerank_gate=True,
+        rerank_top_n=1,
+        rerank_gate_shrink_n=2,
+    )
+    candidates = [Document(page_content=str(i)) for i in range(5)]
+
+    def gate(overlap, top1_agree, margin):
+        stats = {"agreement": {"overlap": overlap, "top1_agree": top1_agree, "margin": margin}}
+        metadata = {}
+        docs, rerank = rag._gate_rerank(candidates, stats, metadata)
+        return len(docs), rerank, metadata["rerank_gate"]["decision"]
+
+    assert gate(1.0, True, 0.5) == (1, False, "skip")
+    assert gate(1.0, True, 0.1) == (2, True, "shrink")
+    assert gate(0.5, False, 0.9) == (2, True, "shrink")
+    assert gate(0.0, False, 0.9) == (5, True, "full")
+
+    # End to end, with the legs' agreement forced to each decision
+    def query_with(agreement):
+        monkeypatch.setattr(query_module, "leg_agreement", lambda *args: agreement)
+        reranker.calls.clear()
+        return rag.query("agent")["metadata"]["rerank_gate"]["decision"], reranker.calls
+
+    confident = {"overlap": 1.0, "top1_agree": True, "margin": 0.9}
+    assert query_with(confident) == ("skip", [])
+    assert query_with({**confident, "margin": 0.0}) == ("shrink", [2])
+    assert query_with({"overlap": 0.0, "top1_agree": False, "margin": 0.0}) == ("full", [3])
+    assert rag.cache_stats()["rerank_gate"] == {"skip": 2, "shrink": 3, "full": 2}
+
+
+def test_rag_system_never_freezes_the_process(tmp_path: Path, monkeypatch):
+    before = gc.get_freeze_count()
+
+    _build_hybrid_rag(tmp_path, monkeypatch, HYBRID_DOCS, gc_freeze_after_load=True)
+
+    assert gc.get_freeze_count() == before
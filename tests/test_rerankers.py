@@ -0,0 +1,283 @@
+import asyncio
+import json
+import re
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from rag.adk_rag import query as query_module
+from rag.adk_rag.cache import RerankScoreCache
+from rag.adk_rag.config import RAGConfig
+from rag.adk_rag.rerankers import (
+    CachedReranker,
+    LLMReranker,
+    PointwiseReranker,
+    Reranker,
+    fill_unscored,
+    merge_shard_scores,
+)
+
+from conftest import DummyLLM
+
+
+DOCS = [Document(page_content=text) for text in ["short", "a much longer passage", "medium text"]]
+
+
+class LengthReranker(PointwiseReranker):
+    """Scores passages by length and records the threads that scored them."""
+
+    name = "length"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def _score_batch(self, query, texts):
+        self.batches.append((threading.current_thread().name, list(texts)))
+        return [float(len(text)) for text in texts]
+
+
+def test_llm_reranker_orders_by_json_scores():
+    reranker = LLMReranker(DummyLLM('{"scores": {"0": 10, "1": 90, "2": 50}}'), lambda q: "Python")
+
+    ranked = reranker.rerank("query", DOCS, top_n=2)
+
+    assert [doc.page_content for doc in ranked] == ["a much longer passage", "medium text"]
+
+
+def test_llm_reranker_raises_when_every_shard_fails():
+    reranker = LLMReranker(DummyLLM("no scores here"), lambda q: "Python")
+
+    with pytest.raises(RuntimeError):
+        reranker.rerank("query", DOCS, top_n=3)
+    with pytest.raises(RuntimeError):
+        asyncio.run(reranker.arerank("query", DOCS, top_n=1))
+
+
+class ShardLLM:
+    """Scores chunks by length; fails any prompt containing ``fail_on``, leaves out ``omit``."""
+
+    def __init__(self, fail_on: str = "", structured: bool = False, omit: str = ""):
+        self.fail_on = fail_on
+        self.omit = omit
+        self.structured = structured
+        self.prompts = []
+
+    def with_structured_output(self, schema):
+        if not self.structured:
+            raise NotImplementedError
+        return _StructuredShardLLM(self)
+
+    def _scores(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail_on and self.fail_on in prompt:
+            raise ValueError("malformed response")
+        chunks = re.findall(r"^\[(\d+)\].*\n(.*)$", prompt, re.M)
+        return {
+            "scores": [
+                {"id": int(i), "score": len(text)}
+                for i, text in chunks if not (self.omit and self.omit in text)
+            ]
+        }
+
+    def invoke(self, prompt):
+        return DummyLLM(json.dumps(self._scores(prompt))).invoke(prompt)
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+
+class _StructuredShardLLM:
+    def __init__(self, parent):
+        self.parent = parent
+
+    def invoke(self, prompt):
+        return self.parent._scores(prompt)
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+
+def test_llm_reranker_deals_shards_round_robin():
+    reranker = LLMReranker(DummyLLM(), lambda q: "Python", shard_size=3)
+
+    assert reranker.shards(7) == [[0, 3, 6], [1, 4], [2, 5]]
+    assert reranker.shards(3) == [[0, 1, 2]]
+
+
+def test_llm_reranker_failed_shard_keeps_other_scores():
+    docs = [Document(page_content=c * n) for c, n in zip("abcdef", (5, 40, 10, 30, 20, 1))]
+    llm = ShardLLM(fail_on="d" * 30)
+    reranker = LLMReranker(llm, lambda q: "Python", shard_size=2, concurrency=3)
+
+    ranked = reranker.rerank("query", docs, top_n=6)
+
+    # Shards [0, 3], [1, 4], [2, 5]; the first fails and its chunks take the
+    # mean of the others
+    assert len(llm.prompts) == 3
+    assert [len(doc.page_content) for doc in ranked] == [40, 10, 5, 30, 1, 20]
+    assert [len(doc.page_content) for doc in asyncio.run(reranker.arerank("query", docs, 6))] == [
+        40, 10, 5, 30, 1, 20
+    ]
+
+
+def test_llm_reranker_leaves_omitted_ids_unscored():
+    docs = [Document(page_content=c * n) for c, n in zip("abcdef", (5, 40, 10, 30, 20, 1))]
+    llm = ShardLLM(omit="d" * 30)
+    reranker = LLMReranker(llm, lambda q: "Python", shard_size=2, concurrency=3)
+
+    # Shard [0, 3] leaves out chunk 3: it is unscored rather than scored 0,
+    # and does not drag chunk 0 up through its shard mean
+    partial = reranker.score_partial("query", docs)
+    assert partial[3] is None
+    assert partial[0] == pytest.approx(15.2)
+
+    ranked = [len(doc.page_content) for doc in reranker.rerank("query", docs, top_n=6)]
+    assert ranked[:2] == [40, 10]
+    assert set(ranked[2:4]) == {5, 30}
+    assert ranked[4:] == [1, 20]
+
+
+def test_parse_scores_returns_none_for_missing_ids():
+    content = 'Scores: {"scores": [{"id": 0, "score": 80}, {"id": 2, "score": 10}]}'
+
+    assert LLMReranker.parse_scores(content, 3) == [80.0, None, 10.0]
+    assert LLMReranker.parse_scores({"scores": {"1": 50}}, 2) == [None, 50.0]
+
+
+def test_llm_reranker_uses_structured_output():
+    llm = ShardLLM(structured=True)
+    reranker = LLMReranker(llm, lambda q: "Python")
+
+    assert reranker.structured_llm is not None
+    assert reranker.rerank("query", DOCS, top_n=1) == [DOCS[1]]
+
+
+def test_merge_shard_scores_removes_shard_offset():
+    merged = merge_shard_scores(4, [[0, 2], [1, 3]], [[90.0, 70.0], [40.0, 20.0]])
+
+    # Both shards share the overall mean (55); the harsher second shard is lifted
+    assert merged == [65.0, 65.0, 45.0, 45.0]
+    assert merge_shard_scores(2, [[0], [1]], [[30.0], None]) == [30.0, None]
+    assert merge_shard_scores(3, [[0, 2], [1]], [[30.0, None], [10.0]]) == [20.0, 20.0, None]
+
+
+def test_pointwise_reranker_batches_across_threads():
+    docs = [Document(page_content="x" * n) for n in range(1, 11)]
+    reranker = LengthReranker(batch_size=3, workers=2)
+
+    scores = reranker.score("query", docs)
+
+    assert scores == [float(n) for n in range(1, 11)]
+    assert sorted(len(texts) for _, texts in reranker.batches) == [1, 3, 3, 3]
+    assert all(name.startswith("rag-rerank") for name, _ in reranker.batches)
+    assert [doc.page_content for doc in reranker.rerank("query", docs, 2)] == ["x" * 10, "x" * 9]
+
+
+def test_unavailable_local_reranker_keeps_fused_order(monkeypatch):
+    def missing(*args, **kwargs):
+        raise ImportError("No module named 'sentence_transformers'")
+
+    monkeypatch.setattr(query_module, "CrossEncoderReranker", missing)
+    cfg = RAGConfig(reranker="cross_encoder")
+
+    assert query_module._create_reranker(cfg, lambda q: "Python") is None
+
+
+class CountingReranker(Reranker):
+    """Scores by length, leaving chunks containing 'fail' unscored."""
+
+    name = "counting"
+
+    def __init__(self):
+        self.seen = []
+
+    def score(self, query, docs):
+        return fill_unscored(self.score_partial(query, docs))
+
+    def score_partial(self, query, docs):
+        self.seen.append([doc.page_content for doc in docs])
+        return [None if "fail" in doc.page_content else float(len(doc.page_content)) for doc in docs]
+
+
+def test_cached_reranker_only_scores_unseen_pairs():
+    inner = CountingReranker()
+    reranker = CachedReranker(inner, RerankScoreCache(max_size=16), "counting:model")
+    docs = DOCS + [Document(page_content="fail")]
+
+    first = reranker.rerank("How do agents work?", docs, top_n=4)
+    second = reranker.rerank("how do  agents work?", docs[1:], top_n=3)
+    asyncio.run(reranker.arerank("another question", docs[:1], top_n=1))
+
+    assert reranker.name == "counting"
+    assert first[0] == DOCS[1]
+    assert second[0] == DOCS[1]
+    # The unscored chunk is retried; cached pairs are not re-sent
+    assert inner.seen == [[doc.page_content for doc in docs], ["fail"], ["short"]]
+    assert reranker.cache.stats()["hits"] == 2
+
+
+class DriftingReranker(Reranker):
+    """Listwise stand-in: scores by length plus an offset that grows every call."""
+
+    name = "drifting"
+    listwise = True
+
+    def __init__(self, omit=""):
+        self.omit = omit
+        self.seen = []
+
+    def score(self, query, docs):
+        return fill_unscored(self.score_partial(query, docs))
+
+    def score_partial(self, query, docs):
+        self.seen.append([doc.page_content for doc in docs])
+        offset = 10.0 * len(self.seen)
+        return [
+            None if self.omit and doc.page_content == self.omit else len(doc.page_content) + offset
+            for doc in docs
+        ]
+
+
+def test_cached_reranker_anchors_fresh_listwise_scores_on_partial_hit():
+    docs = [Document(page_content="x" * n) for n in (5, 40, 10, 30, 20)]
+    inner = DriftingReranker()
+    reranker = CachedReranker(inner, RerankScoreCache(max_size=16), "drifting:model", anchors=2)
+
+    assert reranker.score("query", docs[:3]) == [15.0, 50.0, 20.0]
+    scores = reranker.score("query", docs)
+
+    # The new chunks are sent with the lowest and highest cached ones, and
+    # their scores (call offset 20) are shifted onto the cached scale (10)
+    assert inner.seen[1] == ["x" * 30, "x" * 20, "x" * 5, "x" * 40]
+    assert scores == [15.0, 50.0, 20.0, 40.0, 30.0]
+    keys = reranker.cache.keys("drifting:model", "query", ["x" * 30])
+    assert reranker.cache.get_many(keys) == [40.0]
+
+
+def test_cached_reranker_rescores_all_when_no_anchor_scores():
+    docs = [Document(page_content="x" * n) for n in (5, 40, 10)]
+    inner = DriftingReranker(omit="x" * 5)
+    reranker = CachedReranker(inner, RerankScoreCache(max_size=16), "drifting:model", anchors=1)
+
+    reranker.score("query", docs[:1] + docs[2:])
+    inner.omit = "x" * 10
+    scores = reranker.score_partial("query", docs)
+
+    # The only anchor (chunk 2) comes back unscored: one full call, no mixing
+    assert inner.seen[1:] == [["x" * 5, "x" * 40, "x" * 10], [doc.page_content for doc in docs]]
+    assert scores == [35.0, 70.0, None]
+
+
+def test_create_reranker_wraps_in_score_cache(monkeypatch):
+    monkeypatch.setattr(query_module, "_create_rerank_llm", lambda cfg: DummyLLM())
+
+    cached = query_module._create_reranker(RAGConfig(rerank_model="m"), lambda q: "Python")
+    plain = query_module._create_reranker(
+        RAGConfig(rerank_model="m", rerank_cache_size=0), lambda q: "Python"
+    )
+
+    assert isinstance(cached, CachedReranker)
+    assert cached.model == "llm:m:512"
+    assert isinstance(plain, LLMReranker)
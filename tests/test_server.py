@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+from rag.run_adk_mcp_server import (
+    TokenBatcher,
+    build_app,
+    build_router_app,
+    worker_message_path,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_batcher_throttles_progress_messages():
+    clock = FakeClock()
+    batcher = TokenBatcher(interval=0.25, max_chars=10, clock=clock)
+
+    assert batcher.add("Function") is None
+    clock.now = 0.1
+    assert batcher.add("Tool") == "FunctionTool"  # max_chars reached
+    assert batcher.add(" wraps") is None
+    clock.now = 0.4
+    assert batcher.add(" a") == " wraps a"  # interval elapsed
+    assert batcher.add(" function") is None
+    assert batcher.flush() == " function"
+    assert batcher.flush() is None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def _serving(app):
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        server.force_exit = True
+        thread.join(timeout=5)
+
+
+def test_router_keeps_each_session_on_its_worker():
+    async def open_sessions(url, count):
+        tools = []
+        for _ in range(count):
+            async with sse_client(f"{url}/sse") as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    tools.append([tool.name for tool in (await session.list_tools()).tools])
+        return tools
+
+    with contextlib.ExitStack() as stack:
+        workers = [
+            stack.enter_context(_serving(build_app(worker_message_path(i)))) for i in range(2)
+        ]
+        router = stack.enter_context(_serving(build_router_app(workers)))
+
+        # Sessions alternate between the workers; each one's POSTs must reach
+        # the worker that holds it, or initialize never gets its response
+        tools = asyncio.run(asyncio.wait_for(open_sessions(router, 3), timeout=20))
+        assert tools == [["get_adk_info"]] * 3
+        assert httpx.get(f"{router}/healthz").json() == {"status": "ok"}
+        readyz = httpx.get(f"{router}/readyz")
+        assert readyz.status_code == 200
+        assert len(readyz.json()["workers"]) == 2
+
+
+def test_router_rejects_unknown_worker():
+    with _serving(build_router_app(["http://127.0.0.1:9"])) as router:
+        response = httpx.post(f"{router}/w5/messages/?session_id=abc", json={})
+        assert response.status_code == 404
@@ -0,0 +1,102 @@
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from rag.adk_rag.vector_index import (
+    build_index,
+    convert_index,
+    load_faiss_store,
+    save_faiss_store,
+    search_parameters,
+    set_search_defaults,
+    supports_removal,
+    supports_selectors,
+)
+
+from conftest import FakeEmbeddings
+
+
+def _vectors(n=400, d=16):
+    return np.random.default_rng(1).random((n, d), dtype=np.float32)
+
+
+def test_build_index_trains_and_adds_all_vectors():
+    vectors = _vectors()
+    index = build_index(vectors, "IVF4,SQ8", train_size=200)
+
+    assert isinstance(faiss.downcast_index(index), faiss.IndexIVFScalarQuantizer)
+    assert index.is_trained and index.ntotal == len(vectors)
+
+
+def test_convert_index_keeps_vector_order():
+    vectors = _vectors()
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+
+    index = convert_index(flat, "HNSW16")
+    _, positions = index.search(vectors[:5], 1)
+
+    assert positions[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_search_parameters_carry_index_settings():
+    vectors = _vectors()
+    hnsw = build_index(vectors, "HNSW16")
+    ivf = build_index(vectors, "IVF4,Flat")
+    set_search_defaults(hnsw, ef_search=48)
+    set_search_defaults(ivf, nprobe=3)
+
+    selector = faiss.IDSelectorRange(0, 10)
+    assert search_parameters(hnsw, selector).efSearch == 48
+    assert search_parameters(ivf, selector).nprobe == 3
+
+    _, positions = ivf.search(vectors[:1], 5, params=search_parameters(ivf, selector))
+    assert all(0 <= pos < 10 for pos in positions[0] if pos >= 0)
+
+
+def test_supports_removal():
+    vectors = _vectors()
+    assert supports_removal(build_index(vectors, "Flat"))
+    assert not supports_removal(build_index(vectors, "IVF4,Flat"))
+    assert supports_removal(build_index(vectors, "SQ8"))
+    assert not supports_removal(build_index(vectors, "HNSW16"))
+
+
+def test_store_roundtrip_with_mmap(tmp_path: Path):
+    embeddings = FakeEmbeddings()
+    docs = [Document(page_content=f"doc {i}", metadata={"source": f"{i}.md"}) for i in range(20)]
+    store = FAISS.from_documents(docs, embeddings)
+    index_path = tmp_path / "index"
+    index_path.mkdir()
+
+    save_faiss_store(store, str(index_path))
+    save_faiss_store(store, str(index_path))  # replaces the files in place
+    loaded = load_faiss_store(str(index_path), embeddings, mmap=True)
+
+    assert sorted(p.name for p in index_path.iterdir()) == ["index.faiss", "index.pkl", "index_ids.json"]
+    assert loaded.index.ntotal == 20
+    assert loaded.similarity_search("doc 3", k=1)[0].page_content == "doc 3"
+
+
+def test_refine_index_search_parameters_wrap_selector():
+    vectors = _vectors()
+    index = build_index(vectors, "PCA8,SQ8,RFlat")
+    set_search_defaults(index, k_factor=4)
+
+    params = search_parameters(index, faiss.IDSelectorRange(100, 200))
+    _, positions = index.search(vectors[150:151], 5, params=params)
+
+    assert params.k_factor == 4
+    assert positions[0][0] == 150
+    assert all(100 <= pos < 200 for pos in positions[0])
+
+
+def test_supports_selectors():
+    vectors = _vectors()
+    assert supports_selectors(build_index(vectors, "Flat"))
+    assert supports_selectors(build_index(vectors, "SQ8,RFlat"))
+    assert not supports_selectors(build_index(vectors, "LSH"))
+    assert not supports_selectors(build_index(vectors, "LSH,RFlat"))